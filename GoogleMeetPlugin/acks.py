@@ -0,0 +1,179 @@
+"""Acknowledgements for the commands sent to the extension.
+
+With acknowledgements enabled, every command carries an `id`, and the
+extension answers it with a `CommandAck`:
+
+    {"status": "ack", "id": 7, "result": "ack"}
+
+The result is "ack" when the content script clicked the control, "not_found"
+when the control was not on the page (e.g. a collapsed toolbar), or "no_tab"
+when the background script had no Meet tab to send the command to.
+
+`CommandTracker` keeps the commands that are waiting for their answer, each
+with a deadline. Idempotent commands that fail or time out are sent once more;
+anything else that fails is reported through `failure_callback` so the key can
+show it. Sending never waits for the answer.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Collection
+from typing import NamedTuple
+
+from GoogleMeetPlugin.scheduler import IDEMPOTENT_ACTIONS
+
+logger = logging.getLogger(__name__)
+
+ACK = "ack"
+TIMEOUT = "timeout"  # Not sent by the extension: no answer before the deadline
+
+DEFAULT_ACK_TIMEOUT = 1.0
+
+
+class _InFlight(NamedTuple):
+  action: str
+  deadline: float
+  attempts: int
+
+
+class CommandTracker:
+  """An in-flight table of commands waiting for their acknowledgement.
+
+  `resend_callback` is called with the action and id of a command to send
+  again, and `failure_callback` with the action and the result ("not_found",
+  "no_tab" or "timeout") of one that finally failed. Both are called without
+  holding the tracker's lock, from the thread that reported the result or from
+  the tracker's deadline thread.
+  """
+
+  def __init__(
+    self,
+    resend_callback: Callable[[str, int], None],
+    failure_callback: Callable[[str, str], None],
+    timeout: float = DEFAULT_ACK_TIMEOUT,
+    retry_actions: Collection[str] = IDEMPOTENT_ACTIONS,
+  ):
+    self.resend_callback = resend_callback
+    self.failure_callback = failure_callback
+    self.timeout = timeout
+    self.retry_actions = retry_actions
+    self._ids = itertools.count(1)
+    # id -> in-flight command, earliest deadline first.
+    self._in_flight: OrderedDict[int, _InFlight] = OrderedDict()
+    self._lock = threading.Condition()
+    self._stopped = False
+    self._thread: threading.Thread | None = None
+
+    # Counters, exposed through `stats`.
+    self.acked = 0
+    self.retried = 0
+    self.failed = 0
+    self.late = 0
+
+  def issue(self, action: str) -> int:
+    """Registers a command about to be sent and returns its id."""
+    command_id = next(self._ids)
+    with self._lock:
+      self._in_flight[command_id] = _InFlight(
+        action, time.monotonic() + self.timeout, 1
+      )
+      self._wake()
+    return command_id
+
+  def acknowledge(self, command_id: int, result: str) -> None:
+    """Handles the extension's answer to a command."""
+    with self._lock:
+      entry = self._in_flight.pop(command_id, None)
+      if entry is None:
+        # Answered after its deadline, or a duplicate answer to a retry.
+        self.late += 1
+        return
+      if result == ACK:
+        self.acked += 1
+        return
+      retry = self._should_retry(command_id, entry)
+    self._finish(command_id, entry.action, result, retry)
+
+  def stop(self) -> None:
+    """Stops the deadline thread. Commands still in flight are forgotten."""
+    with self._lock:
+      self._stopped = True
+      self._in_flight.clear()
+      self._lock.notify_all()
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
+
+  def stats(self) -> dict[str, int]:
+    """Returns the tracker counters."""
+    with self._lock:
+      return {
+        "in_flight": len(self._in_flight),
+        "acked": self.acked,
+        "retried": self.retried,
+        "failed": self.failed,
+        "late": self.late,
+      }
+
+  def _should_retry(self, command_id: int, entry: _InFlight) -> bool:
+    """Puts a command back in flight if it gets another attempt."""
+    if entry.action not in self.retry_actions or entry.attempts > 1:
+      self.failed += 1
+      return False
+    self.retried += 1
+    self._in_flight[command_id] = _InFlight(
+      entry.action, time.monotonic() + self.timeout, entry.attempts + 1
+    )
+    self._wake()
+    return True
+
+  def _finish(
+    self, command_id: int, action: str, result: str, retry: bool
+  ) -> None:
+    try:
+      if retry:
+        logger.info(f"No effect from {action} ({result}); sending it again.")
+        self.resend_callback(action, command_id)
+      else:
+        logger.warning(f"Command {action} failed: {result}.")
+        self.failure_callback(action, result)
+    except Exception:  # pylint: disable=broad-exception-caught
+      logger.exception(f"Error handling the result of {action}.")
+
+  def _wake(self) -> None:
+    if self._thread is None and not self._stopped:
+      self._thread = threading.Thread(
+        target=self._run, name="meet-command-acks", daemon=True
+      )
+      self._thread.start()
+    self._lock.notify_all()
+
+  def _run(self) -> None:
+    """Times out commands whose deadline has passed."""
+    while True:
+      with self._lock:
+        if self._stopped:
+          return
+        expired = []
+        now = time.monotonic()
+        # Every deadline is one timeout after (re)sending, so the table is
+        # in deadline order.
+        while self._in_flight:
+          command_id, entry = next(iter(self._in_flight.items()))
+          if entry.deadline > now:
+            break
+          del self._in_flight[command_id]
+          expired.append(
+            (command_id, entry, self._should_retry(command_id, entry))
+          )
+        if not expired:
+          wait = None
+          if self._in_flight:
+            wait = next(iter(self._in_flight.values())).deadline - now
+          self._lock.wait(wait)
+          continue
+      for command_id, entry, retry in expired:
+        self._finish(command_id, entry.action, TIMEOUT, retry)
@@ -1,5 +1,3 @@
-import os
-
 from GoogleMeetPlugin.actions.MeetActionBase import MeetActionBase
 
 
@@ -13,8 +11,8 @@ class HangUpAction(MeetActionBase):
 
   def on_ready(self) -> None:
     """Sets the static icon for the hang up button."""
-    icon_path = os.path.join(self.plugin_base.PATH, "assets", "hang_up.png")
-    self.set_media(media_path=icon_path)
+    super().on_ready()
+    self.set_icon("hang_up.png")
 
   def update_state(self, is_on: bool) -> None:
     """This action is stateless, so we do nothing."""
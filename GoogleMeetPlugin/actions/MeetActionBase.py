@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 import os
+import threading
 from typing import TYPE_CHECKING, Optional
 
 from src.backend.PluginManager.ActionBase import ActionBase
 
+from GoogleMeetPlugin.icon_cache import icon_cache
+
 if TYPE_CHECKING:
   from main import GoogleMeetPlugin
 
@@ -17,33 +20,127 @@ class MeetActionBase(ActionBase):
     super().__init__(*args, **kwargs)
     self.plugin_base: GoogleMeetPlugin
     self.is_on: Optional[bool] = None  # None means unknown state
+    # With optimistic icons, the state shown after a key press (`is_on`) is
+    # predicted until a status update confirms it.
+    self.confirmed_on: bool | None = None
+    self.pending_on: bool | None = None
+    self._rollback_timer: threading.Timer | None = None
+    self._state_lock = threading.Lock()
     self.action_name: str = "base_action"  # To be overridden by subclasses
     self.icon_on: str = ""
     self.icon_off: str = ""
     self.icon_unknown: str = ""
 
   def on_ready(self) -> None:
-    """Called when the action is added to the deck. Sets the initial icon."""
-    self.set_initial_icon()
+    """Called when the action is added to the deck. Sets the initial icon.
+
+    The icon shows the last state the plugin knows for the action's control,
+    so a key shown in the middle of a call is right straight away.
+    """
+    self.plugin_base.action_registry.register(self)
+    # Holding the lock keeps a concurrent update_state from being overtaken
+    # by the (older) state read here.
+    with self._state_lock:
+      state = self.plugin_base.meet_state.read(self)
+      if state is None:
+        self.set_initial_icon()
+        return
+      self.is_on = self.confirmed_on = state == "on"
+      # Always render: a re-shown key needs its image even if is_on is
+      # unchanged.
+      self.set_icon(self.icon_on if self.is_on else self.icon_off)
+
+  def on_removed_from_cache(self) -> None:
+    """Called when StreamController drops the action. Stops tracking it."""
+    self.plugin_base.action_registry.unregister(self)
 
   def on_key_down(self) -> None:
     """Called when the key is pressed. Sends the command to the plugin."""
     self.plugin_base.send_command(action=self.action_name)
+    timeout = self.plugin_base.optimistic_timeout
+    if timeout and self.icon_on and self.icon_off:
+      self.predict_toggle(timeout)
+
+  def predict_toggle(self, timeout: float) -> None:
+    """Shows the toggled state straight away, pending confirmation.
+
+    If no status update confirms it within `timeout` seconds, the icon goes
+    back to the last confirmed state.
+    """
+    with self._state_lock:
+      if self.is_on is None:
+        return  # Nothing to toggle from
+      self.pending_on = not self.is_on
+      self._set_state(self.pending_on)
+      if self._rollback_timer:
+        self._rollback_timer.cancel()
+      self._rollback_timer = threading.Timer(timeout, self._roll_back)
+      self._rollback_timer.daemon = True
+      self._rollback_timer.start()
+
+  def _roll_back(self) -> None:
+    """Gives up on an unconfirmed prediction."""
+    with self._state_lock:
+      if self.pending_on is None:
+        return
+      self.pending_on = None
+      self._rollback_timer = None
+      if self.confirmed_on is None:
+        self.is_on = None
+        self.set_initial_icon()
+      else:
+        self._set_state(self.confirmed_on)
 
   def set_initial_icon(self) -> None:
     """Sets the icon based on the initial (unknown) state."""
     if self.icon_unknown:
-      icon_path = os.path.join(
-        self.plugin_base.PATH, "assets", self.icon_unknown
-      )
+      self.set_icon(self.icon_unknown)
+
+  def set_icon(self, icon_name: str) -> None:
+    """Shows one of the plugin's assets, decoded once via the icon cache."""
+    icon_path = os.path.join(self.plugin_base.PATH, "assets", icon_name)
+    image = icon_cache.get(icon_path, self._key_size())
+    if image is None:
       self.set_media(media_path=icon_path)
+    else:
+      self.set_media(image=image)
+
+  def _key_size(self) -> tuple[int, int] | None:
+    """Returns the pixel size of this deck's keys, if it can be determined."""
+    try:
+      return tuple(self.deck_controller.deck.key_image_format()["size"])
+    except Exception:  # pylint: disable=broad-exception-caught
+      return None
 
   def update_state(self, is_on: bool) -> None:
     """Updates the action's state and icon based on feedback from the extension."""
+    with self._state_lock:
+      self.confirmed_on = is_on
+      if self.pending_on is not None:
+        if is_on != self.pending_on:
+          # e.g. the echo of an earlier press; wait for the confirmation.
+          return
+        self.pending_on = None
+        if self._rollback_timer:
+          self._rollback_timer.cancel()
+          self._rollback_timer = None
+      self._set_state(is_on)
+
+  def clear_state(self) -> None:
+    """Goes back to the unknown state, e.g. when another call is routed."""
+    with self._state_lock:
+      self.confirmed_on = self.pending_on = None
+      if self._rollback_timer:
+        self._rollback_timer.cancel()
+        self._rollback_timer = None
+      if self.is_on is not None:
+        self.is_on = None
+        self.set_initial_icon()
+
+  def _set_state(self, is_on: bool) -> None:
+    """Shows a state, if it is not shown already."""
     if self.is_on == is_on:
       return  # No change
 
     self.is_on = is_on
-    icon_name = self.icon_on if self.is_on else self.icon_off
-    icon_path = os.path.join(self.plugin_base.PATH, "assets", icon_name)
-    self.set_media(media_path=icon_path)
+    self.set_icon(self.icon_on if self.is_on else self.icon_off)
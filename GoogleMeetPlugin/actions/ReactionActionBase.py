@@ -1,12 +1,14 @@
-import os
-
 from GoogleMeetPlugin.actions.MeetActionBase import MeetActionBase
+from GoogleMeetPlugin.models import MAX_COMMAND_COUNT
 
 
 class ReactionActionBase(MeetActionBase):
   """
   A base class for stateless reaction actions.
   These actions send a specific reaction and have a static icon.
+
+  A key's "repeat" setting sends the reaction that many times per press, as
+  one command that the extension queues.
   """
 
   def __init__(self, *args, **kwargs):
@@ -16,9 +18,36 @@ class ReactionActionBase(MeetActionBase):
 
   def on_ready(self) -> None:
     """Sets the static icon for the reaction button."""
+    super().on_ready()
     if self.icon_name:
-      icon_path = os.path.join(self.plugin_base.PATH, "assets", self.icon_name)
-      self.set_media(media_path=icon_path)
+      self.set_icon(self.icon_name)
+
+  def on_key_down(self) -> None:
+    """Sends the reaction, as many times as the key's "repeat" setting says."""
+    self.plugin_base.send_command(action=self.action_name, count=self.repeat())
+
+  def repeat(self) -> int:
+    """How many times a press sends the reaction."""
+    try:
+      repeat = int((self.get_settings() or {}).get("repeat", 1))
+    except (TypeError, ValueError):
+      return 1
+    return min(max(repeat, 1), MAX_COMMAND_COUNT)
+
+  def get_config_rows(self) -> list:
+    """A row to set how many times a press sends the reaction."""
+    from gi.repository import Adw
+
+    row = Adw.SpinRow.new_with_range(1, MAX_COMMAND_COUNT, 1)
+    row.set_title("Repeat")
+    row.set_value(self.repeat())
+    row.connect("notify::value", self._on_repeat_changed)
+    return [row]
+
+  def _on_repeat_changed(self, row, _param) -> None:
+    settings = self.get_settings() or {}
+    settings["repeat"] = int(row.get_value())
+    self.set_settings(settings)
 
   def update_state(self, is_on: bool) -> None:
     """This action is stateless, so we do nothing."""
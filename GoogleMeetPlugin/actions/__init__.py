@@ -0,0 +1,77 @@
+"""Declarative table of the plugin's actions.
+
+Each action class lives in the module of the same name in this package. The
+classes are referenced by name and only imported when StreamController first
+creates an instance on a deck, so loading the plugin does not import any of
+them.
+"""
+
+import importlib
+import threading
+from typing import Any, NamedTuple
+
+
+class ActionSpec(NamedTuple):
+  """One action offered by the plugin."""
+
+  key: str  # Suffix of the action id, e.g. "toggle_mute"
+  name: str  # Display name in StreamController
+  class_name: str  # Class in GoogleMeetPlugin.actions.<class_name>
+
+
+ACTIONS = (
+  ActionSpec("toggle_mute", "Toggle Mute", "ToggleMuteAction"),
+  ActionSpec("toggle_camera", "Toggle Camera", "ToggleCameraAction"),
+  ActionSpec("raise_hand", "Raise Hand", "RaiseHandAction"),
+  ActionSpec("hang_up", "Hang Up", "HangUpAction"),
+  ActionSpec("toggle_present", "Toggle Present", "TogglePresentAction"),
+  ActionSpec("send_reaction_thumb_up", "Send 👍", "SendThumbUpAction"),
+  ActionSpec("send_reaction_heart", "Send ❤️", "SendHeartAction"),
+  ActionSpec("toggle_chat_panel", "Toggle Chat", "ToggleChatPanelAction"),
+  ActionSpec(
+    "toggle_participants_panel",
+    "Toggle Participants",
+    "ToggleParticipantsPanelAction",
+  ),
+)
+
+
+class LazyActionClass:
+  """Stands in for an action class until it is first instantiated.
+
+  Calling it imports the real class and creates an instance, which is all
+  an `ActionHolder` does with its `action_base`. Any other attribute access
+  is forwarded to the real class, importing it if needed.
+  """
+
+  def __init__(self, class_name: str):
+    self.__name__ = class_name
+    self.__qualname__ = class_name
+    self._class: type | None = None
+    self._lock = threading.Lock()
+
+  @property
+  def loaded(self) -> bool:
+    """Whether the real class has been imported."""
+    return self._class is not None
+
+  def load(self) -> type:
+    """Imports and returns the real action class."""
+    if self._class is None:
+      with self._lock:
+        if self._class is None:
+          module = importlib.import_module(f"{__name__}.{self.__name__}")
+          self._class = getattr(module, self.__name__)
+    return self._class
+
+  def __call__(self, *args: Any, **kwargs: Any) -> Any:
+    return self.load()(*args, **kwargs)
+
+  def __getattr__(self, name: str) -> Any:
+    if name.startswith("__"):
+      raise AttributeError(name)
+    return getattr(self.load(), name)
+
+  def __repr__(self) -> str:
+    state = "loaded" if self.loaded else "not loaded"
+    return f"<LazyActionClass {self.__name__} ({state})>"
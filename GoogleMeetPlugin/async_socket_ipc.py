@@ -0,0 +1,195 @@
+import asyncio
+import contextlib
+import itertools
+import logging
+from collections.abc import Callable
+from typing import Any
+
+from GoogleMeetPlugin.capture import TO_PLUGIN, TO_PROXY, FrameRecorder
+from GoogleMeetPlugin.framing import (
+  DEFAULT_READ_SIZE,
+  FrameDecoder,
+  FrameTooLargeError,
+  encode_frame,
+)
+from GoogleMeetPlugin.socket_ipc import bind_unix_socket
+from GoogleMeetPlugin.wire import (
+  WireCodec,
+  encode_json,
+  hello_reply,
+  is_hello,
+  negotiate,
+)
+
+logger = logging.getLogger(__name__)
+
+# Bytes buffered for a client that is not reading before frames are dropped.
+MAX_CLIENT_WRITE_BUFFER = 256 * 1024
+
+
+class AsyncSocketIPCServer:
+  """An event-loop socket server that serves any number of proxies.
+
+  This is a drop-in alternative to `SocketIPCServer` with the same
+  `message_callback` / `send_message` surface. Connections are accepted for as
+  long as the server runs, so a proxy restarted by Chrome can reconnect. All
+  reads and writes for every connection happen on the single thread that
+  calls `listen`.
+  """
+
+  def __init__(
+    self,
+    socket_path: str,
+    message_callback: Callable[[dict[str, Any], int], None],
+    connection_callback: Callable[[int, bool], None] | None = None,
+    recorder: FrameRecorder | None = None,
+  ):
+    self.socket_path = socket_path
+    self.message_callback = message_callback
+    self.connection_callback = connection_callback
+    self.recorder = recorder
+    self.server_socket = bind_unix_socket(socket_path)
+    self.loop: asyncio.AbstractEventLoop | None = None
+    self._clients: dict[int, asyncio.StreamWriter] = {}
+    self._codecs: dict[int, WireCodec] = {}
+    self._session_ids = itertools.count(1)
+    self.frames_dropped = 0
+    self._stopped: asyncio.Event | None = None
+
+  @property
+  def client_count(self) -> int:
+    """Number of currently connected proxies."""
+    return len(self._clients)
+
+  def listen(self) -> None:
+    """Runs the event loop, accepting and serving clients until closed."""
+    self.loop = asyncio.new_event_loop()
+    try:
+      self.loop.run_until_complete(self._serve())
+    finally:
+      self.loop.close()
+
+  def close(self) -> None:
+    """Stops the server from any thread and disconnects all clients."""
+    if self.loop is not None and self._stopped is not None:
+      self.loop.call_soon_threadsafe(self._stopped.set)
+
+  def send_message(
+    self, message: dict[str, Any], session_id: int | None = None
+  ) -> None:
+    """Queues a message for the connected clients without blocking.
+
+    The write is scheduled on the loop thread, so this is safe to call from
+    any thread.
+
+    Args:
+        message: The message to send.
+        session_id: The session to send to. If None, every connected client
+            receives the message.
+    """
+    loop = self.loop
+    if loop is None or loop.is_closed() or not self._clients:
+      return
+
+    # The loop may be closed between the check and the call.
+    with contextlib.suppress(RuntimeError):
+      loop.call_soon_threadsafe(self._write, message, session_id)
+
+  def _write(self, message: dict[str, Any], session_id: int | None) -> None:
+    """Writes a message to one or every client, on the loop thread.
+
+    Each client gets the message in the encoding negotiated with it.
+    """
+    if session_id is None:
+      session_ids = list(self._clients)
+    elif session_id in self._clients:
+      session_ids = [session_id]
+    else:
+      logger.debug("Session %s is gone, dropping outgoing frame.", session_id)
+      return
+
+    for client_id in session_ids:
+      writer = self._clients[client_id]
+      if writer.is_closing():
+        continue
+      if writer.transport.get_write_buffer_size() > MAX_CLIENT_WRITE_BUFFER:
+        self.frames_dropped += 1
+        # A stalled proxy drops every frame; only log now and then.
+        if self.frames_dropped % 100 == 1:
+          logger.warning(
+            "Proxy is not reading, %d frames dropped so far.",
+            self.frames_dropped,
+          )
+        continue
+      self._write_frame(writer, self._codecs[client_id].encode(message))
+
+  def _write_frame(self, writer: asyncio.StreamWriter, frame: bytes) -> None:
+    if self.recorder:
+      self.recorder.record(TO_PROXY, frame)
+    writer.write(encode_frame(frame))
+
+  async def _serve(self) -> None:
+    """Accepts connections until `close` is called."""
+    self._stopped = asyncio.Event()
+    server = await asyncio.start_unix_server(
+      self._handle_client, sock=self.server_socket
+    )
+    logger.info(f"AsyncSocketIPCServer listening on {self.socket_path}")
+    async with server:
+      await self._stopped.wait()
+      for writer in list(self._clients.values()):
+        writer.close()
+
+  async def _handle_client(
+    self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+  ) -> None:
+    """Reads frames from one client until it disconnects."""
+    session_id = next(self._session_ids)
+    self._clients[session_id] = writer
+    self._codecs[session_id] = WireCodec()
+    logger.info(
+      f"AsyncSocketIPCServer accepted connection ({self.client_count} connected)"
+    )
+    if self.connection_callback:
+      self.connection_callback(session_id, True)
+    decoder = FrameDecoder()
+    try:
+      while True:
+        data = await reader.read(DEFAULT_READ_SIZE)
+        if not data:
+          if decoder.pending:
+            logger.warning("Proxy disconnected in the middle of a frame.")
+          break
+
+        for frame in decoder.feed(data):
+          if self.recorder:
+            self.recorder.record(TO_PLUGIN, frame)
+          message = self._codecs[session_id].decode(frame)
+          if is_hello(message):
+            # Answer in JSON, then switch to the agreed encoding.
+            codec = negotiate(message)
+            self._write_frame(writer, encode_json(hello_reply(codec.encoding)))
+            self._codecs[session_id] = codec
+            logger.info(
+              f"Using {codec.encoding} encoding with session {session_id}."
+            )
+            continue
+          self.message_callback(message, session_id)
+    except (ConnectionResetError, BrokenPipeError):
+      logger.warning("Socket connection with proxy lost.")
+    except FrameTooLargeError as e:
+      logger.error(f"Dropping connection with proxy: {e}")
+    except Exception:
+      logger.exception("Error handling message from socket client.")
+    finally:
+      del self._clients[session_id]
+      del self._codecs[session_id]
+      writer.close()
+      if self.recorder:
+        self.recorder.flush()
+      if self.connection_callback:
+        self.connection_callback(session_id, False)
+      logger.info(
+        f"Client disconnected ({self.client_count} still connected). "
+        "Still accepting new connections."
+      )
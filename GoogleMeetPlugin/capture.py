@@ -0,0 +1,141 @@
+"""Recording and replaying the frames exchanged on the plugin <-> proxy socket.
+
+A capture is a compact binary file of the frames as they were sent on the
+wire, in either encoding (see `wire.py`), including the hello handshake:
+
+    magic   b"MEETCAP1"
+    record  <direction:u8> <monotonic ns:u64> <length:u32> <frame bytes>
+    ...
+
+Recording is opt-in: `SocketIPCServer` and `AsyncSocketIPCServer` take a
+`FrameRecorder`, which the plugin creates for the "capture_file" setting, and
+the proxy records when `MEET_CAPTURE_FILE` is set. Records are appended to a
+buffered file under a lock, so recording costs a memory copy per frame.
+
+`replay` plays a capture back with its original timing, scaled by a speed
+factor, which is what `benchmarks/replay_capture.py` uses to feed a capture
+into the plugin.
+"""
+
+import logging
+import struct
+import threading
+import time
+from collections.abc import Callable, Iterator
+from typing import BinaryIO, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MEETCAP1"
+RECORD_HEADER = struct.Struct("<BQI")
+
+# Frame directions.
+TO_PLUGIN = 0  # Status updates (and the hello offer) from the proxy
+TO_PROXY = 1  # Commands (and the hello reply) from the plugin
+
+
+class CaptureError(ValueError):
+  """Raised for a file that is not a (complete) capture."""
+
+
+class CapturedFrame(NamedTuple):
+  """One recorded frame."""
+
+  direction: int
+  timestamp_ns: int
+  frame: bytes
+
+
+class FrameRecorder:
+  """Appends frames to a capture file. Safe to use from several threads."""
+
+  def __init__(self, path: str):
+    self.path = path
+    self.frames = 0
+    self._lock = threading.Lock()
+    self._file: BinaryIO | None = open(path, "ab")  # noqa: SIM115
+    if self._file.tell() == 0:
+      self._file.write(MAGIC)
+    logger.info(f"Recording IPC frames to {path}")
+
+  def record(self, direction: int, frame: bytes) -> None:
+    """Appends one frame, stamped with the monotonic clock."""
+    header = RECORD_HEADER.pack(direction, time.monotonic_ns(), len(frame))
+    with self._lock:
+      if self._file is None:
+        return
+      self._file.write(header)
+      self._file.write(frame)
+      self.frames += 1
+
+  def flush(self) -> None:
+    """Writes buffered records to disk."""
+    with self._lock:
+      if self._file is not None:
+        self._file.flush()
+
+  def close(self) -> None:
+    """Flushes and closes the file. Later records are ignored."""
+    with self._lock:
+      file, self._file = self._file, None
+    if file is not None:
+      file.close()
+
+
+def read_capture(path: str) -> Iterator[CapturedFrame]:
+  """Yields the frames in a capture file, in recording order.
+
+  Raises:
+      CaptureError: If the file is not a capture or ends mid-record.
+  """
+  with open(path, "rb") as file:
+    if file.read(len(MAGIC)) != MAGIC:
+      raise CaptureError(f"{path} is not a capture file.")
+    while header := file.read(RECORD_HEADER.size):
+      if len(header) < RECORD_HEADER.size:
+        raise CaptureError(f"{path} ends in the middle of a record.")
+      direction, timestamp_ns, length = RECORD_HEADER.unpack(header)
+      frame = file.read(length)
+      if len(frame) < length:
+        raise CaptureError(f"{path} ends in the middle of a record.")
+      yield CapturedFrame(direction, timestamp_ns, frame)
+
+
+class ReplayStats(NamedTuple):
+  """The outcome of a replay."""
+
+  frames: int
+  elapsed: float  # Seconds
+  max_lag: float  # Worst delay behind the (scaled) schedule, in seconds
+
+
+def replay(
+  frames: Iterator[CapturedFrame] | list[CapturedFrame],
+  send: Callable[[bytes], None],
+  speed: float = 1.0,
+) -> ReplayStats:
+  """Calls `send` with each frame, keeping the recorded spacing.
+
+  Args:
+      frames: The frames to play, e.g. one direction of `read_capture`.
+      send: Called with each frame's bytes.
+      speed: Playback speed relative to the recording. 2 plays twice as
+          fast; 0 or less sends every frame as fast as possible.
+  """
+  count = 0
+  max_lag = 0.0
+  first_ns: int | None = None
+  start = time.perf_counter()
+  for captured in frames:
+    if first_ns is None:
+      first_ns = captured.timestamp_ns
+    if speed > 0:
+      due = start + (captured.timestamp_ns - first_ns) / 1e9 / speed
+      delay = due - time.perf_counter()
+      if delay > 0:
+        time.sleep(delay)
+      else:
+        max_lag = max(max_lag, -delay)
+    send(captured.frame)
+    count += 1
+  return ReplayStats(count, time.perf_counter() - start, max_lag)
@@ -0,0 +1,152 @@
+"""Logging that stays off the message hot paths.
+
+* `setup_queue_logging` sends records through a queue to a background thread
+  that writes a size-rotated file, so logging a record costs a queue put and
+  never waits on disk. `logging.handlers` is only imported on that thread,
+  which keeps it out of the proxy's start-up time.
+* `SampledDebugLog` is for events that happen once per message. It logs at
+  debug level, formats lazily, and only keeps every Nth record, so it costs a
+  level check when debug logging is off.
+* `MessageHistory` keeps the last few messages in memory, without formatting
+  them, and writes them to the log only when something goes wrong.
+"""
+
+import copy
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any
+
+DEFAULT_LOG_MAX_BYTES = 1024 * 1024
+DEFAULT_LOG_BACKUPS = 2
+DEFAULT_SAMPLE_EVERY = 100
+DEFAULT_HISTORY_SIZE = 64
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+
+class _QueueHandler(logging.Handler):
+  """Puts records on a queue, like `logging.handlers.QueueHandler`."""
+
+  def __init__(self, log_queue: "queue.SimpleQueue[logging.LogRecord | None]"):
+    super().__init__()
+    self.queue = log_queue
+
+  def emit(self, record: logging.LogRecord) -> None:
+    try:
+      # Merge the arguments now: they may change before the writer runs.
+      message = self.format(record)
+      record = copy.copy(record)
+      record.message = record.msg = message
+      record.args = record.exc_info = record.exc_text = record.stack_info = None
+      self.queue.put_nowait(record)
+    except Exception:
+      self.handleError(record)
+
+
+class QueueLogWriter:
+  """Writes queued records to a size-rotated file on a background thread."""
+
+  def __init__(
+    self,
+    log_queue: "queue.SimpleQueue[logging.LogRecord | None]",
+    path: str,
+    max_bytes: int = DEFAULT_LOG_MAX_BYTES,
+    backup_count: int = DEFAULT_LOG_BACKUPS,
+  ):
+    self.queue = log_queue
+    self.path = path
+    self.max_bytes = max_bytes
+    self.backup_count = backup_count
+    self._thread = threading.Thread(target=self._run, daemon=True)
+
+  def start(self) -> "QueueLogWriter":
+    self._thread.start()
+    return self
+
+  def stop(self, timeout: float | None = 1.0) -> None:
+    """Writes out what is still queued and stops the thread."""
+    self.queue.put(None)
+    self._thread.join(timeout)
+
+  def _run(self) -> None:
+    import logging.handlers
+
+    # The file is only opened when the first record is written.
+    handler = logging.handlers.RotatingFileHandler(
+      self.path,
+      maxBytes=self.max_bytes,
+      backupCount=self.backup_count,
+      delay=True,
+    )
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    try:
+      while (record := self.queue.get()) is not None:
+        handler.handle(record)
+    finally:
+      handler.close()
+
+
+def setup_queue_logging(
+  path: str,
+  level: int = logging.INFO,
+  max_bytes: int = DEFAULT_LOG_MAX_BYTES,
+  backup_count: int = DEFAULT_LOG_BACKUPS,
+) -> QueueLogWriter:
+  """Logs to a rotating file through a background writer thread.
+
+  Call `stop()` on the returned writer at exit to write out what is still
+  queued.
+  """
+  log_queue: queue.SimpleQueue[logging.LogRecord | None] = queue.SimpleQueue()
+  root_logger = logging.getLogger()
+  root_logger.addHandler(_QueueHandler(log_queue))
+  root_logger.setLevel(level)
+  return QueueLogWriter(log_queue, path, max_bytes, backup_count).start()
+
+
+class SampledDebugLog:
+  """Logs the first and then every Nth of a repeated event, at debug level."""
+
+  def __init__(self, logger: logging.Logger, every: int = DEFAULT_SAMPLE_EVERY):
+    self.logger = logger
+    self.every = every
+    self.count = 0
+
+  def __call__(self, msg: str, *args: Any) -> None:
+    """Counts one event, logging `msg % args` if it is sampled."""
+    if not self.logger.isEnabledFor(logging.DEBUG):
+      return
+    self.count += 1
+    if self.count % self.every == 1 or self.every == 1:
+      self.logger.debug(msg + " (#%d)", *args, self.count)
+
+
+class MessageHistory:
+  """A ring buffer of the most recent messages, dumped to the log on errors."""
+
+  def __init__(self, size: int = DEFAULT_HISTORY_SIZE):
+    self._entries: deque[tuple[float, str, Any]] = deque(maxlen=size)
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  def append(self, direction: str, message: Any) -> None:
+    """Remembers a message. It is only formatted if it is ever dumped."""
+    self._entries.append((time.monotonic(), direction, message))
+
+  def dump(self, logger: logging.Logger, reason: str) -> None:
+    """Logs the remembered messages, oldest first, as one error record."""
+    entries = list(self._entries)
+    if not entries:
+      return
+    now = time.monotonic()
+    lines = [
+      f"  {(timestamp - now) * 1000:9.1f} ms  {direction:<9} {message!r}"
+      for timestamp, direction, message in entries
+    ]
+    logger.error(
+      "%s; last %d messages:\n%s", reason, len(entries), "\n".join(lines)
+    )
@@ -0,0 +1,297 @@
+"""Latest-wins coalescing of status updates before they reach the actions.
+
+The content script reports state changes one control at a time, and a call
+starting (or `aria-pressed` flapping) produces bursts of them. Rendering each
+one immediately means several icon renders per key for what is, by the time
+the deck refreshes, a single final state. The dispatcher keeps only the newest
+state per control and hands the survivors to the actions at a bounded rate.
+
+`RenderStage` sits in front of it: the IPC reader thread only decodes frames
+and queues them, and validation, session routing and rendering happen on the
+render thread.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import Any
+
+from GoogleMeetPlugin.tracing import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# Roughly one deck refresh at 30 frames per second.
+DEFAULT_FLUSH_INTERVAL = 1 / 30
+
+
+class CoalescingDispatcher:
+  """Merges status updates per control and flushes them periodically.
+
+  Updates are recorded with `submit` from any thread. A background thread
+  flushes them one interval after the first update of a burst, so a burst
+  results in at most one `apply_callback` call per control. With an interval
+  of zero or less, every update is applied inline instead. A state of None
+  means the control's state is no longer known.
+  """
+
+  def __init__(
+    self,
+    apply_callback: Callable[[str, str | None], None],
+    flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+  ):
+    self.apply_callback = apply_callback
+    self.flush_interval = flush_interval
+    self._pending: dict[str, str | None] = {}
+    self._lock = threading.Lock()
+    self._wakeup = threading.Event()
+    self._stopped = threading.Event()
+    self._thread: threading.Thread | None = None
+
+    # Counters, exposed through `stats`.
+    self.received = 0
+    self.merged = 0
+    self.dispatched = 0
+    self.flushes = 0
+
+  def start(self) -> None:
+    """Starts the background flush thread."""
+    if self.flush_interval <= 0 or self._thread is not None:
+      return
+    self._thread = threading.Thread(
+      target=self._run, name="meet-status-dispatcher", daemon=True
+    )
+    self._thread.start()
+
+  def stop(self) -> None:
+    """Stops the flush thread after applying anything still pending."""
+    self._stopped.set()
+    self._wakeup.set()
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
+    self.flush()
+
+  def submit(self, control: str, state: str | None) -> None:
+    """Records the newest state of a control, replacing any pending one."""
+    with self._lock:
+      self._record(control, state)
+    self._schedule()
+
+  def submit_many(self, states: dict[str, str | None]) -> None:
+    """Records several control states at once, e.g. from a snapshot.
+
+    They are applied together in the next flush. A call ending is recorded
+    first, so the reset it causes does not undo the other states.
+    """
+    with self._lock:
+      if states.get("call") == "off":
+        self._record("call", "off")
+      for control, state in states.items():
+        if control != "call" or state != "off":
+          self._record(control, state)
+    self._schedule()
+
+  def _record(self, control: str, state: str | None) -> None:
+    self.received += 1
+    if control == "call" and state == "off":
+      # A call ending resets every control, so anything still pending is
+      # superseded by it.
+      self.merged += len(self._pending)
+      self._pending.clear()
+    elif control in self._pending:
+      self.merged += 1
+      del self._pending[control]
+    self._pending[control] = state
+
+  def _schedule(self) -> None:
+    if self.flush_interval <= 0:
+      self.flush()
+    else:
+      self._wakeup.set()
+
+  def flush(self) -> None:
+    """Applies all pending updates, in the order they were last submitted."""
+    with self._lock:
+      pending, self._pending = self._pending, {}
+      if not pending:
+        return
+      self.flushes += 1
+      self.dispatched += len(pending)
+
+    for control, state in pending.items():
+      try:
+        self.apply_callback(control, state)
+      except Exception:  # pylint: disable=broad-exception-caught
+        logger.exception(f"Error applying status update for {control}.")
+
+  def stats(self) -> dict[str, int]:
+    """Returns the dispatcher counters."""
+    with self._lock:
+      return {
+        "received": self.received,
+        "merged": self.merged,
+        "dispatched": self.dispatched,
+        "flushes": self.flushes,
+        "pending": len(self._pending),
+      }
+
+  def _run(self) -> None:
+    """Flushes one interval after the first update of each burst."""
+    while not self._stopped.is_set():
+      self._wakeup.wait()
+      if self._stopped.wait(self.flush_interval):
+        break
+      self._wakeup.clear()
+      self.flush()
+
+
+# What `RenderStage.put` does when the queue is full:
+# "block": wait for room, pushing back on the reader (and the socket).
+# "drop_oldest": discard the longest-waiting message to make room.
+# "drop_newest": discard the message being put.
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest")
+DEFAULT_RENDER_QUEUE_SIZE = 256
+DEFAULT_OVERFLOW_POLICY = "block"
+
+
+class RenderStage:
+  """Hands messages from the IPC reader thread to a render thread.
+
+  The reader only decodes frames and calls `put`, so a slow render or a busy
+  deck never stops it reading from the socket. The render thread runs the
+  queued callbacks in order. The queue is bounded; what happens when it is
+  full is set by `overflow` (see `OVERFLOW_POLICIES`). Entries put with
+  `droppable=False`, such as connection changes, are never dropped and do not
+  count towards the bound.
+  """
+
+  def __init__(
+    self,
+    maxsize: int = DEFAULT_RENDER_QUEUE_SIZE,
+    overflow: str = DEFAULT_OVERFLOW_POLICY,
+  ):
+    if overflow not in OVERFLOW_POLICIES:
+      raise ValueError(
+        f"Unknown overflow policy {overflow!r}, expected one of"
+        f" {', '.join(OVERFLOW_POLICIES)}."
+      )
+    self.maxsize = max(1, maxsize)
+    self.overflow = overflow
+    # (enqueued at, droppable, callback, args), oldest first.
+    self._queue: deque[tuple[float, bool, Callable[..., None], tuple]] = deque()
+    self._droppable = 0
+    self._lock = threading.Condition()
+    self._stopped = False
+    self._thread: threading.Thread | None = None
+
+    # Counters, exposed through `stats`. Wait times are in milliseconds.
+    self.received = 0
+    self.dropped = 0
+    self.processed = 0
+    self.max_depth = 0
+    self.wait_times = LatencyHistogram()
+
+  def start(self) -> None:
+    """Starts the render thread."""
+    if self._thread is not None:
+      return
+    self._thread = threading.Thread(
+      target=self._run, name="meet-render", daemon=True
+    )
+    self._thread.start()
+
+  def stop(self) -> None:
+    """Stops the render thread after running everything still queued."""
+    with self._lock:
+      self._stopped = True
+      self._lock.notify_all()
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
+    self.drain()
+
+  def put(
+    self, callback: Callable[..., None], *args: Any, droppable: bool = True
+  ) -> None:
+    """Queues `callback(*args)` for the render thread."""
+    with self._lock:
+      self.received += 1
+      if droppable and self._droppable >= self.maxsize:
+        if self.overflow == "drop_newest":
+          self._dropped()
+          return
+        if self.overflow == "drop_oldest":
+          self._drop_oldest()
+        else:
+          self._lock.wait_for(
+            lambda: self._droppable < self.maxsize or self._stopped
+          )
+      self._queue.append((time.perf_counter(), droppable, callback, args))
+      self._droppable += droppable
+      self.max_depth = max(self.max_depth, len(self._queue))
+      self._lock.notify_all()
+
+  def drain(self) -> None:
+    """Runs everything queued so far on the calling thread."""
+    while (entry := self._pop(wait=False)) is not None:
+      self._process(*entry)
+
+  def stats(self) -> dict[str, Any]:
+    """Returns the queue depth, counters and wait time percentiles."""
+    with self._lock:
+      return {
+        "depth": len(self._queue),
+        "max_depth": self.max_depth,
+        "received": self.received,
+        "dropped": self.dropped,
+        "processed": self.processed,
+        "wait_ms": {
+          "p50": self.wait_times.percentile(0.50),
+          "p99": self.wait_times.percentile(0.99),
+          "max": self.wait_times.max,
+        },
+      }
+
+  def _drop_oldest(self) -> None:
+    for index, (_, droppable, _, _) in enumerate(self._queue):
+      if droppable:
+        del self._queue[index]
+        self._droppable -= 1
+        self._dropped()
+        return
+
+  def _dropped(self) -> None:
+    self.dropped += 1
+    if self.dropped % 100 == 1:
+      logger.warning(
+        f"Render queue full ({self.maxsize}); {self.dropped} messages"
+        f" dropped so far ({self.overflow})."
+      )
+
+  def _pop(self, wait: bool) -> tuple[float, Callable[..., None], tuple] | None:
+    with self._lock:
+      if wait:
+        self._lock.wait_for(lambda: self._queue or self._stopped)
+      if not self._queue:
+        return None
+      enqueued_at, droppable, callback, args = self._queue.popleft()
+      self._droppable -= droppable
+      self.wait_times.add((time.perf_counter() - enqueued_at) * 1000)
+      self._lock.notify_all()
+      return enqueued_at, callback, args
+
+  def _process(
+    self, enqueued_at: float, callback: Callable[..., None], args: tuple
+  ) -> None:
+    try:
+      callback(*args)
+    except Exception:  # pylint: disable=broad-exception-caught
+      logger.exception("Error rendering a message from the proxy.")
+    with self._lock:
+      self.processed += 1
+
+  def _run(self) -> None:
+    while (entry := self._pop(wait=True)) is not None:
+      self._process(*entry)
@@ -0,0 +1,236 @@
+"""Length-prefixed framing for the plugin <-> proxy UNIX socket.
+
+Each frame is a native-endian unsigned 32-bit length followed by that many
+bytes of payload. This module has no plugin dependencies so that both the
+plugin (as `GoogleMeetPlugin.framing`) and the standalone proxy script (as
+`framing`) can import it.
+"""
+
+import logging
+import queue
+import socket
+import struct
+import threading
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct("@I")
+
+# Status updates and commands are a few dozen bytes; anything this large is a
+# corrupt stream rather than a real message.
+DEFAULT_MAX_FRAME_SIZE = 1024 * 1024
+
+# How much to ask the kernel for per read.
+DEFAULT_READ_SIZE = 64 * 1024
+
+# Frames waiting for the writer thread. Beyond this the peer is not keeping
+# up and new frames are dropped rather than blocking the caller.
+DEFAULT_MAX_QUEUED_FRAMES = 256
+
+# Frames packed into a single sendmsg call. Two iovecs are used per frame,
+# which keeps well below the usual IOV_MAX of 1024.
+DEFAULT_MAX_BATCH = 64
+
+_STOP = object()
+
+
+class FrameTooLargeError(ValueError):
+  """Raised when a frame header announces more than the allowed size."""
+
+
+class FrameDecoder:
+  """Incrementally splits a byte stream into length-prefixed frames.
+
+  Reads go straight into a reusable `bytearray` through a `memoryview`, in
+  chunks of up to `read_size` bytes. Every complete frame in the buffer is
+  returned at once, and a trailing partial frame is kept for the next read.
+  """
+
+  def __init__(
+    self,
+    max_frame_size: int = DEFAULT_MAX_FRAME_SIZE,
+    read_size: int = DEFAULT_READ_SIZE,
+  ):
+    self.max_frame_size = max_frame_size
+    self.read_size = read_size
+    self._buffer = bytearray(read_size)
+    self._start = 0
+    self._end = 0
+
+  @property
+  def pending(self) -> int:
+    """Number of buffered bytes that do not yet form a complete frame."""
+    return self._end - self._start
+
+  def read_from(self, sock: socket.socket) -> list[bytes] | None:
+    """Performs one read from the socket and returns the completed frames.
+
+    Returns None once the peer has closed the connection. The returned list
+    may be empty if the read only delivered part of a frame.
+    """
+    self._reserve(self.read_size)
+    with memoryview(self._buffer)[self._end :] as view:
+      received = sock.recv_into(view)
+    if not received:
+      return None
+    self._end += received
+    return self._extract()
+
+  def feed(self, data: bytes) -> list[bytes]:
+    """Appends already-received bytes and returns the completed frames."""
+    self._reserve(len(data))
+    self._buffer[self._end : self._end + len(data)] = data
+    self._end += len(data)
+    return self._extract()
+
+  def _extract(self) -> list[bytes]:
+    """Pops every complete frame off the front of the buffer."""
+    frames: list[bytes] = []
+    buffer = self._buffer
+    start, end = self._start, self._end
+    while end - start >= HEADER.size:
+      (length,) = HEADER.unpack_from(buffer, start)
+      if length > self.max_frame_size:
+        raise FrameTooLargeError(
+          f"Frame of {length} bytes exceeds the {self.max_frame_size} byte limit."
+        )
+      frame_end = start + HEADER.size + length
+      if frame_end > end:
+        break
+      frames.append(bytes(buffer[start + HEADER.size : frame_end]))
+      start = frame_end
+
+    if start == end:
+      start = end = 0
+    self._start, self._end = start, end
+    if end - start >= HEADER.size:
+      # Make sure the rest of a partially received frame will fit.
+      (length,) = HEADER.unpack_from(buffer, start)
+      self._reserve(HEADER.size + length - (end - start))
+    return frames
+
+  def _reserve(self, size: int) -> None:
+    """Makes room for `size` more bytes after the buffered data."""
+    if len(self._buffer) - self._end >= size:
+      return
+    pending = self._end - self._start
+    if self._start:
+      # Move the partial frame to the front before growing the buffer.
+      self._buffer[:pending] = self._buffer[self._start : self._end]
+      self._start, self._end = 0, pending
+    if len(self._buffer) - self._end < size:
+      self._buffer.extend(bytes(pending + size - len(self._buffer)))
+
+
+def encode_frame(payload: bytes) -> bytes:
+  """Prefixes a payload with its length."""
+  return HEADER.pack(len(payload)) + payload
+
+
+class FrameWriter:
+  """Writes length-prefixed frames to a socket from a dedicated thread.
+
+  `send` only enqueues, so callers such as the key-press handler never block
+  on the socket. The writer thread drains whatever has queued up and writes it
+  with one vectored `sendmsg` call. The writer owns the socket for writing;
+  once the connection fails it closes itself and drops further frames.
+  """
+
+  def __init__(
+    self,
+    sock: socket.socket,
+    max_queued_frames: int = DEFAULT_MAX_QUEUED_FRAMES,
+    max_batch: int = DEFAULT_MAX_BATCH,
+  ):
+    self.sock = sock
+    self.max_batch = max_batch
+    self._queue: queue.Queue[object] = queue.Queue(max_queued_frames)
+    self._closed = threading.Event()
+    self._thread = threading.Thread(
+      target=self._run, name="meet-frame-writer", daemon=True
+    )
+
+    # Counters
+    self.frames_sent = 0
+    self.frames_dropped = 0
+    self.syscalls = 0
+
+  @property
+  def closed(self) -> bool:
+    """Whether the writer has stopped, either on request or after an error."""
+    return self._closed.is_set()
+
+  def start(self) -> "FrameWriter":
+    """Starts the writer thread and returns the writer."""
+    self._thread.start()
+    return self
+
+  def send(self, payload: bytes) -> bool:
+    """Queues one frame. Returns False if it was dropped."""
+    if self._closed.is_set():
+      return False
+    try:
+      self._queue.put_nowait(payload)
+    except queue.Full:
+      self.frames_dropped += 1
+      # A stalled peer drops every frame; only log now and then.
+      if self.frames_dropped % 100 == 1:
+        logger.warning(
+          "Outgoing frame queue is full, %d frames dropped so far.",
+          self.frames_dropped,
+        )
+      return False
+    return True
+
+  def close(self, timeout: float | None = None) -> None:
+    """Stops the writer after the frames already queued have been sent."""
+    try:
+      self._queue.put_nowait(_STOP)
+    except queue.Full:
+      # The thread is busy draining and will see the flag.
+      self._closed.set()
+    if (
+      self._thread.is_alive() and self._thread is not threading.current_thread()
+    ):
+      self._thread.join(timeout)
+    self._closed.set()
+
+  def _run(self) -> None:
+    """Drains the queue in batches until stopped or the socket fails."""
+    while not self._closed.is_set():
+      batch = [self._queue.get()]
+      while len(batch) < self.max_batch:
+        try:
+          batch.append(self._queue.get_nowait())
+        except queue.Empty:
+          break
+
+      stop = _STOP in batch
+      payloads = [item for item in batch if item is not _STOP]
+      if payloads:
+        try:
+          self._send_batch(payloads)  # type: ignore[arg-type]
+        except OSError as e:
+          logger.warning(f"Could not send frames, socket connection lost: {e}")
+          self.frames_dropped += len(payloads)
+          break
+        self.frames_sent += len(payloads)
+      if stop:
+        break
+    self._closed.set()
+
+  def _send_batch(self, payloads: list[bytes]) -> None:
+    """Writes all frames with as few `sendmsg` calls as possible."""
+    buffers: list[bytes | memoryview] = []
+    for payload in payloads:
+      buffers.append(HEADER.pack(len(payload)))
+      buffers.append(payload)
+
+    while buffers:
+      sent = self.sock.sendmsg(buffers)
+      self.syscalls += 1
+      # Drop what was fully written and trim a partially written buffer.
+      while buffers and sent >= len(buffers[0]):
+        sent -= len(buffers.pop(0))
+      if sent:
+        buffers[0] = memoryview(buffers[0])[sent:]
@@ -0,0 +1,115 @@
+"""Process-wide cache of decoded, pre-scaled action icons.
+
+Every Meet key flips between the same handful of PNGs. Passing a path to
+`set_media` makes StreamController open and decode the file again on every
+state change, for every key on every deck. The cache decodes each icon once
+per key size and hands the same image to all action instances.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+try:
+  from PIL import Image
+except ImportError:  # Pillow ships with StreamController, but not with tests
+  Image = None
+
+logger = logging.getLogger(__name__)
+
+# Enough for every Meet icon at the largest Stream Deck key sizes.
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+
+IconKey = tuple[str, tuple[int, int] | None]
+
+
+def load_icon(path: str, size: tuple[int, int] | None) -> Any:
+  """Decodes an icon from disk, scaled to the given key size."""
+  if Image is None:
+    return None
+  with Image.open(path) as image:
+    icon = image.convert("RGBA")
+  if size is not None and icon.size != size:
+    icon = icon.resize(size, Image.Resampling.LANCZOS)
+  return icon
+
+
+def _image_bytes(image: Any) -> int:
+  """Estimates the memory held by a decoded image."""
+  width, height = image.size
+  return width * height * len(image.getbands())
+
+
+class IconCache:
+  """A thread-safe LRU cache of decoded icons with a memory cap.
+
+  Entries are keyed by icon path and key size. When the estimated size of the
+  cached images exceeds `max_bytes`, the least recently used ones are evicted.
+  """
+
+  def __init__(
+    self,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    loader: Callable[[str, tuple[int, int] | None], Any] = load_icon,
+  ):
+    self.max_bytes = max_bytes
+    self.loader = loader
+    self._entries: OrderedDict[IconKey, tuple[Any, int]] = OrderedDict()
+    self._lock = threading.Lock()
+    self.total_bytes = 0
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, path: str, size: tuple[int, int] | None = None) -> Any:
+    """Returns the decoded icon, loading it on first use.
+
+    Returns None if the icon cannot be decoded here (for example when Pillow
+    is unavailable), in which case callers should fall back to the path.
+    """
+    key = (path, size)
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None:
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+      self.misses += 1
+
+    # Decode outside the lock; a concurrent miss at worst decodes twice.
+    try:
+      image = self.loader(path, size)
+    except OSError as e:
+      logger.warning(f"Could not load icon {path}: {e}")
+      return None
+    if image is None:
+      return None
+
+    nbytes = _image_bytes(image)
+    with self._lock:
+      if key not in self._entries:
+        self._entries[key] = (image, nbytes)
+        self.total_bytes += nbytes
+        self._evict()
+    return image
+
+  def clear(self) -> None:
+    """Drops every cached icon."""
+    with self._lock:
+      self._entries.clear()
+      self.total_bytes = 0
+
+  def __len__(self) -> int:
+    with self._lock:
+      return len(self._entries)
+
+  def _evict(self) -> None:
+    """Evicts least recently used entries until under the memory cap."""
+    while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+      _, (_, nbytes) = self._entries.popitem(last=False)
+      self.total_bytes -= nbytes
+
+
+# Shared by all action instances on all decks.
+icon_cache = IconCache()
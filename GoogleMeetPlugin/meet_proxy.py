@@ -1,16 +1,37 @@
-import json
 import logging
 import os
+import random
 import socket
-import struct
-import sys
 import threading
+import time
 from typing import Any
 
-from pydantic import ValidationError
-
-from models import ActionCommand, StatusUpdate
+from capture import TO_PLUGIN, TO_PROXY, FrameRecorder
+from diagnostics import (
+  MessageHistory,
+  QueueLogWriter,
+  SampledDebugLog,
+  setup_queue_logging,
+)
+from framing import FrameDecoder, FrameTooLargeError, FrameWriter
 from native_messaging_handler import NativeMessagingHandler
+from status_filter import StatusFilter
+from tracing import PROXY_COMMAND, PROXY_STATUS, stamp
+from validation import (
+  MessageValidationError,
+  validate_command,
+  validate_status,
+)
+from wire import (
+  JSON,
+  SUPPORTED_ENCODINGS,
+  WireCodec,
+  WireError,
+  decode,
+  encode_json,
+  hello_offer,
+  is_hello,
+)
 
 # --- Configuration ---
 XDG_RUNTIME_DIR = os.getenv("XDG_RUNTIME_DIR", "/tmp")
@@ -20,89 +41,274 @@ SOCKET_PATH = os.path.join(
 
 LOG_FILE = "/tmp/streamcontroller-meet-proxy.log"
 
-# --- Logging Setup ---
-# Native Messaging uses stdout, so we must log to a file for debugging.
-logging.basicConfig(
-  filename=LOG_FILE,
-  level=logging.INFO,
-  format="%(asctime)s - %(levelname)s - %(message)s",
-)
+# Records the socket traffic to this file if set (see capture.py).
+CAPTURE_FILE = os.getenv("MEET_CAPTURE_FILE")
+
+# Reconnect delays in seconds. Each failed attempt doubles the delay, with
+# jitter, so a plugin that is just starting is picked up within milliseconds
+# while one that stays down is not polled in a tight loop.
+RECONNECT_INITIAL_DELAY = 0.002
+RECONNECT_MAX_DELAY = 0.25
+
+# Status messages from Chrome are kept while not connected to
+# StreamController: the latest state of each control, and up to this many
+# acks (the oldest are dropped first).
+MAX_PENDING_ACKS = 32
+
 logger = logging.getLogger(__name__)
+# Per-message events are sampled debug records; the recent messages
+# themselves are kept in memory and only logged when something fails.
+log_to_sc = SampledDebugLog(logger)
+log_from_sc = SampledDebugLog(logger)
+history = MessageHistory()
 
 # --- Globals ---
 sc_socket: socket.socket | None = None
+sc_writer: FrameWriter | None = None
+# Starts as JSON; switches once the plugin answers our hello.
+sc_codec = WireCodec()
+# Guards sc_writer and pending_messages between the Chrome and socket threads.
+sc_lock = threading.Lock()
+# Keyed by control, "snapshot" or ("ack", id), in the order they are sent.
+pending_messages: dict[Any, dict[str, Any]] = {}
+pending_dropped = 0
+# Repeats of the last forwarded state are not sent; guarded by sc_lock.
+status_filter = StatusFilter()
+# Set in main() when MEET_CAPTURE_FILE is.
+recorder: FrameRecorder | None = None
 
 
 def send_to_streamcontroller(message_from_chrome: dict[str, Any]) -> None:
   """Callback for NativeMessagingHandler. Forwards message to the main app via socket."""
+  global pending_dropped
+
   try:
     # Validate that the message from Chrome is a valid StatusUpdate
-    status = StatusUpdate.model_validate(message_from_chrome)
-    message_to_send = status.model_dump()
-  except ValidationError as e:
-    logger.error(f"Invalid message from Chrome, not forwarding: {e}")
+    message_to_send = validate_status(message_from_chrome)
+  except MessageValidationError as e:
+    history.append("from Chrome", message_from_chrome)
+    history.dump(logger, f"Invalid message from Chrome, not forwarding: {e}")
     return
 
-  if sc_socket:
-    try:
-      encoded_message = json.dumps(message_to_send).encode("utf-8")
-      length_prefix = struct.pack("@I", len(encoded_message))
-      sc_socket.sendall(length_prefix)
-      sc_socket.sendall(encoded_message)
-      logger.info(f"Sent to SC: {message_to_send}")
-    except (ConnectionResetError, BrokenPipeError):
-      logger.error("Connection to StreamController lost.")
-      sys.exit(1)
+  with sc_lock:
+    if not status_filter.forward(message_to_send):
+      return
+    stamp(message_to_send, PROXY_STATUS)
+    history.append("to SC", message_to_send)
+    if sc_writer is None or sc_writer.closed:
+      hold_pending(message_to_send)
+      return
+    send_frame(sc_writer, sc_codec.encode(message_to_send))
+  log_to_sc("Sent to SC: %s", message_to_send)
 
 
 chrome_handler = NativeMessagingHandler(send_to_streamcontroller)
 
 
+def hold_pending(message: dict[str, Any]) -> None:
+  """Keeps a status message until StreamController is connected again.
+
+  Only the latest state of each control is kept, and a snapshot or the call
+  ending replaces every state before it. Must be called with sc_lock held.
+  """
+  global pending_dropped
+
+  kind = message["status"]
+  if kind == "ack":
+    key: Any = ("ack", message["id"])
+    acks = [k for k in pending_messages if type(k) is tuple]
+    if len(acks) >= MAX_PENDING_ACKS:
+      if not pending_dropped:
+        logger.warning(
+          "Not connected to StreamController, dropping the oldest acks."
+        )
+      pending_dropped += 1
+      del pending_messages[acks[0]]
+  else:
+    call_ended = kind == "update" and (
+      message["control"] == "call" and message["state"] == "off"
+    )
+    if kind == "snapshot" or call_ended:
+      for k in [k for k in pending_messages if type(k) is not tuple]:
+        del pending_messages[k]
+    key = "snapshot" if kind == "snapshot" else message["control"]
+    # Re-inserted, so that it is sent after everything already held.
+    pending_messages.pop(key, None)
+  pending_messages[key] = message
+
+
+def send_frame(writer: FrameWriter, frame: bytes) -> None:
+  """Queues a frame for StreamController, recording it if enabled."""
+  if recorder:
+    recorder.record(TO_PLUGIN, frame)
+  writer.send(frame)
+
+
+def connect_with_backoff(socket_path: str) -> socket.socket:
+  """Connects to the plugin's socket, retrying until it is accepting.
+
+  The delay between attempts starts at `RECONNECT_INITIAL_DELAY` and doubles
+  up to `RECONNECT_MAX_DELAY`, with full jitter.
+  """
+  delay = RECONNECT_INITIAL_DELAY
+  warned = False
+  while True:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+      sock.connect(socket_path)
+      return sock
+    except OSError as e:
+      # Usually refused or not there yet; anything else (e.g. permissions)
+      # is logged once, but retried all the same.
+      if not warned and not isinstance(
+        e, (ConnectionRefusedError, FileNotFoundError)
+      ):
+        logger.warning(f"Cannot connect to StreamController: {e}")
+        warned = True
+      sock.close()
+    time.sleep(random.uniform(delay / 2, delay))
+    delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+
+def connect_to_streamcontroller() -> None:
+  """Connects, then sends the hello and any updates held while disconnected."""
+  global sc_socket, sc_writer, pending_dropped
+
+  sock = connect_with_backoff(SOCKET_PATH)
+  writer = FrameWriter(sock).start()
+  send_frame(writer, encode_json(hello_offer()))
+  with sc_lock:
+    # The plugin may have restarted with a different build; start from JSON.
+    sc_codec.encoding = JSON
+    for message in pending_messages.values():
+      send_frame(writer, sc_codec.encode(message))
+    pending_messages.clear()
+    # ...and does not know the states sent before, so send every update.
+    status_filter.reset()
+    sc_socket, sc_writer = sock, writer
+    dropped, pending_dropped = pending_dropped, 0
+  logger.info(f"Connected to StreamController at {SOCKET_PATH}.")
+  if dropped:
+    logger.warning(f"Dropped {dropped} acks while disconnected.")
+
+
+def disconnect_from_streamcontroller() -> None:
+  """Drops the current connection, if any."""
+  global sc_socket, sc_writer
+
+  with sc_lock:
+    sock, writer = sc_socket, sc_writer
+    sc_socket = sc_writer = None
+  if writer:
+    writer.close(timeout=1.0)
+  if sock:
+    sock.close()
+
+
+def maintain_streamcontroller_connection() -> None:
+  """Keeps the socket to StreamController up for as long as the proxy runs."""
+  while True:
+    connect_to_streamcontroller()
+    listen_to_streamcontroller()
+    disconnect_from_streamcontroller()
+    logger.info("Reconnecting to StreamController.")
+
+
 def listen_to_streamcontroller() -> None:
-  """Listens on the socket for messages from the main app and forwards them to Chrome."""
+  """Forwards messages from the main app to Chrome until the socket closes."""
 
   assert sc_socket is not None, "StreamController socket not initialized."
 
+  decoder = FrameDecoder()
   while True:
     try:
-      raw_length = sc_socket.recv(4)
-      if not raw_length:
-        break
-      message_length = struct.unpack("@I", raw_length)[0]
-      message_content = sc_socket.recv(message_length).decode("utf-8")
-      message = json.loads(message_content)
+      frames = decoder.read_from(sc_socket)
+      if frames is None:
+        logger.info("StreamController closed the connection.")
+        return
+    except FrameTooLargeError as e:
+      history.dump(logger, f"Corrupt stream from StreamController: {e}")
+      return
+    except OSError:
+      logger.info("Connection to StreamController lost.")
+      return
+
+    for frame in frames:
+      if recorder:
+        recorder.record(TO_PROXY, frame)
+      try:
+        message = decode(frame)
+      except (WireError, ValueError) as e:
+        # Includes JSON and UTF-8 errors. The stream cannot be trusted any
+        # more, so reconnect.
+        history.dump(logger, f"Undecodable frame from StreamController: {e}")
+        return
+      if is_hello(message):
+        encoding = message["hello"].get("encoding")
+        if encoding in SUPPORTED_ENCODINGS:
+          sc_codec.encoding = encoding
+          logger.info(f"Using {encoding} encoding with StreamController.")
+        continue
 
       # Validate that the message from the plugin is a valid ActionCommand
       try:
-        command = ActionCommand.model_validate(message)
-        message_to_send = command.model_dump()
-      except ValidationError as e:
-        logger.error(
-          f"Invalid command from plugin, not forwarding to Chrome: {e}"
+        message_to_send = validate_command(message)
+      except MessageValidationError as e:
+        history.append("from SC", message)
+        history.dump(
+          logger, f"Invalid command from plugin, not forwarding to Chrome: {e}"
         )
         continue
+      history.append("to Chrome", message_to_send)
+      stamp(message_to_send, PROXY_COMMAND)
       chrome_handler.send_message(message_to_send)
-      logger.info(f"Received from SC: {message_to_send}")
-    except (ConnectionResetError, BrokenPipeError, OSError):
-      logger.info("StreamController closed the connection. Exiting.")
-      sys.exit(0)
+      log_from_sc("Received from SC: %s", message_to_send)
 
 
-if __name__ == "__main__":
+def setup_logging() -> QueueLogWriter:
+  """Logs to a rotating file, since Native Messaging uses stdout.
+
+  Records are written by a background thread, so forwarding a message never
+  waits on the file, which is only opened when the first record is written.
+  Set MEET_PROXY_DEBUG=1 to include the sampled per-message records.
+  """
+  level = logging.DEBUG if os.getenv("MEET_PROXY_DEBUG") else logging.INFO
+  return setup_queue_logging(LOG_FILE, level=level)
+
+
+def main() -> None:
+  """Relays messages between Chrome and StreamController until Chrome hangs up.
+
+  Chrome's messages are read from the start, and held until the plugin's
+  socket is reachable. The socket is reconnected whenever it drops.
+  """
+  global recorder
+
+  log_writer = setup_logging()
   logger.info("Meet Proxy started by Chrome.")
-  try:
-    sc_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-    sc_socket.connect(SOCKET_PATH)
-  except (ConnectionRefusedError, FileNotFoundError):
-    logger.error(
-      f"Connection to StreamController at {SOCKET_PATH} refused or not found."
-    )
-    sys.exit(1)
+  if CAPTURE_FILE:
+    recorder = FrameRecorder(CAPTURE_FILE)
 
-  sc_listener_thread = threading.Thread(
-    target=listen_to_streamcontroller, daemon=True
+  sc_thread = threading.Thread(
+    target=maintain_streamcontroller_connection, daemon=True
   )
-  sc_listener_thread.start()
+  sc_thread.start()
 
   chrome_handler.listen()
   logger.info("Chrome connection closed. Proxy shutting down.")
+  with sc_lock:
+    writer = sc_writer
+    stats = status_filter.stats()
+  logger.info(
+    f"Forwarded {stats['forwarded']} status messages to StreamController,"
+    f" suppressed {stats['suppressed']} repeated states."
+  )
+  if writer:
+    writer.close(timeout=1.0)
+  if recorder:
+    recorder.close()
+  log_writer.stop()
+
+
+if __name__ == "__main__":
+  main()
@@ -2,14 +2,19 @@
 
 This module defines the Pydantic models used to validate the structure and
 content of messages exchanged between the plugin and the Chrome extension proxy.
-"""
 
-from typing import Literal
+The `Literal` vocabularies are plain module attributes. The pydantic models
+are only built the first time they are accessed, because importing pydantic
+dominates the start-up time of the proxy, which Chrome launches on every
+connection and which normally validates with `validation.py` instead.
+"""
 
-from pydantic import BaseModel, Field
+from typing import Any, Literal
 
 # Define all possible actions that can be sent to the Chrome extension.
 # These correspond to the keys in the SELECTORS object in content_script.js.
+# The binary socket encoding (wire.py) uses positions in this list and the
+# Literal types below, so new values must only ever be appended.
 ActionType = Literal[
   "toggle_mute",
   "toggle_camera",
@@ -34,17 +39,10 @@ ActionType = Literal[
   "send_reaction_thumb_down",
   "send_reaction_plus",
   "send_reaction_crab",
+  # Not a control: asks the content script for a StateSnapshot.
+  "request_snapshot",
 ]
 
-
-class ActionCommand(BaseModel):
-  """A command sent from the plugin to the Chrome extension."""
-
-  action: ActionType = Field(
-    ..., description="The action to be performed in Google Meet."
-  )
-
-
 # Define the types of controls whose status can be reported by the extension.
 ControlType = Literal[
   "microphone",
@@ -60,12 +58,104 @@ ControlType = Literal[
 # Define the possible states for a control.
 ControlState = Literal["on", "off"]
 
+# How the extension answered a command that carried an id (see acks.py).
+AckResult = Literal["ack", "not_found", "no_tab"]
+
+# The most times one command can ask for a reaction to be sent.
+MAX_COMMAND_COUNT = 10
+
+_models: dict[str, Any] = {}
+
+
+def _define_models() -> dict[str, Any]:
+  """Imports pydantic and defines the message models."""
+  from pydantic import BaseModel, Field, StrictFloat, StrictInt
+
+  class Trace(BaseModel):
+    """Latency tracing data carried on a command and echoed on its status."""
+
+    id: StrictInt = Field(
+      ..., description="Correlation id chosen by the plugin."
+    )
+    stamps: dict[str, StrictInt | StrictFloat] = Field(
+      ..., description="Millisecond timestamps by hop, each on its own clock."
+    )
+
+  class ActionCommand(BaseModel):
+    """A command sent from the plugin to the Chrome extension."""
+
+    action: ActionType = Field(
+      ..., description="The action to be performed in Google Meet."
+    )
+    trace: Trace | None = Field(None, description="Optional latency trace.")
+    id: StrictInt | None = Field(
+      None, description="Correlation id, answered with a CommandAck."
+    )
+    count: StrictInt | None = Field(
+      None,
+      ge=1,
+      le=MAX_COMMAND_COUNT,
+      description="How many times to send a reaction; once if not given.",
+    )
+
+  class StatusUpdate(BaseModel):
+    """A status update sent from the Chrome extension to the plugin."""
+
+    status: Literal["update"] = Field(
+      ...,
+      description="The type of message, always 'update' for status changes.",
+    )
+    control: ControlType = Field(
+      ..., description="The UI control that changed."
+    )
+    state: ControlState = Field(
+      ..., description="The new state of the control."
+    )
+    trace: Trace | None = Field(
+      None, description="The trace of the command that caused this change."
+    )
+
+  class StateSnapshot(BaseModel):
+    """Every control state the extension knows, sent in one message.
+
+    Sent when a call starts and in answer to a "request_snapshot" command.
+    """
+
+    status: Literal["snapshot"] = Field(
+      ..., description="The type of message, always 'snapshot'."
+    )
+    states: dict[ControlType, ControlState] = Field(
+      ..., description="The state of each control that could be determined."
+    )
+
+  class CommandAck(BaseModel):
+    """The extension's answer to a command that carried an id."""
+
+    status: Literal["ack"] = Field(
+      ..., description="The type of message, always 'ack'."
+    )
+    id: StrictInt = Field(..., description="The id of the command.")
+    result: AckResult = Field(..., description="What became of the command.")
+
+  return {
+    "ActionCommand": ActionCommand,
+    "CommandAck": CommandAck,
+    "StatusUpdate": StatusUpdate,
+    "StateSnapshot": StateSnapshot,
+    "Trace": Trace,
+  }
 
-class StatusUpdate(BaseModel):
-  """A status update sent from the Chrome extension to the plugin."""
 
-  status: Literal["update"] = Field(
-    ..., description="The type of message, always 'update' for status changes."
-  )
-  control: ControlType = Field(..., description="The UI control that changed.")
-  state: ControlState = Field(..., description="The new state of the control.")
+def __getattr__(name: str) -> Any:
+  """Builds the pydantic models on first access."""
+  if name in (
+    "ActionCommand",
+    "CommandAck",
+    "StatusUpdate",
+    "StateSnapshot",
+    "Trace",
+  ):
+    if not _models:
+      _models.update(_define_models())
+    return _models[name]
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
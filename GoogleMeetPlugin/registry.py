@@ -0,0 +1,70 @@
+"""Index of the live Meet action instances, keyed by action name.
+
+StreamController owns the action instances and creates or drops them as decks
+and pages change. The plugin only needs to reach the Meet keys that are
+currently alive, so this registry tracks them with weak references instead of
+walking every action on every deck.
+"""
+
+from __future__ import annotations
+
+import threading
+import weakref
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+  from GoogleMeetPlugin.actions.MeetActionBase import MeetActionBase
+
+
+class ActionRegistry:
+  """A thread-safe index from action name to live action instances.
+
+  Actions register themselves from `on_ready` and unregister when
+  StreamController drops them. Entries are held weakly, so an instance that is
+  discarded without unregistering simply disappears from the index.
+  """
+
+  def __init__(self) -> None:
+    self._lock = threading.Lock()
+    self._instances: dict[str, weakref.WeakSet[MeetActionBase]] = {}
+
+  def register(self, action: MeetActionBase) -> None:
+    """Adds an action instance to the index under its action name."""
+    with self._lock:
+      instances = self._instances.get(action.action_name)
+      if instances is None:
+        instances = weakref.WeakSet()
+        self._instances[action.action_name] = instances
+      instances.add(action)
+
+  def unregister(self, action: MeetActionBase) -> None:
+    """Removes an action instance from the index, if present."""
+    with self._lock:
+      instances = self._instances.get(action.action_name)
+      if instances is not None:
+        instances.discard(action)
+
+  def instances(self, action_name: str) -> list[MeetActionBase]:
+    """Returns a snapshot of the live instances for one action name.
+
+    The snapshot is a plain list so callers can iterate it without holding the
+    lock while StreamController adds or removes keys on another thread.
+    """
+    with self._lock:
+      instances = self._instances.get(action_name)
+      return list(instances) if instances else []
+
+  def instances_for(self, action_names: Iterable[str]) -> list[MeetActionBase]:
+    """Returns a snapshot of the live instances for several action names."""
+    with self._lock:
+      result: list[MeetActionBase] = []
+      for action_name in action_names:
+        instances = self._instances.get(action_name)
+        if instances:
+          result.extend(instances)
+      return result
+
+  def __len__(self) -> int:
+    with self._lock:
+      return sum(len(instances) for instances in self._instances.values())
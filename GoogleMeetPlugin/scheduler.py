@@ -0,0 +1,262 @@
+"""Rate limiting and collapsing of the commands sent on key presses.
+
+Every command becomes a click in Meet's DOM, so key bounce or someone mashing
+Toggle Mute should not turn into a stream of clicks. `CommandScheduler` sits
+between the actions and the socket:
+
+* Sending a command opens a window (`window` seconds) for that action. The
+  first press is always sent straight away, so a single press is not delayed.
+* Toggles pressed while the window is open are counted, and when it closes an
+  even number of them collapses into nothing and an odd number into one
+  command (which opens the next window).
+* With `hold_toggles`, the first toggle press is held for the window too, so
+  a key bounce sends nothing at all. The plugin only does this with
+  optimistic icons (see MeetActionBase), which hide the delay.
+* Idempotent commands such as `hang_up` pressed while the window is open are
+  duplicates and are dropped.
+* Every action has a token bucket (`rate` commands per second, up to `burst`
+  at once; a rate of 0 turns it off). A toggle or idempotent command without a token waits for one;
+  a reaction without a token is dropped.
+
+Key presses never block: `submit` either sends inline or records the press
+for the scheduler thread, which is only started once something is deferred.
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# Commands where pressing twice undoes the first press.
+TOGGLE_ACTIONS = frozenset(
+  {
+    "toggle_mute",
+    "toggle_camera",
+    "raise_hand",
+    "toggle_reactions",
+    "toggle_present",
+    "toggle_captions",
+    "toggle_fullscreen",
+    "toggle_chat_panel",
+    "toggle_participants_panel",
+  }
+)
+
+# Commands where pressing twice is the same as pressing once.
+IDEMPOTENT_ACTIONS = frozenset(
+  {
+    "hang_up",
+    "leave_call",
+    "stop_sharing",
+    "request_snapshot",
+  }
+)
+
+DEFAULT_WINDOW = 0.15
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 5
+
+
+@dataclass
+class _ActionState:
+  """Per-action scheduling state."""
+
+  tokens: float
+  refilled_at: float
+  window_end: float = 0.0
+  # Toggles: the parity of the presses not sent yet. Idempotent: 1 if one
+  # is waiting for a token.
+  pending: int = 0
+
+
+class CommandScheduler:
+  """Decides which key presses are sent, and when.
+
+  `send_callback` is called with the action name of every command that is
+  actually sent, inline from `submit` or from the scheduler thread, and with
+  a `count` keyword for a reaction that is to be sent several times.
+  """
+
+  def __init__(
+    self,
+    send_callback: Callable[..., None],
+    window: float = DEFAULT_WINDOW,
+    rate: float = DEFAULT_RATE,
+    burst: int = DEFAULT_BURST,
+    hold_toggles: bool = False,
+  ):
+    self.send_callback = send_callback
+    self.window = window
+    self.hold_toggles = hold_toggles
+    self.rate = rate
+    self.burst = max(1, burst)
+    self._states: dict[str, _ActionState] = {}
+    self._lock = threading.Condition()
+    self._stopped = False
+    self._thread: threading.Thread | None = None
+
+    # Counters, exposed through `stats`.
+    self.submitted = 0
+    self.sent = 0
+    self.collapsed = 0
+    self.deduplicated = 0
+    self.dropped = 0
+
+  def submit(self, action: str, count: int = 1) -> None:
+    """Records a key press, sending its command now if it is due.
+
+    `count` repeats a reaction in one command, which takes one token. It is
+    ignored for toggles and idempotent commands.
+    """
+    now = time.monotonic()
+    with self._lock:
+      self.submitted += 1
+      state = self._state(action, now)
+      window_open = now < state.window_end or state.pending
+      if action in TOGGLE_ACTIONS and (
+        window_open or (self.hold_toggles and self.window > 0)
+      ):
+        if not window_open:
+          state.window_end = now + self.window
+        self._defer_toggle(state)
+        return
+      if action in IDEMPOTENT_ACTIONS and window_open:
+        self.deduplicated += 1
+        return
+      if not self._take_token(state, now):
+        if action in TOGGLE_ACTIONS or action in IDEMPOTENT_ACTIONS:
+          # Sent by the scheduler thread once there is a token again.
+          state.pending = 1
+          state.window_end = now + self._token_wait(state)
+          self._wake()
+        else:
+          self.dropped += 1
+          if self.dropped % 100 == 1:
+            logger.warning(
+              f"Rate limiting {action}; {self.dropped} commands dropped so far."
+            )
+        return
+      state.window_end = now + self.window
+      self.sent += 1
+    self._send(action, count)
+
+  def flush(self) -> None:
+    """Sends every deferred command now, regardless of windows and tokens."""
+    with self._lock:
+      due = [action for action, state in self._states.items() if state.pending]
+      for action in due:
+        self._states[action].pending = 0
+      self.sent += len(due)
+    for action in due:
+      self._send(action)
+
+  def stop(self) -> None:
+    """Stops the scheduler thread after sending anything still deferred."""
+    with self._lock:
+      self._stopped = True
+      self._lock.notify_all()
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
+    self.flush()
+
+  def stats(self) -> dict[str, int]:
+    """Returns the scheduler counters."""
+    with self._lock:
+      return {
+        "submitted": self.submitted,
+        "sent": self.sent,
+        "collapsed": self.collapsed,
+        "deduplicated": self.deduplicated,
+        "dropped": self.dropped,
+        "pending": sum(bool(s.pending) for s in self._states.values()),
+      }
+
+  def _state(self, action: str, now: float) -> _ActionState:
+    state = self._states.get(action)
+    if state is None:
+      state = self._states[action] = _ActionState(self.burst, now)
+    return state
+
+  def _take_token(self, state: _ActionState, now: float) -> bool:
+    if self.rate <= 0:
+      return True  # Not rate limited
+    state.tokens = min(
+      self.burst, state.tokens + (now - state.refilled_at) * self.rate
+    )
+    state.refilled_at = now
+    if state.tokens < 1:
+      return False
+    state.tokens -= 1
+    return True
+
+  def _token_wait(self, state: _ActionState) -> float:
+    """Seconds until the bucket holds a token again."""
+    return max(0.0, (1 - state.tokens) / self.rate)
+
+  def _defer_toggle(self, state: _ActionState) -> None:
+    """Counts a toggle pressed while its window is open."""
+    if state.pending:
+      # Cancels the toggle that was waiting: two presses, no command.
+      self.collapsed += 2
+    state.pending ^= 1
+    if state.pending:
+      self._wake()
+
+  def _wake(self) -> None:
+    """Makes the scheduler thread (re)consider the deferred commands."""
+    if self._thread is None and not self._stopped:
+      self._thread = threading.Thread(
+        target=self._run, name="meet-command-scheduler", daemon=True
+      )
+      self._thread.start()
+    self._lock.notify_all()
+
+  def _due(self, now: float) -> tuple[list[str], float | None]:
+    """Takes the deferred commands whose window has closed.
+
+    Returns them with the time until the next window closes, if any.
+    """
+    due = []
+    next_wakeup = None
+    for action, state in self._states.items():
+      if not state.pending:
+        continue
+      if now < state.window_end:
+        wait = state.window_end - now
+      elif self._take_token(state, now):
+        state.pending = 0
+        state.window_end = now + self.window
+        due.append(action)
+        continue
+      else:
+        wait = self._token_wait(state)
+        state.window_end = now + wait
+      next_wakeup = wait if next_wakeup is None else min(next_wakeup, wait)
+    self.sent += len(due)
+    return due, next_wakeup
+
+  def _send(self, action: str, count: int = 1) -> None:
+    try:
+      if count > 1:
+        self.send_callback(action, count=count)
+      else:
+        self.send_callback(action)
+    except Exception:  # pylint: disable=broad-exception-caught
+      logger.exception(f"Error sending {action}.")
+
+  def _run(self) -> None:
+    """Sends deferred commands as their windows close."""
+    while True:
+      with self._lock:
+        due, next_wakeup = self._due(time.monotonic())
+        if not due:
+          if self._stopped:
+            return
+          self._lock.wait(next_wakeup)
+          continue
+      for action in due:
+        self._send(action)
@@ -0,0 +1,123 @@
+"""Registry of connected proxy sessions and the routing policy between them.
+
+Every Chrome profile (or browser) with the extension starts its own proxy, so
+the plugin may have several connections at once. Only one of them is usually
+in a Meet call, and that is where key presses should go and whose state the
+icons should show.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Literal
+
+# How to pick a session when more than one is in a call:
+# "most_recent": the one that joined its call last.
+# "earliest": the one that joined its call first.
+# Either way the routed session only changes when a call starts or ends, not
+# with every state a session reports.
+RoutingPolicy = Literal["most_recent", "earliest"]
+
+
+@dataclass
+class Session:
+  """One connected proxy and the last state it reported."""
+
+  session_id: int
+  connected_at: float
+  in_call: bool = False
+  call_started_at: float = 0.0
+  states: dict[str, str] = field(default_factory=dict)
+
+
+class SessionRegistry:
+  """Tracks connected sessions and picks the one commands are routed to.
+
+  The routed session is the one in a call, chosen by `policy` when several
+  are. When no session is in a call, the most recently connected one is used
+  so that commands are still delivered somewhere sensible.
+  """
+
+  def __init__(self, policy: RoutingPolicy = "most_recent"):
+    self.policy = policy
+    self._sessions: dict[int, Session] = {}
+    self._lock = threading.Lock()
+
+  def connect(self, session_id: int) -> None:
+    """Records a newly connected session."""
+    with self._lock:
+      self._sessions[session_id] = Session(session_id, time.monotonic())
+
+  def disconnect(self, session_id: int) -> None:
+    """Forgets a session that has disconnected."""
+    with self._lock:
+      self._sessions.pop(session_id, None)
+
+  def update(self, session_id: int, control: str, state: str) -> None:
+    """Records a state reported by a session, including its in-call state."""
+    now = time.monotonic()
+    with self._lock:
+      session = self._sessions.get(session_id)
+      if session is None:
+        # Servers without connection events report a session implicitly.
+        session = Session(session_id, now)
+        self._sessions[session_id] = session
+
+      if control == "call" and state == "off":
+        session.in_call = False
+        session.states.clear()
+        return
+      if control != "call":
+        session.states[control] = state
+      # An "off" can trail the end of a call (e.g. presenting), so only a
+      # call start or a control turning on marks the session as in a call.
+      if state == "on" and not session.in_call:
+        session.in_call = True
+        session.call_started_at = now
+
+  def replace_states(self, session_id: int, states: dict[str, str]) -> None:
+    """Records a state snapshot from a session, replacing what it reported."""
+    now = time.monotonic()
+    with self._lock:
+      session = self._sessions.get(session_id)
+      if session is None:
+        session = Session(session_id, now)
+        self._sessions[session_id] = session
+      session.states = {c: s for c, s in states.items() if c != "call"}
+      if states.get("call") == "off":
+        session.in_call = False
+        session.states.clear()
+      elif "on" in states.values() and not session.in_call:
+        session.in_call = True
+        session.call_started_at = now
+
+  def target(self) -> Session | None:
+    """Returns the session that commands should be routed to."""
+    with self._lock:
+      return self._target()
+
+  def target_id(self) -> int | None:
+    """Returns the id of the routed session, or None if none is connected."""
+    with self._lock:
+      target = self._target()
+      return target.session_id if target else None
+
+  def states(self, session_id: int) -> dict[str, str]:
+    """Returns a copy of the last states reported by a session."""
+    with self._lock:
+      session = self._sessions.get(session_id)
+      return dict(session.states) if session else {}
+
+  def __len__(self) -> int:
+    with self._lock:
+      return len(self._sessions)
+
+  def _target(self) -> Session | None:
+    in_call = [s for s in self._sessions.values() if s.in_call]
+    if in_call:
+      if self.policy == "earliest":
+        return min(in_call, key=lambda s: s.call_started_at)
+      return max(in_call, key=lambda s: s.call_started_at)
+    if self._sessions:
+      return max(self._sessions.values(), key=lambda s: s.connected_at)
+    return None
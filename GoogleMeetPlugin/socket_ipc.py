@@ -1,94 +1,196 @@
-import json
+import contextlib
+import itertools
 import logging
 import os
 import socket
-import struct
-import threading
 from collections.abc import Callable
 from typing import Any
 
+from GoogleMeetPlugin.capture import TO_PLUGIN, TO_PROXY, FrameRecorder
+from GoogleMeetPlugin.framing import (
+  FrameDecoder,
+  FrameTooLargeError,
+  FrameWriter,
+)
+from GoogleMeetPlugin.wire import (
+  WireCodec,
+  encode_json,
+  hello_reply,
+  is_hello,
+  negotiate,
+)
+
 logger = logging.getLogger(__name__)
 
 
+def bind_unix_socket(socket_path: str) -> socket.socket:
+  """Creates a UNIX stream socket bound to `socket_path`.
+
+  Any stale socket file left behind by a previous run is removed, and the
+  parent directory is created if needed.
+  """
+  server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+  # Clean up old socket file if it exists
+  try:
+    if os.path.exists(socket_path):
+      os.unlink(socket_path)
+  except OSError as e:
+    logger.error(f"Error removing existing socket file {socket_path}: {e}")
+    raise
+
+  # Ensure the directory for the socket exists
+  socket_dir = os.path.dirname(socket_path)
+  os.makedirs(socket_dir, exist_ok=True)
+
+  server_socket.bind(socket_path)
+  return server_socket
+
+
 class SocketIPCServer:
   """A simple socket server to communicate with a single client (the proxy).
 
-  This class sets up a UNIX domain socket and listens for a single client
-  connection. It is responsible for sending and receiving messages to/from the
-  Chrome extension proxy.
+  This class sets up a UNIX domain socket and serves one client connection at
+  a time. It is responsible for sending and receiving messages to/from the
+  Chrome extension proxy. When the proxy goes away the server goes back to
+  accepting, so a restarted proxy can reconnect straight away.
   """
 
   def __init__(
     self,
     socket_path: str,
-    message_callback: Callable[[dict[str, Any]], None],
+    message_callback: Callable[[dict[str, Any], int], None],
+    connection_callback: Callable[[int, bool], None] | None = None,
+    recorder: FrameRecorder | None = None,
   ):
+    """
+    Args:
+        socket_path: Where to bind the UNIX socket.
+        message_callback: Called with each decoded message and the id of the
+            session (connection) it arrived on.
+        connection_callback: Optionally called with a session id and True
+            when a client connects, or False when it disconnects.
+        recorder: Optionally records every frame sent and received.
+    """
     self.socket_path = socket_path
     self.message_callback = message_callback
+    self.connection_callback = connection_callback
+    self.recorder = recorder
+    self.session_id: int | None = None
+    self._session_ids = itertools.count(1)
     self.client_socket: socket.socket | None = None
-    self.server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-    self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-
-    # Clean up old socket file if it exists
-    try:
-      if os.path.exists(self.socket_path):
-        os.unlink(self.socket_path)
-    except OSError as e:
-      logger.error(
-        f"Error removing existing socket file {self.socket_path}: {e}"
-      )
-      raise
-
-    # Ensure the directory for the socket exists
-    socket_dir = os.path.dirname(self.socket_path)
-    os.makedirs(socket_dir, exist_ok=True)
-
-    self.server_socket.bind(self.socket_path)
+    self.writer: FrameWriter | None = None
+    self.codec = WireCodec()
+    self.closed = False
+    self.server_socket = bind_unix_socket(socket_path)
 
   def listen(self) -> None:
-    """Listens for a single client connection and handles messages."""
+    """Accepts client connections one after another until closed."""
     self.server_socket.listen(1)
     logger.info(f"SocketIPCServer listening on {self.socket_path}")
-    # This will block until the proxy connects.
-    self.client_socket, addr = self.server_socket.accept()
-    logger.info(f"SocketIPCServer accepted connection from {addr}")
-    self._handle_client()
+    while not self.closed:
+      try:
+        # This will block until the proxy connects.
+        client_socket, addr = self.server_socket.accept()
+      except OSError:
+        # Closed via close(), or the socket was closed underneath us.
+        if self.closed or self.server_socket.fileno() == -1:
+          break
+        logger.exception("Error accepting connection from proxy.")
+        continue
+      self.client_socket = client_socket
+      self.writer = FrameWriter(client_socket).start()
+      self.codec = WireCodec()
+      self.session_id = next(self._session_ids)
+      logger.info(f"SocketIPCServer accepted connection from {addr}")
+      if self.connection_callback:
+        self.connection_callback(self.session_id, True)
+      self._handle_client()
+
+  def close(self) -> None:
+    """Stops accepting and disconnects the current client, from any thread."""
+    self.closed = True
+    # Wakes up a blocked accept() or recv().
+    with contextlib.suppress(OSError):
+      self.server_socket.shutdown(socket.SHUT_RDWR)
+    self.server_socket.close()
+    client_socket = self.client_socket
+    if client_socket:
+      with contextlib.suppress(OSError):
+        client_socket.shutdown(socket.SHUT_RDWR)
 
   def _handle_client(self) -> None:
     """Reads messages from the connected client in a loop."""
+    decoder = FrameDecoder()
     while self.client_socket:
       try:
-        raw_length = self.client_socket.recv(4)
-        if not raw_length:
+        frames = decoder.read_from(self.client_socket)
+        if frames is None:
+          if decoder.pending:
+            logger.warning("Proxy disconnected in the middle of a frame.")
           break
 
-        message_length = struct.unpack("@I", raw_length)[0]
-        message_content = self.client_socket.recv(message_length).decode(
-          "utf-8"
-        )
-        message = json.loads(message_content)
-        self.message_callback(message)
+        for frame in frames:
+          if self.recorder:
+            self.recorder.record(TO_PLUGIN, frame)
+          message = self.codec.decode(frame)
+          if is_hello(message):
+            self._handle_hello(message)
+            continue
+          self.message_callback(message, self.session_id)
       except (ConnectionResetError, BrokenPipeError):
         logger.warning("Socket connection with proxy lost.")
         break
+      except FrameTooLargeError as e:
+        logger.error(f"Dropping connection with proxy: {e}")
+        break
       except Exception:
         logger.exception("Error handling message from socket client.")
         break
-    self.client_socket = None
+    # Let the writer finish with the socket before closing it.
+    writer, self.writer = self.writer, None
+    if writer:
+      writer.close(timeout=1.0)
+    client_socket, self.client_socket = self.client_socket, None
+    if client_socket:
+      client_socket.close()
+    if self.recorder:
+      self.recorder.flush()
+    session_id, self.session_id = self.session_id, None
+    if self.connection_callback and session_id is not None:
+      self.connection_callback(session_id, False)
     logger.info("Client disconnected. Ready for new connection.")
-    # Optional: loop back to self.listen() if you want to accept new connections
-    # without restarting the whole plugin. For simplicity, we stop here.
 
-  def send_message(self, message: dict[str, Any]) -> None:
-    """Sends a message to the connected client."""
-    if not self.client_socket:
+  def _handle_hello(self, offer: dict[str, Any]) -> None:
+    """Answers the proxy's handshake and switches to the agreed encoding."""
+    codec = negotiate(offer)
+    if self.writer:
+      self._send_frame(self.writer, encode_json(hello_reply(codec.encoding)))
+    self.codec = codec
+    logger.info(f"Using {codec.encoding} encoding with the proxy.")
+
+  def send_message(
+    self, message: dict[str, Any], session_id: int | None = None
+  ) -> None:
+    """Queues a message for the connected client without blocking.
+
+    The frame is written by the connection's writer thread, so this is safe to
+    call from any thread, including while the reader is tearing down.
+
+    Args:
+        message: The message to send.
+        session_id: If given, only send if that session is still connected.
+    """
+    writer = self.writer
+    if writer is None or writer.closed:
       return
+    if session_id is not None and session_id != self.session_id:
+      return
+
+    self._send_frame(writer, self.codec.encode(message))
 
-    try:
-      encoded_message = json.dumps(message).encode("utf-8")
-      length_prefix = struct.pack("@I", len(encoded_message))
-      self.client_socket.sendall(length_prefix)
-      self.client_socket.sendall(encoded_message)
-    except (ConnectionResetError, BrokenPipeError):
-      logger.warning("Could not send message, socket connection lost.")
-      self.client_socket = None
+  def _send_frame(self, writer: FrameWriter, frame: bytes) -> None:
+    if self.recorder:
+      self.recorder.record(TO_PROXY, frame)
+    writer.send(frame)
@@ -0,0 +1,131 @@
+"""The plugin's record of the routed Meet call's control states.
+
+Every key used to remember only its own state, so a key that appeared in the
+middle of a call (a new key, or a page switched back to) showed the unknown
+icon until its control happened to change again. `MeetState` is the one
+place the states reported for the routed session are kept, so a key can show
+the right icon as soon as it is ready.
+
+Each change bumps a version number. The store also remembers which version of
+its control each key has shown, so re-sending a state that a key already
+shows does not render it again.
+"""
+
+import threading
+import weakref
+from typing import Any
+
+# Maps a reported control to the action whose icon reflects it.
+# 'reactions' has a status but no corresponding resettable action state
+# in the same way. It's a toggle for a panel.
+STATUS_ACTION_MAP = {
+  "microphone": "toggle_mute",
+  "camera": "toggle_camera",
+  "hand": "raise_hand",
+  "presenting": "toggle_present",
+  "chat_panel": "toggle_chat_panel",
+  "participants_panel": "toggle_participants_panel",
+}
+ACTION_CONTROLS = {
+  action: control for control, action in STATUS_ACTION_MAP.items()
+}
+
+
+class MeetState:
+  """A versioned, thread-safe map from control to its last known state.
+
+  Keys (the "viewers") are held weakly, like in `ActionRegistry`, and are
+  identified by their `action_name`.
+  """
+
+  def __init__(self) -> None:
+    self._lock = threading.Lock()
+    self._states: dict[str, str] = {}
+    # control -> the version at which its state last changed.
+    self._versions: dict[str, int] = {}
+    self._seen: weakref.WeakKeyDictionary[Any, int] = (
+      weakref.WeakKeyDictionary()
+    )
+    self.version = 0
+
+    # Counters, exposed through `stats`.
+    self.updates = 0
+    self.renders = 0
+    self.skipped = 0
+
+  def update(self, control: str, state: str) -> bool:
+    """Records a control's state. Returns whether it changed."""
+    with self._lock:
+      self.updates += 1
+      if self._states.get(control) == state:
+        return False
+      self.version += 1
+      self._states[control] = state
+      self._versions[control] = self.version
+      return True
+
+  def forget(self, control: str) -> bool:
+    """Makes a control's state unknown again. Returns whether it was known."""
+    with self._lock:
+      self.updates += 1
+      if self._states.pop(control, None) is None:
+        return False
+      self.version += 1
+      self._versions[control] = self.version
+      return True
+
+  def get(self, control: str) -> str | None:
+    """Returns a control's last known state, or None if it is unknown."""
+    with self._lock:
+      return self._states.get(control)
+
+  def states(self) -> dict[str, str]:
+    """Returns a copy of every known state."""
+    with self._lock:
+      return dict(self._states)
+
+  def read(self, viewer: Any) -> str | None:
+    """Returns the state a key should show, and marks it as shown.
+
+    Returns None for keys without a control, and while the state of the
+    key's control is unknown.
+    """
+    control = ACTION_CONTROLS.get(viewer.action_name)
+    if control is None:
+      return None
+    with self._lock:
+      state = self._states.get(control)
+      if state is not None:
+        self._mark(viewer, self._versions[control])
+      return state
+
+  def claim(self, viewer: Any, control: str) -> bool:
+    """Whether a key still has to render the current state of `control`.
+
+    The key is marked as having shown it, so only the first caller gets True
+    for each change.
+    """
+    with self._lock:
+      version = self._versions.get(control, 0)
+      if self._seen.get(viewer, -1) >= version:
+        self.skipped += 1
+        return False
+      self._mark(viewer, version)
+      self.renders += 1
+      return True
+
+  def stats(self) -> dict[str, int]:
+    """Returns the store counters."""
+    with self._lock:
+      return {
+        "version": self.version,
+        "updates": self.updates,
+        "renders": self.renders,
+        "skipped": self.skipped,
+      }
+
+  def _mark(self, viewer: Any, version: int) -> None:
+    # A key can be marked from on_ready and from the dispatcher at once;
+    # never go back to an older version.
+    if self._seen.get(viewer, -1) < version:
+      self._seen[viewer] = version
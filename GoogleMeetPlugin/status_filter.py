@@ -0,0 +1,52 @@
+"""Drops status updates that repeat the last state forwarded for a control.
+
+The content script reports some states again without them changing, e.g. on
+every `aria-pressed` mutation, or "presenting" off when a call ends. The proxy
+remembers the last state it forwarded for each control and does not send the
+plugin an exact repeat.
+
+Only plain updates are filtered. Snapshots, acknowledgements and updates
+carrying a latency trace are always forwarded, and snapshots replace what is
+remembered.
+"""
+
+from typing import Any
+
+
+class StatusFilter:
+  """The last forwarded state of each control, and what was dropped.
+
+  Not thread-safe; the proxy calls it while holding its socket lock.
+  """
+
+  def __init__(self) -> None:
+    self._states: dict[str, str] = {}
+
+    # Counters, exposed through `stats`.
+    self.forwarded = 0
+    self.suppressed = 0
+
+  def forward(self, message: dict[str, Any]) -> bool:
+    """Whether a validated status message should be sent on."""
+    kind = message.get("status")
+    if kind == "update":
+      control, state = message["control"], message["state"]
+      if control == "call" and state == "off":
+        # Nothing reported during the call still holds.
+        self._states.clear()
+      elif "trace" not in message and self._states.get(control) == state:
+        self.suppressed += 1
+        return False
+      self._states[control] = state
+    elif kind == "snapshot":
+      self._states = dict(message["states"])
+    self.forwarded += 1
+    return True
+
+  def reset(self) -> None:
+    """Forgets the forwarded states, e.g. for a new connection."""
+    self._states.clear()
+
+  def stats(self) -> dict[str, int]:
+    """Returns the filter counters."""
+    return {"forwarded": self.forwarded, "suppressed": self.suppressed}
@@ -0,0 +1,210 @@
+"""Key press to icon latency tracing.
+
+When tracing is enabled, the plugin attaches a `trace` to each command:
+
+    {"action": "toggle_mute", "trace": {"id": 7, "stamps": {"plugin.command": 1.5}}}
+
+Every hop adds a millisecond timestamp when the command passes through it
+(plugin, proxy, background script, content script), and the content script
+copies the trace onto the status update its click causes, which collects the
+same stamps on the way back. The plugin finally stamps the moment the icon was
+updated.
+
+The hops do not share a clock: the plugin and proxy use the system monotonic
+clock, while each extension context has its own `performance.now()`. Only
+differences between two stamps of the same hop are used, and nesting them
+splits the round trip into segments:
+
+    socket     plugin <-> proxy, both directions
+    native     proxy <-> background script (native messaging)
+    extension  background <-> content script (extension messaging)
+    dom        click until Meet reflects it and the observer reports it
+    dispatch   status arrival until the icon is updated (coalescing, render)
+    total      key press until the icon is updated
+
+Each segment is aggregated per action into a log-bucketed histogram, which
+`LatencyTracer.report` turns into p50/p95/p99 figures.
+"""
+
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+# Hop names, in the order a command and its status pass through them.
+PLUGIN_COMMAND = "plugin.command"
+PROXY_COMMAND = "proxy.command"
+BACKGROUND_COMMAND = "background.command"
+CONTENT_COMMAND = "content.command"
+CONTENT_STATUS = "content.status"
+BACKGROUND_STATUS = "background.status"
+PROXY_STATUS = "proxy.status"
+PLUGIN_STATUS = "plugin.status"
+PLUGIN_ICON = "plugin.icon"
+
+# Traces whose status has not come back by then are forgotten.
+DEFAULT_TRACE_TIMEOUT = 10.0
+DEFAULT_MAX_IN_FLIGHT = 256
+
+# Histogram buckets grow by 5%, from 10 µs to far beyond any real latency.
+_BUCKET_BASE = 0.01
+_BUCKET_GROWTH = 1.05
+_BUCKET_COUNT = 512
+_LOG_GROWTH = math.log(_BUCKET_GROWTH)
+
+
+def now_ms() -> float:
+  """The monotonic clock in milliseconds, as used by the Python hops."""
+  return time.monotonic_ns() / 1e6
+
+
+def stamp(message: dict[str, Any], hop: str) -> None:
+  """Adds a timestamp for `hop` to a message's trace, if it has one."""
+  trace = message.get("trace")
+  if trace is not None:
+    trace["stamps"][hop] = now_ms()
+
+
+def segments(stamps: dict[str, float]) -> dict[str, float]:
+  """Splits a completed trace into the time spent in each segment (ms).
+
+  Segments whose stamps are missing, e.g. because a hop predates tracing,
+  are left out.
+  """
+
+  def span(start: str, end: str) -> float | None:
+    if start in stamps and end in stamps:
+      return stamps[end] - stamps[start]
+    return None
+
+  plugin = span(PLUGIN_COMMAND, PLUGIN_STATUS)
+  proxy = span(PROXY_COMMAND, PROXY_STATUS)
+  background = span(BACKGROUND_COMMAND, BACKGROUND_STATUS)
+  content = span(CONTENT_COMMAND, CONTENT_STATUS)
+
+  result = {
+    "total": span(PLUGIN_COMMAND, PLUGIN_ICON),
+    "dispatch": span(PLUGIN_STATUS, PLUGIN_ICON),
+    "dom": content,
+  }
+  if plugin is not None and proxy is not None:
+    result["socket"] = plugin - proxy
+  if proxy is not None and background is not None:
+    result["native"] = proxy - background
+  if background is not None and content is not None:
+    result["extension"] = background - content
+  return {name: value for name, value in result.items() if value is not None}
+
+
+class LatencyHistogram:
+  """A fixed-size histogram of millisecond latencies with 5% resolution."""
+
+  def __init__(self) -> None:
+    self.counts = [0] * _BUCKET_COUNT
+    self.count = 0
+    self.max = 0.0
+
+  def add(self, value_ms: float) -> None:
+    """Records one latency."""
+    if value_ms <= _BUCKET_BASE:
+      index = 0
+    else:
+      index = min(
+        int(math.log(value_ms / _BUCKET_BASE) / _LOG_GROWTH) + 1,
+        _BUCKET_COUNT - 1,
+      )
+    self.counts[index] += 1
+    self.count += 1
+    self.max = max(self.max, value_ms)
+
+  def percentile(self, fraction: float) -> float:
+    """The upper bound of the bucket holding the given fraction of samples."""
+    if not self.count:
+      return 0.0
+    rank = max(1, math.ceil(fraction * self.count))
+    seen = 0
+    for index, count in enumerate(self.counts):
+      seen += count
+      if seen >= rank:
+        return min(_BUCKET_BASE * _BUCKET_GROWTH**index, self.max)
+    return self.max
+
+
+class LatencyTracer:
+  """Issues traces for commands and aggregates the ones that come back.
+
+  All methods are thread-safe: commands are traced from key presses, status
+  updates arrive on the IPC thread and icons are updated by the dispatcher.
+  """
+
+  def __init__(
+    self,
+    timeout: float = DEFAULT_TRACE_TIMEOUT,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+  ):
+    self.timeout = timeout
+    self.max_in_flight = max_in_flight
+    self._ids = itertools.count(1)
+    self._lock = threading.Lock()
+    # id -> (action, deadline), oldest first.
+    self._in_flight: OrderedDict[int, tuple[str, float]] = OrderedDict()
+    # control -> (action, stamps) waiting for the icon to be updated.
+    self._awaiting_icon: dict[str, tuple[str, dict[str, float]]] = {}
+    self._histograms: dict[str, dict[str, LatencyHistogram]] = {}
+
+  def start(self, action: str) -> dict[str, Any]:
+    """Creates the trace to attach to a command that is about to be sent."""
+    trace_id = next(self._ids)
+    now = now_ms()
+    with self._lock:
+      self._expire(now)
+      self._in_flight[trace_id] = (action, now + self.timeout * 1000)
+      while len(self._in_flight) > self.max_in_flight:
+        self._in_flight.popitem(last=False)
+    return {"id": trace_id, "stamps": {PLUGIN_COMMAND: now}}
+
+  def status_received(self, control: str, trace: dict[str, Any]) -> None:
+    """Notes the echoed trace on a status update that just arrived."""
+    stamps = trace["stamps"]
+    stamps[PLUGIN_STATUS] = now_ms()
+    with self._lock:
+      entry = self._in_flight.pop(trace["id"], None)
+      if entry is not None:
+        self._awaiting_icon[control] = (entry[0], stamps)
+
+  def icon_updated(self, control: str) -> None:
+    """Completes the trace waiting on `control`, if any."""
+    with self._lock:
+      entry = self._awaiting_icon.pop(control, None)
+      if entry is None:
+        return
+      action, stamps = entry
+      stamps[PLUGIN_ICON] = now_ms()
+      histograms = self._histograms.setdefault(action, {})
+      for name, value in segments(stamps).items():
+        histograms.setdefault(name, LatencyHistogram()).add(value)
+
+  def report(self) -> dict[str, dict[str, dict[str, float]]]:
+    """Per-action, per-segment sample count and p50/p95/p99 in ms."""
+    with self._lock:
+      return {
+        action: {
+          name: {
+            "count": histogram.count,
+            "p50": histogram.percentile(0.50),
+            "p95": histogram.percentile(0.95),
+            "p99": histogram.percentile(0.99),
+          }
+          for name, histogram in histograms.items()
+        }
+        for action, histograms in self._histograms.items()
+      }
+
+  def _expire(self, now: float) -> None:
+    while self._in_flight:
+      trace_id, (_, deadline) = next(iter(self._in_flight.items()))
+      if deadline > now:
+        break
+      del self._in_flight[trace_id]
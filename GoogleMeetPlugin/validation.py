@@ -0,0 +1,252 @@
+"""Fast validation of IPC messages against the vocabularies in `models.py`.
+
+Actions, controls and states are closed sets, so checking a message only
+takes a few dictionary lookups in frozen tables built from the `Literal`
+types. That avoids constructing a pydantic model (twice) for every frame. The
+pydantic models remain the reference and are used instead in strict mode,
+which is meant for debugging (`MEET_STRICT_VALIDATION=1` or
+`set_strict_validation(True)`).
+
+Commands and status updates may carry an optional latency `trace` (see
+`tracing.py`), which is checked and copied; any other unknown field is
+dropped. A state snapshot carries the states of several controls at once and
+is accepted wherever a status update is, as is a command acknowledgement.
+Commands may carry an integer `id` for their acknowledgement (see `acks.py`).
+
+Validated messages are returned as `ValidatedMessage`, a plain dict subclass
+that later stages recognise and do not check again. Frames decoded from the
+binary encoding are produced directly as `ValidatedMessage`, since they can
+only express valid messages.
+"""
+
+import os
+import sys
+from types import MappingProxyType
+from typing import Any, get_args
+
+try:
+  from GoogleMeetPlugin.models import (
+    MAX_COMMAND_COUNT,
+    AckResult,
+    ActionType,
+    ControlState,
+    ControlType,
+  )
+except ImportError:  # Running as the standalone proxy script
+  from models import (  # type: ignore
+    MAX_COMMAND_COUNT,
+    AckResult,
+    ActionType,
+    ControlState,
+    ControlType,
+  )
+
+
+def _table(literal: Any) -> MappingProxyType:
+  """Maps each allowed value to its interned string."""
+  return MappingProxyType(
+    {value: sys.intern(value) for value in get_args(literal)}
+  )
+
+
+ACTIONS = _table(ActionType)
+CONTROLS = _table(ControlType)
+STATES = _table(ControlState)
+ACK_RESULTS = _table(AckResult)
+
+# The pydantic model for each kind of message from the extension.
+_STATUS_MODELS = {"snapshot": "StateSnapshot", "ack": "CommandAck"}
+
+_strict = os.getenv("MEET_STRICT_VALIDATION", "") not in ("", "0")
+
+
+class MessageValidationError(ValueError):
+  """Raised when a message does not match the expected shape."""
+
+
+class ValidatedMessage(dict):
+  """A message that has already been validated.
+
+  Includes JSON messages from a proxy that says it validates them, so these
+  still get a cheap shape check (see `_has_status_shape`).
+  """
+
+
+def set_strict_validation(enabled: bool) -> None:
+  """Switches between the fast path and full pydantic validation."""
+  global _strict
+  _strict = enabled
+
+
+def is_strict_validation() -> bool:
+  """Whether messages are validated with pydantic."""
+  return _strict
+
+
+def _lookup(table: MappingProxyType, message: dict[str, Any], key: str) -> str:
+  value = message.get(key)
+  if type(value) is not str or value not in table:
+    raise MessageValidationError(f"Invalid {key}: {value!r}")
+  return table[value]
+
+
+def _known(table: MappingProxyType, value: Any) -> bool:
+  return type(value) is str and value in table
+
+
+def _has_status_shape(message: ValidatedMessage) -> bool:
+  """A cheap check of a trusted status message.
+
+  Only the required fields may be present; a trace or any other field needs
+  full validation.
+  """
+  kind = message.get("status")
+  if kind == "update":
+    return (
+      len(message) == 3
+      and _known(CONTROLS, message.get("control"))
+      and _known(STATES, message.get("state"))
+    )
+  if kind == "snapshot":
+    states = message.get("states")
+    return (
+      len(message) == 2
+      and type(states) is dict
+      and all(
+        _known(CONTROLS, control) and _known(STATES, state)
+        for control, state in states.items()
+      )
+    )
+  if kind == "ack":
+    return (
+      len(message) == 3
+      and type(message.get("id")) is int
+      and _known(ACK_RESULTS, message.get("result"))
+    )
+  return False
+
+
+def _trace(trace: Any) -> dict[str, Any]:
+  """Checks a latency trace and returns a copy the caller may stamp."""
+  if type(trace) is not dict or type(trace.get("id")) is not int:
+    raise MessageValidationError(f"Invalid trace: {trace!r}")
+  stamps = trace.get("stamps")
+  if type(stamps) is not dict or not all(
+    type(hop) is str and type(stamp) in (int, float)
+    for hop, stamp in stamps.items()
+  ):
+    raise MessageValidationError(f"Invalid trace stamps: {stamps!r}")
+  return {"id": trace["id"], "stamps": dict(stamps)}
+
+
+def validate_status(message: Any) -> ValidatedMessage:
+  """Validates a status update, state snapshot or ack from the extension.
+
+  Unknown extra fields are dropped, as the pydantic model does. Messages that
+  were already validated only get a shape check, and are validated in full if
+  that fails or they carry other fields.
+
+  Raises:
+      MessageValidationError: If the message is not a valid status update.
+  """
+  if (
+    type(message) is ValidatedMessage
+    and not _strict
+    and _has_status_shape(message)
+  ):
+    return message
+  if not isinstance(message, dict):
+    raise MessageValidationError(f"Expected an object, got {message!r}")
+  kind = message.get("status")
+  if _strict:
+    model_name = _STATUS_MODELS.get(kind, "StatusUpdate")
+    return _validate_with_model(model_name, message)
+  if kind == "snapshot":
+    return _snapshot(message)
+  if kind == "ack":
+    return _ack(message)
+  if kind != "update":
+    raise MessageValidationError(f"Invalid status: {kind!r}")
+  status = ValidatedMessage(
+    status="update",
+    control=_lookup(CONTROLS, message, "control"),
+    state=_lookup(STATES, message, "state"),
+  )
+  if message.get("trace") is not None:
+    status["trace"] = _trace(message["trace"])
+  return status
+
+
+def _snapshot(message: dict[str, Any]) -> ValidatedMessage:
+  """Checks a state snapshot."""
+  states = message.get("states")
+  if type(states) is not dict:
+    raise MessageValidationError(f"Invalid states: {states!r}")
+  checked = {}
+  for control, state in states.items():
+    if type(control) is not str or control not in CONTROLS:
+      raise MessageValidationError(f"Invalid control: {control!r}")
+    if type(state) is not str or state not in STATES:
+      raise MessageValidationError(f"Invalid state for {control}: {state!r}")
+    checked[CONTROLS[control]] = STATES[state]
+  return ValidatedMessage(status="snapshot", states=checked)
+
+
+def _ack(message: dict[str, Any]) -> ValidatedMessage:
+  """Checks a command acknowledgement."""
+  if type(message.get("id")) is not int:
+    raise MessageValidationError(f"Invalid id: {message.get('id')!r}")
+  return ValidatedMessage(
+    status="ack",
+    id=message["id"],
+    result=_lookup(ACK_RESULTS, message, "result"),
+  )
+
+
+def validate_command(message: Any) -> ValidatedMessage:
+  """Validates a command for the extension.
+
+  Raises:
+      MessageValidationError: If the message is not a valid command.
+  """
+  if (
+    type(message) is ValidatedMessage
+    and not _strict
+    and len(message) == 1
+    and _known(ACTIONS, message.get("action"))
+  ):
+    return message
+  if not isinstance(message, dict):
+    raise MessageValidationError(f"Expected an object, got {message!r}")
+  if _strict:
+    return _validate_with_model("ActionCommand", message)
+  command = ValidatedMessage(action=_lookup(ACTIONS, message, "action"))
+  if message.get("trace") is not None:
+    command["trace"] = _trace(message["trace"])
+  if message.get("id") is not None:
+    if type(message["id"]) is not int:
+      raise MessageValidationError(f"Invalid id: {message['id']!r}")
+    command["id"] = message["id"]
+  if message.get("count") is not None:
+    count = message["count"]
+    if type(count) is not int or not 1 <= count <= MAX_COMMAND_COUNT:
+      raise MessageValidationError(f"Invalid count: {count!r}")
+    command["count"] = count
+  return command
+
+
+def _validate_with_model(
+  model_name: str, message: dict[str, Any]
+) -> ValidatedMessage:
+  """Validates with the reference pydantic model (strict mode)."""
+  try:
+    from GoogleMeetPlugin import models
+  except ImportError:
+    import models  # type: ignore[no-redef]
+  from pydantic import ValidationError
+
+  try:
+    model = getattr(models, model_name).model_validate(message)
+  except ValidationError as e:
+    raise MessageValidationError(str(e)) from e
+  return ValidatedMessage(model.model_dump(exclude_none=True))
@@ -0,0 +1,162 @@
+"""Message encodings for the plugin <-> proxy UNIX socket.
+
+Chrome's side of the proxy has to speak JSON, but the socket leg does not.
+Peers that both understand it switch to a compact binary encoding, where the
+closed vocabularies from `models.py` are sent as small integer codes:
+
+    status update:  0x01 <control code> <state code>   (3 bytes)
+    command:        0x02 <action code>                 (2 bytes)
+
+The encoding is negotiated with a JSON "hello" frame. The proxy offers the
+encodings it supports when it connects and the plugin answers with the one it
+picked. A peer that predates this never answers (or never offers), so both
+sides keep sending JSON. Decoding needs no negotiation: a JSON frame always
+starts with "{", which no binary message kind uses.
+
+Messages that do not fit the compact layout (for example ones carrying extra
+fields, or state snapshots) are always sent as JSON.
+
+Binary frames can only express valid messages, so they decode straight to
+`ValidatedMessage`. A proxy that validates everything it forwards says so in
+its hello, and its JSON frames are then trusted the same way.
+"""
+
+import json
+import sys
+from typing import Any, get_args
+
+try:
+  from GoogleMeetPlugin.models import ActionType, ControlState, ControlType
+  from GoogleMeetPlugin.validation import ValidatedMessage
+except ImportError:  # Running as the standalone proxy script
+  from models import ActionType, ControlState, ControlType  # type: ignore
+  from validation import ValidatedMessage  # type: ignore
+
+JSON = "json"
+BINARY_V1 = "binary-v1"
+
+# In order of preference.
+SUPPORTED_ENCODINGS = (BINARY_V1, JSON)
+
+KIND_STATUS = 0x01
+KIND_COMMAND = 0x02
+
+# Codes are positions in the Literal types, which is why those are append-only.
+ACTIONS: tuple[str, ...] = tuple(map(sys.intern, get_args(ActionType)))
+CONTROLS: tuple[str, ...] = tuple(map(sys.intern, get_args(ControlType)))
+STATES: tuple[str, ...] = tuple(map(sys.intern, get_args(ControlState)))
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+CONTROL_CODES = {control: code for code, control in enumerate(CONTROLS)}
+STATE_CODES = {state: code for code, state in enumerate(STATES)}
+
+# Pre-encoded frames for every possible message.
+_STATUS_FRAMES = {
+  (control, state): bytes(
+    (KIND_STATUS, CONTROL_CODES[control], STATE_CODES[state])
+  )
+  for control in CONTROLS
+  for state in STATES
+}
+_COMMAND_FRAMES = {
+  action: bytes((KIND_COMMAND, ACTION_CODES[action])) for action in ACTIONS
+}
+
+
+class WireError(ValueError):
+  """Raised for a binary frame that cannot be decoded."""
+
+
+def hello_offer() -> dict[str, Any]:
+  """The handshake message the proxy sends after connecting.
+
+  It also tells the plugin that the proxy validates every message it
+  forwards, so the plugin does not have to check them again.
+  """
+  return {"hello": {"encodings": list(SUPPORTED_ENCODINGS), "validated": True}}
+
+
+def hello_reply(encoding: str) -> dict[str, Any]:
+  """The handshake message the plugin answers with."""
+  return {"hello": {"encoding": encoding}}
+
+
+def is_hello(message: Any) -> bool:
+  """Whether a decoded message is a handshake frame."""
+  return isinstance(message, dict) and isinstance(message.get("hello"), dict)
+
+
+def negotiate(offer: dict[str, Any]) -> "WireCodec":
+  """Builds the codec for a connection from the peer's hello offer."""
+  offered = offer["hello"].get("encodings") or ()
+  peer_validates = offer["hello"].get("validated") is True
+  for encoding in SUPPORTED_ENCODINGS:
+    if encoding in offered:
+      return WireCodec(encoding, peer_validates)
+  return WireCodec(JSON, peer_validates)
+
+
+def decode(frame: bytes) -> dict[str, Any]:
+  """Decodes a frame in either encoding into a message dict."""
+  if not frame:
+    raise WireError("Empty frame.")
+  kind = frame[0]
+  try:
+    if kind == KIND_STATUS and len(frame) == 3:
+      return ValidatedMessage(
+        status="update",
+        control=CONTROLS[frame[1]],
+        state=STATES[frame[2]],
+      )
+    if kind == KIND_COMMAND and len(frame) == 2:
+      return ValidatedMessage(action=ACTIONS[frame[1]])
+  except IndexError as e:
+    raise WireError(f"Unknown code in binary frame {frame!r}.") from e
+  if kind in (KIND_STATUS, KIND_COMMAND):
+    raise WireError(f"Malformed binary frame {frame!r}.")
+  return json.loads(frame)
+
+
+def encode_json(message: dict[str, Any]) -> bytes:
+  """Encodes a message as JSON."""
+  return json.dumps(message).encode("utf-8")
+
+
+def encode_binary(message: dict[str, Any]) -> bytes | None:
+  """Encodes a message compactly, or returns None if it does not fit."""
+  if len(message) == 1:
+    return _COMMAND_FRAMES.get(message.get("action"))  # type: ignore[arg-type]
+  if len(message) == 3 and message.get("status") == "update":
+    return _STATUS_FRAMES.get((message.get("control"), message.get("state")))  # type: ignore[arg-type]
+  return None
+
+
+class WireCodec:
+  """The encoding used for outgoing frames on one connection.
+
+  Starts out as JSON and switches once the handshake has settled on
+  something better.
+  """
+
+  def __init__(self, encoding: str = JSON, peer_validates: bool = False):
+    self.encoding = encoding
+    self.peer_validates = peer_validates
+
+  def encode(self, message: dict[str, Any]) -> bytes:
+    """Encodes a message in the negotiated encoding, if it fits."""
+    if self.encoding == BINARY_V1:
+      frame = encode_binary(message)
+      if frame is not None:
+        return frame
+    return encode_json(message)
+
+  def decode(self, frame: bytes) -> dict[str, Any]:
+    """Decodes a frame in either encoding.
+
+    JSON messages from a peer that validates what it sends are marked as
+    validated, like binary ones. `validate_status` still checks their shape,
+    since one malformed frame must not reach the icons.
+    """
+    message = decode(frame)
+    if self.peer_validates and type(message) is dict and not is_hello(message):
+      return ValidatedMessage(message)
+    return message
@@ -3,10 +3,27 @@
 import json
 import os
 import platform
+import py_compile
 import shutil
 import sys
+import tempfile
+import zipapp
 from pathlib import Path
 
+# Modules the native messaging proxy needs, bundled into its zipapp.
+PROXY_MODULES = (
+    "meet_proxy",
+    "capture",
+    "diagnostics",
+    "framing",
+    "models",
+    "native_messaging_handler",
+    "status_filter",
+    "tracing",
+    "validation",
+    "wire",
+)
+
 
 def get_chrome_config_path() -> Path:
     """Get the path to the Chrome config directory."""
@@ -20,6 +37,30 @@ def get_chrome_config_path() -> Path:
         raise NotImplementedError(f"Unsupported platform: {platform.system()}")
 
 
+def build_proxy_zipapp(target: Path) -> Path:
+    """Bundle the proxy into a single executable zipapp of precompiled modules.
+
+    Chrome starts a new proxy for every connection, so it should not have to
+    compile anything. The modules are stored as bytecode only, and the
+    archive runs with the interpreter that built it, whose bytecode version
+    it matches.
+    """
+    source_dir = Path(__file__).parent / "GoogleMeetPlugin"
+    with tempfile.TemporaryDirectory() as staging_dir:
+        staging = Path(staging_dir)
+        for module in PROXY_MODULES:
+            py_compile.compile(
+                str(source_dir / f"{module}.py"),
+                cfile=str(staging / f"{module}.pyc"),
+                dfile=f"{module}.py",
+                doraise=True,
+                invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+            )
+        (staging / "__main__.py").write_text("import meet_proxy\n\nmeet_proxy.main()\n")
+        zipapp.create_archive(staging, target, interpreter=sys.executable)
+    return target
+
+
 def install():
     """Install the plugin and the Chrome extension."""
     # Get the path to the native messaging manifest file
@@ -28,8 +69,10 @@ def install():
     native_messaging_path.mkdir(parents=True, exist_ok=True)
     manifest_path = native_messaging_path / "com.github.dcode.stream_controller_meet.json"
 
-    # Get the path to the proxy script
-    proxy_script_path = Path(__file__).parent / "GoogleMeetPlugin" / "meet_proxy.py"
+    # Build the proxy that Chrome will launch
+    proxy_script_path = build_proxy_zipapp(
+        Path(__file__).parent / "GoogleMeetPlugin" / "meet_proxy.pyz"
+    )
 
     # Create the native messaging manifest
     manifest = {
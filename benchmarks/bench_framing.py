@@ -0,0 +1,110 @@
+"""Micro-benchmark for reading length-prefixed frames off the IPC socket.
+
+Compares the original two-`recv` per frame loop with `FrameDecoder`, over a
+UNIX socket pair, and reports frames per second and read syscalls per frame.
+
+Run from the repository root:
+
+    python benchmarks/bench_framing.py
+"""
+
+import argparse
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from GoogleMeetPlugin.framing import FrameDecoder, encode_frame
+
+MESSAGE = {"status": "update", "control": "camera", "state": "on"}
+
+
+class CountingSocket:
+  """Wraps a socket and counts the read syscalls made through it."""
+
+  def __init__(self, sock: socket.socket):
+    self.sock = sock
+    self.reads = 0
+
+  def recv(self, size: int) -> bytes:
+    self.reads += 1
+    return self.sock.recv(size)
+
+  def recv_into(self, buffer) -> int:
+    self.reads += 1
+    return self.sock.recv_into(buffer)
+
+
+def read_legacy(sock: CountingSocket, count: int) -> None:
+  """The original loop: `recv(4)` for the length, then `recv(length)`."""
+  for _ in range(count):
+    raw_length = sock.recv(4)
+    message_length = struct.unpack("@I", raw_length)[0]
+    json.loads(sock.recv(message_length).decode("utf-8"))
+
+
+def read_decoder(sock: CountingSocket, count: int) -> None:
+  """Reads with `FrameDecoder`, many frames per syscall."""
+  decoder = FrameDecoder()
+  received = 0
+  while received < count:
+    frames = decoder.read_from(sock)  # type: ignore[arg-type]
+    for frame in frames or ():
+      json.loads(frame)
+    received += len(frames or ())
+
+
+def run(reader, count: int, batch: int) -> dict[str, float]:
+  """Streams `count` frames through a socket pair and times the reader."""
+  frame = encode_frame(json.dumps(MESSAGE).encode("utf-8"))
+  chunk = frame * batch
+  reader_sock, writer_sock = socket.socketpair(
+    socket.AF_UNIX, socket.SOCK_STREAM
+  )
+  counting = CountingSocket(reader_sock)
+
+  def write() -> None:
+    for _ in range(count // batch):
+      writer_sock.sendall(chunk)
+
+  writer = threading.Thread(target=write, daemon=True)
+  start = time.perf_counter()
+  writer.start()
+  reader(counting, count)
+  elapsed = time.perf_counter() - start
+  writer.join()
+  reader_sock.close()
+  writer_sock.close()
+  return {
+    "frames_per_sec": count / elapsed,
+    "syscalls_per_frame": counting.reads / count,
+  }
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--frames", type=int, default=200_000)
+  parser.add_argument(
+    "--batch",
+    type=int,
+    default=8,
+    help="Frames written per sendall, to mimic bursts from the proxy.",
+  )
+  args = parser.parse_args()
+  count = args.frames - args.frames % args.batch
+
+  for name, reader in (("legacy", read_legacy), ("decoder", read_decoder)):
+    result = run(reader, count, args.batch)
+    print(
+      f"{name:>8}: {result['frames_per_sec']:>12,.0f} frames/s"
+      f"  {result['syscalls_per_frame']:.3f} syscalls/frame"
+    )
+
+
+if __name__ == "__main__":
+  main()
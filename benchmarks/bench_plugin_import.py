@@ -0,0 +1,79 @@
+"""Import-time benchmark for the plugin module.
+
+StreamController imports every plugin's `main.py` while it starts up, so the
+time spent there delays the whole application. This reports the cumulative
+import time of `main` as measured by `python -X importtime`, with the
+StreamController modules stubbed as in `tests/conftest.py`, and checks that
+none of the action modules were imported.
+
+Run from the repository root:
+
+    python benchmarks/bench_plugin_import.py
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Loads the StreamController stubs first so that only the plugin is timed.
+SCRIPT = """
+import json, sys
+sys.path.insert(0, {root!r})
+sys.path.insert(0, {tests!r})
+import conftest
+import main
+print(json.dumps(sorted(
+  name for name in sys.modules if name.startswith("GoogleMeetPlugin.actions.")
+)))
+"""
+
+
+def measure() -> tuple[float, list[str]]:
+  """Import time of `main` in ms, and the action modules it imported."""
+  result = subprocess.run(
+    [
+      sys.executable,
+      "-X",
+      "importtime",
+      "-c",
+      SCRIPT.format(root=str(ROOT), tests=str(ROOT / "tests")),
+    ],
+    capture_output=True,
+    text=True,
+    check=True,
+    cwd=ROOT,
+  )
+  action_modules = json.loads(result.stdout)
+  for line in reversed(result.stderr.splitlines()):
+    fields = [field.strip() for field in line.split("|")]
+    if len(fields) == 3 and fields[2] == "main":
+      return int(fields[1]) / 1000, action_modules
+  raise RuntimeError("main not found in -X importtime output")
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--runs", type=int, default=10)
+  args = parser.parse_args()
+
+  samples = []
+  action_modules: list[str] = []
+  for _ in range(args.runs):
+    elapsed, action_modules = measure()
+    samples.append(elapsed)
+  print(
+    f"import main: {statistics.median(samples):6.1f} ms"
+    f" (min {min(samples):.1f} ms)"
+    f"  action modules imported: {len(action_modules)}"
+  )
+  for name in action_modules:
+    print(f"  {name}")
+
+
+if __name__ == "__main__":
+  main()
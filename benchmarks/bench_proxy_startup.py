@@ -0,0 +1,126 @@
+"""Start-up benchmark for the native messaging proxy.
+
+Chrome launches a fresh proxy for every `connectNative`, so its start-up time
+is paid on every (re)connection. For both the plain script and the zipapp
+built by `__install__.py` this reports:
+
+* import time of `meet_proxy` as measured by `python -X importtime`, and
+* time from spawning the process to the first status update arriving on the
+  plugin's socket, with the message written to stdin immediately.
+
+Run from the repository root:
+
+    python benchmarks/bench_proxy_startup.py
+"""
+
+import argparse
+import importlib
+import json
+import os
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from GoogleMeetPlugin.framing import FrameDecoder  # noqa: E402
+
+PROXY_SCRIPT = ROOT / "GoogleMeetPlugin" / "meet_proxy.py"
+SOCKET_SUFFIX = "app/com.core477.StreamController/meet_plugin.sock"
+STATUS = {"status": "update", "control": "microphone", "state": "on"}
+
+
+def import_time_ms(path_entry: str) -> float:
+  """Cumulative import time of `meet_proxy`, loaded from `path_entry`."""
+  result = subprocess.run(
+    [
+      sys.executable,
+      "-X",
+      "importtime",
+      "-c",
+      f"import sys; sys.path.insert(0, {path_entry!r}); import meet_proxy",
+    ],
+    capture_output=True,
+    text=True,
+    check=True,
+  )
+  for line in reversed(result.stderr.splitlines()):
+    fields = [field.strip() for field in line.split("|")]
+    if len(fields) == 3 and fields[2] == "meet_proxy":
+      return int(fields[1]) / 1000
+  raise RuntimeError("meet_proxy not found in -X importtime output")
+
+
+def first_frame_ms(command: list[str]) -> float:
+  """Time from spawning the proxy to its first forwarded status update."""
+  with tempfile.TemporaryDirectory() as runtime_dir:
+    socket_path = os.path.join(runtime_dir, SOCKET_SUFFIX)
+    os.makedirs(os.path.dirname(socket_path))
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(1)
+    server.settimeout(10)
+
+    payload = json.dumps(STATUS).encode("utf-8")
+    start = time.perf_counter()
+    proxy = subprocess.Popen(
+      command,
+      stdin=subprocess.PIPE,
+      stdout=subprocess.DEVNULL,
+      env={**os.environ, "XDG_RUNTIME_DIR": runtime_dir},
+    )
+    assert proxy.stdin is not None
+    proxy.stdin.write(struct.pack("@I", len(payload)) + payload)
+    proxy.stdin.flush()
+
+    connection, _ = server.accept()
+    connection.settimeout(10)
+    decoder = FrameDecoder()
+    elapsed = None
+    while elapsed is None:
+      frames = decoder.read_from(connection)
+      if frames is None:
+        raise RuntimeError("Proxy disconnected before forwarding the status.")
+      for frame in frames:
+        if b"hello" not in frame:
+          elapsed = time.perf_counter() - start
+
+    proxy.stdin.close()
+    proxy.wait(timeout=10)
+    connection.close()
+    server.close()
+  return elapsed * 1000
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--runs", type=int, default=10)
+  args = parser.parse_args()
+
+  installer = importlib.import_module("__install__")
+  with tempfile.TemporaryDirectory() as build_dir:
+    zipapp_path = installer.build_proxy_zipapp(
+      Path(build_dir) / "meet_proxy.pyz"
+    )
+    variants = {
+      "script": (str(PROXY_SCRIPT.parent), [sys.executable, str(PROXY_SCRIPT)]),
+      "zipapp": (str(zipapp_path), [str(zipapp_path)]),
+    }
+    for name, (path_entry, command) in variants.items():
+      imports = [import_time_ms(path_entry) for _ in range(args.runs)]
+      frames = [first_frame_ms(command) for _ in range(args.runs)]
+      print(
+        f"{name:>7}: import {statistics.median(imports):6.1f} ms"
+        f"  first frame {statistics.median(frames):6.1f} ms"
+        f" (min {min(frames):.1f} ms)"
+      )
+
+
+if __name__ == "__main__":
+  main()
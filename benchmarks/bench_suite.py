@@ -0,0 +1,400 @@
+"""Benchmark suite for the IPC and dispatch hot paths.
+
+Runs on a plain Linux box, with StreamController replaced by the stubs from
+`tests/conftest.py`, and measures:
+
+* `socket_ipc`: `SocketIPCServer` frame throughput, and the round trip of a
+  status update answered by a command, over a real UNIX socket.
+* `status_dispatch`: the cost of `GoogleMeetPlugin.handle_status_update` with
+  synthetic decks of 1-50 decks x 15-500 actions each.
+* `proxy_forwarding`: `meet_proxy.py` throughput in both directions, with
+  pipes in place of Chrome's stdin/stdout.
+* `validation`: the cost of validating a status update and a command on the
+  fast path and with pydantic (strict mode).
+
+Results are written as JSON, together with the Python version, platform and
+git revision, so runs from different releases can be compared.
+
+Run from the repository root:
+
+    python benchmarks/bench_suite.py --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+from collections.abc import Callable
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "tests"))
+
+import conftest  # noqa: E402,F401  Installs the StreamController stubs.
+
+from GoogleMeetPlugin.framing import FrameDecoder, encode_frame  # noqa: E402
+from GoogleMeetPlugin.socket_ipc import SocketIPCServer  # noqa: E402
+from GoogleMeetPlugin.validation import (  # noqa: E402
+  ValidatedMessage,
+  set_strict_validation,
+  validate_command,
+  validate_status,
+)
+from GoogleMeetPlugin.wire import (  # noqa: E402
+  BINARY_V1,
+  WireCodec,
+  encode_json,
+  hello_offer,
+)
+
+PROXY_SCRIPT = ROOT / "GoogleMeetPlugin" / "meet_proxy.py"
+SOCKET_SUFFIX = "app/com.core477.StreamController/meet_plugin.sock"
+STATUS = {"status": "update", "control": "microphone", "state": "on"}
+COMMAND = {"action": "toggle_mute"}
+
+DECKS = (1, 10, 50)
+ACTIONS_PER_DECK = (15, 100, 500)
+
+
+def per_call_ns(func: Callable[[], Any], number: int) -> float:
+  """Best-of-five time per call, in nanoseconds."""
+  return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e9
+
+
+def latency_summary(samples_s: list[float]) -> dict[str, float]:
+  """Median, p99 and max of latencies given in seconds, in microseconds."""
+  samples = sorted(samples_s)
+  return {
+    "p50_us": statistics.median(samples) * 1e6,
+    "p99_us": samples[int(len(samples) * 0.99) - 1] * 1e6,
+    "max_us": samples[-1] * 1e6,
+  }
+
+
+def short_socket_dir() -> str:
+  """A temporary directory whose path fits a UNIX socket address."""
+  return tempfile.mkdtemp(dir="/tmp")
+
+
+def connect(socket_path: str, timeout: float = 5.0) -> socket.socket:
+  """Connects to a server socket once it is accepting connections."""
+  deadline = time.monotonic() + timeout
+  while True:
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+      client.connect(socket_path)
+      return client
+    except (ConnectionRefusedError, FileNotFoundError):
+      client.close()
+      if time.monotonic() > deadline:
+        raise
+      time.sleep(0.001)
+
+
+def bench_socket_ipc(frames: int, round_trips: int) -> dict[str, Any]:
+  """Throughput and round-trip latency of `SocketIPCServer`."""
+  results: dict[str, Any] = {}
+  for encoding in ("json", BINARY_V1):
+    socket_path = os.path.join(short_socket_dir(), "bench.sock")
+    received = 0
+    done = threading.Event()
+
+    def message_callback(
+      message: dict[str, Any], session_id: int, done=done
+    ) -> None:
+      nonlocal received
+      received += 1
+      if received == frames:
+        done.set()
+
+    server = SocketIPCServer(socket_path, message_callback)
+    threading.Thread(target=server.listen, daemon=True).start()
+    client = connect(socket_path)
+    client.settimeout(10)
+    decoder = FrameDecoder()
+    codec = WireCodec()
+    if encoding == BINARY_V1:
+      client.sendall(encode_frame(encode_json(hello_offer())))
+      decoder.read_from(client)  # The hello reply
+      codec = WireCodec(BINARY_V1)
+
+    # Throughput: a stream of status updates, written in batches.
+    frame = encode_frame(codec.encode(STATUS))
+    batch = frame * 256
+    start = time.perf_counter()
+    for _ in range(frames // 256):
+      client.sendall(batch)
+    client.sendall(frame * (frames % 256))
+    if not done.wait(timeout=60):
+      raise RuntimeError("Server did not receive every frame.")
+    elapsed = time.perf_counter() - start
+
+    # Round trip: a status update, answered by a command.
+    server.message_callback = lambda message, session_id, server=server: (
+      server.send_message(COMMAND)
+    )
+    samples = []
+    for _ in range(round_trips):
+      start_rtt = time.perf_counter()
+      client.sendall(frame)
+      while not decoder.read_from(client):
+        pass
+      samples.append(time.perf_counter() - start_rtt)
+
+    client.close()
+    server.close()
+    results[encoding] = {
+      "frames": frames,
+      "frames_per_s": frames / elapsed,
+      "round_trip": latency_summary(samples),
+    }
+  return results
+
+
+class FakeAction:
+  """Stands in for a Meet action on a deck; updating it costs nothing."""
+
+  def __init__(self, action_name: str):
+    self.action_name = action_name
+    self.is_on: bool | None = None
+
+  def update_state(self, is_on: bool) -> None:
+    self.is_on = is_on
+
+
+def bench_status_dispatch(number: int) -> list[dict[str, Any]]:
+  """Per-update cost of `handle_status_update` for synthetic decks.
+
+  Updates are applied inline (no coalescing delay), so each call includes
+  validation, dispatch and updating every matching action instance.
+  """
+  import main
+
+  action_names = [spec.key for spec in main.ACTIONS]
+  results = []
+  with (
+    mock.patch.object(main, "SocketIPCServer"),
+    mock.patch.object(
+      main.GoogleMeetPlugin,
+      "get_settings",
+      return_value={"status_flush_interval_ms": 0},
+    ),
+  ):
+    for decks in DECKS:
+      for actions_per_deck in ACTIONS_PER_DECK:
+        plugin = main.GoogleMeetPlugin()
+        try:
+          instances = [
+            FakeAction(action_names[i % len(action_names)])
+            for i in range(decks * actions_per_deck)
+          ]
+          for instance in instances:
+            plugin.action_registry.register(instance)
+          states = [
+            {"status": "update", "control": "microphone", "state": state}
+            for state in ("on", "off")
+          ]
+          calls = max(10, number // (decks * actions_per_deck))
+          cost_ns = (
+            per_call_ns(
+              lambda plugin=plugin, states=states: (
+                plugin.handle_status_update(states[0]),
+                plugin.handle_status_update(states[1]),
+              ),
+              calls,
+            )
+            / 2
+          )
+          updated = len(plugin.action_registry.instances("toggle_mute"))
+        finally:
+          # Each plugin starts its own render thread.
+          plugin.render_stage.stop()
+          plugin.status_dispatcher.stop()
+        results.append(
+          {
+            "decks": decks,
+            "actions_per_deck": actions_per_deck,
+            "instances_updated": updated,
+            "ns_per_update": cost_ns,
+          }
+        )
+  return results
+
+
+def bench_proxy_forwarding(messages: int, window: int = 128) -> dict[str, Any]:
+  """Messages per second through `meet_proxy.py` in each direction.
+
+  Messages are sent in windows of `window`, waiting for each window to arrive
+  before sending the next, so that the bounded queues along the way never
+  have to drop anything.
+  """
+  runtime_dir = short_socket_dir()
+  socket_path = os.path.join(runtime_dir, SOCKET_SUFFIX)
+  received = 0
+  arrived = threading.Condition()
+  connected = threading.Event()
+
+  def message_callback(message: dict[str, Any], session_id: int) -> None:
+    nonlocal received
+    with arrived:
+      received += 1
+      arrived.notify()
+
+  server = SocketIPCServer(
+    socket_path,
+    message_callback,
+    connection_callback=lambda session_id, up: connected.set(),
+  )
+  threading.Thread(target=server.listen, daemon=True).start()
+  proxy = subprocess.Popen(
+    [sys.executable, str(PROXY_SCRIPT)],
+    stdin=subprocess.PIPE,
+    stdout=subprocess.PIPE,
+    env={**os.environ, "XDG_RUNTIME_DIR": runtime_dir},
+  )
+  assert proxy.stdin is not None and proxy.stdout is not None
+  windows = [
+    min(window, messages - sent) for sent in range(0, messages, window)
+  ]
+  try:
+    if not connected.wait(timeout=10):
+      raise RuntimeError("Proxy did not connect.")
+    # Give the hello exchange a moment so the socket leg is binary.
+    time.sleep(0.1)
+
+    # Chrome -> plugin: native messaging frames on stdin. The state
+    # alternates, since the proxy drops repeats of the last one.
+    native_frames = []
+    for state in ("on", "off"):
+      payload = json.dumps({**STATUS, "state": state}).encode("utf-8")
+      native_frames.append(struct.pack("@I", len(payload)) + payload)
+    start = time.perf_counter()
+    for sent, count in enumerate(windows):
+      proxy.stdin.write(
+        b"".join(native_frames[(sent * window + i) % 2] for i in range(count))
+      )
+      proxy.stdin.flush()
+      expected = sent * window + count
+      with arrived:
+        if not arrived.wait_for(
+          lambda expected=expected: received >= expected, timeout=10
+        ):
+          raise RuntimeError("Plugin did not receive every status update.")
+    to_plugin = messages / (time.perf_counter() - start)
+
+    # Plugin -> Chrome: commands read back from stdout.
+    start = time.perf_counter()
+    for count in windows:
+      for _ in range(count):
+        server.send_message(COMMAND)
+      for _ in range(count):
+        (length,) = struct.unpack("@I", proxy.stdout.read(4))
+        proxy.stdout.read(length)
+    to_chrome = messages / (time.perf_counter() - start)
+  finally:
+    proxy.stdin.close()
+    proxy.wait(timeout=10)
+    server.close()
+  return {
+    "messages": messages,
+    "window": window,
+    "chrome_to_plugin_per_s": to_plugin,
+    "plugin_to_chrome_per_s": to_chrome,
+  }
+
+
+def bench_validation(number: int) -> dict[str, Any]:
+  """Nanoseconds per validated message, fast path and strict."""
+  trusted = ValidatedMessage(STATUS)
+  results: dict[str, Any] = {
+    "fast": {
+      "status_ns": per_call_ns(lambda: validate_status(STATUS), number),
+      "command_ns": per_call_ns(lambda: validate_command(COMMAND), number),
+    },
+    "trusted": {
+      "status_ns": per_call_ns(lambda: validate_status(trusted), number),
+    },
+  }
+  try:
+    import pydantic  # noqa: F401
+  except ImportError:
+    return results
+  set_strict_validation(True)
+  try:
+    results["strict"] = {
+      "status_ns": per_call_ns(lambda: validate_status(STATUS), number // 10),
+      "command_ns": per_call_ns(
+        lambda: validate_command(COMMAND), number // 10
+      ),
+    }
+  finally:
+    set_strict_validation(False)
+  return results
+
+
+def git_revision() -> str | None:
+  """The checked-out commit, if this is a git checkout."""
+  try:
+    return subprocess.run(
+      ["git", "rev-parse", "HEAD"],
+      capture_output=True,
+      text=True,
+      check=True,
+      cwd=ROOT,
+    ).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument(
+    "--output", help="Write the JSON results here instead of to stdout."
+  )
+  parser.add_argument(
+    "--quick", action="store_true", help="Fewer iterations, for smoke tests."
+  )
+  args = parser.parse_args()
+  scale = 10 if args.quick else 1
+
+  benchmarks = {
+    "socket_ipc": lambda: bench_socket_ipc(200_000 // scale, 2_000 // scale),
+    "status_dispatch": lambda: bench_status_dispatch(200_000 // scale),
+    "proxy_forwarding": lambda: bench_proxy_forwarding(20_000 // scale),
+    "validation": lambda: bench_validation(100_000 // scale),
+  }
+  results: dict[str, Any] = {
+    "timestamp": datetime.now(UTC).isoformat(),
+    "git_revision": git_revision(),
+    "python": platform.python_version(),
+    "platform": platform.platform(),
+    "quick": args.quick,
+    "results": {},
+  }
+  for name, run in benchmarks.items():
+    print(f"Running {name}...", file=sys.stderr)
+    results["results"][name] = run()
+
+  report = json.dumps(results, indent=2)
+  if args.output:
+    Path(args.output).write_text(report + "\n")
+    print(f"Results written to {args.output}", file=sys.stderr)
+  else:
+    print(report)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,83 @@
+"""Micro-benchmark for the socket message encodings.
+
+Reports the per-message cost of encoding and decoding a status update and a
+command as JSON and in the compact binary encoding, plus the frame size.
+
+Run from the repository root:
+
+    python benchmarks/bench_wire.py
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from GoogleMeetPlugin.wire import (
+  BINARY_V1,
+  JSON,
+  WireCodec,
+  decode,
+)
+
+try:
+  from GoogleMeetPlugin.models import ActionCommand, StatusUpdate
+except ImportError:  # pydantic not installed
+  ActionCommand = StatusUpdate = None  # type: ignore[assignment,misc]
+
+MESSAGES = {
+  "status": {"status": "update", "control": "camera", "state": "on"},
+  "command": {"action": "toggle_mute"},
+}
+
+
+def per_call_ns(func, number: int) -> float:
+  """Best-of-five time per call, in nanoseconds."""
+  return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e9
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--number", type=int, default=100_000)
+  args = parser.parse_args()
+
+  for kind, message in MESSAGES.items():
+    for encoding in (JSON, BINARY_V1):
+      codec = WireCodec(encoding)
+      frame = codec.encode(message)
+      encode_ns = per_call_ns(
+        lambda codec=codec, message=message: codec.encode(message), args.number
+      )
+      decode_ns = per_call_ns(lambda frame=frame: decode(frame), args.number)
+      print(
+        f"{kind:>8} {encoding:>10}: {len(frame):>3} bytes"
+        f"  encode {encode_ns:>7.0f} ns  decode {decode_ns:>7.0f} ns"
+      )
+    # What the previous path paid: json plus pydantic on each end.
+    if StatusUpdate is None:
+      continue
+    model = StatusUpdate if kind == "status" else ActionCommand
+    payload = json.dumps(message).encode("utf-8")
+    encode_ns = per_call_ns(
+      lambda model=model, message=message: json.dumps(
+        model.model_validate(message).model_dump()
+      ).encode(),
+      args.number // 10,
+    )
+    decode_ns = per_call_ns(
+      lambda model=model, payload=payload: model.model_validate(
+        json.loads(payload)
+      ),
+      args.number // 10,
+    )
+    print(
+      f"{kind:>8} {'pydantic':>10}: {len(payload):>3} bytes"
+      f"  encode {encode_ns:>7.0f} ns  decode {decode_ns:>7.0f} ns"
+    )
+
+
+if __name__ == "__main__":
+  main()
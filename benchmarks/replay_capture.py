@@ -0,0 +1,219 @@
+"""Replays a recorded capture of socket traffic (see GoogleMeetPlugin/capture.py).
+
+Captures are made with the plugin's "capture_file" setting or by running the
+proxy with MEET_CAPTURE_FILE set. The status updates in a capture are played
+back with their recorded timing, scaled by --speed (0 for as fast as
+possible), into one of:
+
+* `plugin`: a running plugin, by connecting to its socket as a stand-in
+  proxy. Commands the plugin sends back are read and counted.
+* `inprocess`: a `GoogleMeetPlugin` created in this process with the
+  StreamController stubs from `tests/conftest.py` and synthetic decks, to
+  soak-test the render stage and dispatch path with real burst patterns.
+
+A JSON summary with the replay throughput is printed at the end.
+
+Run from the repository root:
+
+    python benchmarks/replay_capture.py meet.cap --target inprocess --speed 0
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from GoogleMeetPlugin.capture import TO_PLUGIN, read_capture, replay  # noqa: E402
+from GoogleMeetPlugin.framing import FrameDecoder, encode_frame  # noqa: E402
+from GoogleMeetPlugin.wire import (  # noqa: E402
+  SUPPORTED_ENCODINGS,
+  WireCodec,
+  decode,
+  encode_json,
+  hello_offer,
+  is_hello,
+)
+
+DEFAULT_SOCKET_PATH = os.path.join(
+  os.getenv("XDG_RUNTIME_DIR", "/tmp"),
+  "app/com.core477.StreamController/meet_plugin.sock",
+)
+
+
+def load_statuses(path: str) -> tuple[list[Any], list[dict[str, Any]]]:
+  """The status frames of a capture, and the messages they decode to."""
+  frames = [
+    captured
+    for captured in read_capture(path)
+    if captured.direction == TO_PLUGIN and not is_hello(decode(captured.frame))
+  ]
+  return frames, [decode(captured.frame) for captured in frames]
+
+
+def replay_into_plugin(
+  path: str, socket_path: str, speed: float, loops: int
+) -> dict[str, Any]:
+  """Plays the capture into a running plugin, acting as its proxy."""
+  frames, messages = load_statuses(path)
+  sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  sock.connect(socket_path)
+  sock.settimeout(2)
+  decoder = FrameDecoder()
+
+  # Negotiate like the real proxy, then re-encode every frame to match.
+  codec = WireCodec()
+  sock.sendall(encode_frame(encode_json(hello_offer())))
+  try:
+    for reply in decoder.read_from(sock) or ():
+      encoding = decode(reply).get("hello", {}).get("encoding")
+      if encoding in SUPPORTED_ENCODINGS:
+        codec = WireCodec(encoding)
+  except TimeoutError:
+    pass  # The plugin predates the handshake; stay on JSON.
+  frames = [
+    captured._replace(frame=encode_frame(codec.encode(message)))
+    for captured, message in zip(frames, messages, strict=True)
+  ]
+
+  commands = 0
+  sock.settimeout(None)
+
+  def drain() -> None:
+    nonlocal commands
+    try:
+      while (received := decoder.read_from(sock)) is not None:
+        commands += len(received)
+    except OSError:
+      pass
+
+  threading.Thread(target=drain, daemon=True).start()
+  stats = [replay(frames, sock.sendall, speed) for _ in range(loops)]
+  time.sleep(0.1)  # Let the last commands arrive.
+  sock.close()
+  return {
+    "replays": [s._asdict() for s in stats],
+    "commands_received": commands,
+  }
+
+
+class FakeAction:
+  """Stands in for a Meet action on a deck."""
+
+  def __init__(self, action_name: str):
+    self.action_name = action_name
+    self.updates = 0
+
+  def update_state(self, is_on: bool) -> None:
+    self.updates += 1
+
+
+def replay_in_process(
+  path: str,
+  speed: float,
+  loops: int,
+  decks: int,
+  actions_per_deck: int,
+  flush_interval_ms: float | None,
+) -> dict[str, Any]:
+  """Plays the capture into an in-process plugin with synthetic decks."""
+  sys.path.insert(0, str(ROOT / "tests"))
+  import conftest  # noqa: F401  Installs the StreamController stubs.
+
+  import main
+
+  frames, messages = load_statuses(path)
+  settings = {}
+  if flush_interval_ms is not None:
+    settings["status_flush_interval_ms"] = flush_interval_ms
+  with (
+    mock.patch.object(main, "SocketIPCServer"),
+    mock.patch.object(
+      main.GoogleMeetPlugin, "get_settings", return_value=settings
+    ),
+  ):
+    plugin = main.GoogleMeetPlugin()
+  action_names = [spec.key for spec in main.ACTIONS]
+  instances = [
+    FakeAction(action_names[i % len(action_names)])
+    for i in range(decks * actions_per_deck)
+  ]
+  for instance in instances:
+    plugin.action_registry.register(instance)
+
+  decoded = {
+    captured.frame: message
+    for captured, message in zip(frames, messages, strict=True)
+  }
+  stats = [
+    replay(
+      frames,
+      lambda frame: plugin.queue_status_update(decoded[frame]),
+      speed,
+    )
+    for _ in range(loops)
+  ]
+  plugin.render_stage.stop()
+  plugin.status_dispatcher.stop()
+  return {
+    "replays": [s._asdict() for s in stats],
+    "render_stage": plugin.render_stage.stats(),
+    "dispatcher": plugin.status_dispatcher.stats(),
+    "icon_updates": sum(instance.updates for instance in instances),
+  }
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("capture", help="Capture file to replay.")
+  parser.add_argument(
+    "--target", choices=("plugin", "inprocess"), default="inprocess"
+  )
+  parser.add_argument(
+    "--speed",
+    type=float,
+    default=1.0,
+    help="Playback speed; 1 is real time, 0 is as fast as possible.",
+  )
+  parser.add_argument("--loops", type=int, default=1)
+  parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH)
+  parser.add_argument("--decks", type=int, default=1)
+  parser.add_argument("--actions-per-deck", type=int, default=15)
+  parser.add_argument(
+    "--flush-interval-ms",
+    type=float,
+    help="Status coalescing interval for the in-process plugin.",
+  )
+  args = parser.parse_args()
+
+  if args.target == "plugin":
+    result = replay_into_plugin(
+      args.capture, args.socket, args.speed, args.loops
+    )
+  else:
+    result = replay_in_process(
+      args.capture,
+      args.speed,
+      args.loops,
+      args.decks,
+      args.actions_per_deck,
+      args.flush_interval_ms,
+    )
+  for stats in result["replays"]:
+    stats["frames_per_second"] = (
+      stats["frames"] / stats["elapsed"] if stats["elapsed"] else None
+    )
+  summary = {"target": args.target, "speed": args.speed, **result}
+  print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+  main()
@@ -1,6 +1,6 @@
 // background.js
 
-import { ActionCommandSchema, StatusUpdateSchema } from './schemas.mjs';
+import { ActionCommandSchema, CommandAckSchema, StateSnapshotSchema, StatusUpdateSchema } from './schemas.mjs';
 
 // The name of the native messaging host.
 // This must match the name in the native host manifest file.
@@ -9,6 +9,10 @@ const NOTIFICATION_ID = "native-host-error-notification";
 
 let port;
 
+// Meet tabs that are currently in a call, most recently active last.
+// Commands go to the last one rather than to whichever tab happens to be active.
+const inCallTabs = [];
+
 console.log("Meet Controller Bridge: Background script started.");
 
 function connect() {
@@ -20,18 +24,14 @@ function connect() {
             // Validate the incoming command from the native host
             ActionCommandSchema.parse(message);
             console.log("Received valid message from native host:", message);
+            stampTrace(message, 'background.command');
 
             // Connection is working, clear any error indicators.
             chrome.notifications.clear(NOTIFICATION_ID);
             chrome.action.setBadgeText({ text: '' });
             chrome.action.setTitle({ title: 'Meet Controller Bridge (Connected)' });
 
-            // Forward the message to the content script in the active Google Meet tab.
-            chrome.tabs.query({ url: "https://meet.google.com/*", active: true }, (tabs) => {
-                if (tabs.length > 0) {
-                    chrome.tabs.sendMessage(tabs[0].id, message);
-                }
-            });
+            forwardToMeetTab(message);
         } catch (e) {
             console.error("Invalid message received from native host, discarding.", { message, error: e });
         }
@@ -70,13 +70,93 @@ function connect() {
     });
 }
 
+// Adds this hop's timestamp to a message's latency trace, if it carries one.
+function stampTrace(message, hop) {
+    if (message.trace) {
+        message.trace.stamps[hop] = performance.now();
+    }
+}
+
+function markTabInCall(tabId, inCall) {
+    const index = inCallTabs.indexOf(tabId);
+    if (index !== -1) {
+        inCallTabs.splice(index, 1);
+    }
+    if (inCall) {
+        inCallTabs.push(tabId);
+    }
+}
+
+// Passes the answer to a command with an id back to the plugin. A tab that
+// could not be reached (no content script) counts as no tab.
+function sendAck(id, response) {
+    let ack = { status: 'ack', id: id, result: 'no_tab' };
+    if (!chrome.runtime.lastError && response) {
+        ack = response;
+    }
+    try {
+        CommandAckSchema.parse(ack);
+        if (port) {
+            port.postMessage(ack);
+        }
+    } catch (e) {
+        console.error("Invalid command answer from content script, not forwarding.", { ack, error: e });
+    }
+}
+
+function sendToTab(tabId, message) {
+    if (message.id === undefined) {
+        chrome.tabs.sendMessage(tabId, message);
+    } else {
+        chrome.tabs.sendMessage(tabId, message, (response) => sendAck(message.id, response));
+    }
+}
+
+// Forward a command to the Meet tab that is in a call, falling back to the
+// active Google Meet tab.
+function forwardToMeetTab(message) {
+    if (inCallTabs.length > 0) {
+        sendToTab(inCallTabs[inCallTabs.length - 1], message);
+        return;
+    }
+    chrome.tabs.query({ url: "https://meet.google.com/*", active: true }, (tabs) => {
+        if (tabs.length > 0) {
+            sendToTab(tabs[0].id, message);
+        } else if (message.id !== undefined) {
+            sendAck(message.id, null);
+        }
+    });
+}
+
+chrome.tabs.onRemoved.addListener((tabId) => markTabInCall(tabId, false));
+
 // Listen for status updates from the content script.
 chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
-    if (port && message.status === 'update') {
+    if (message.status === 'update' && sender && sender.tab) {
+        // Only a call ending takes a tab out of the call; any other "on"
+        // report means the tab is in one.
+        if (message.control === 'call' && message.state === 'off') {
+            markTabInCall(sender.tab.id, false);
+        } else if (message.state === 'on') {
+            markTabInCall(sender.tab.id, true);
+        }
+    } else if (message.status === 'snapshot' && sender && sender.tab && message.states) {
+        if (message.states.call === 'off') {
+            markTabInCall(sender.tab.id, false);
+        } else if (Object.values(message.states).includes('on')) {
+            markTabInCall(sender.tab.id, true);
+        }
+    }
+    if (port && (message.status === 'update' || message.status === 'snapshot')) {
         try {
             // Validate the outgoing status update from the content script
-            StatusUpdateSchema.parse(message);
+            if (message.status === 'snapshot') {
+                StateSnapshotSchema.parse(message);
+            } else {
+                StatusUpdateSchema.parse(message);
+            }
             console.log("Received valid status from content script:", message);
+            stampTrace(message, 'background.status');
             port.postMessage(message);
         } catch (e) {
             console.error("Invalid status message from content script, not forwarding.", { message, error: e });
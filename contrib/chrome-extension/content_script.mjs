@@ -27,94 +27,387 @@ export const SELECTORS = {
   send_reaction_crab: '[aria-label*="🦀"][role="button"]',
 };
 
+// The control whose status update shows the result of each action. A traced
+// command's trace is echoed on the next update for that control.
+const ACTION_CONTROLS = {
+  toggle_mute: 'microphone',
+  toggle_camera: 'camera',
+  raise_hand: 'hand',
+  hang_up: 'call',
+  leave_call: 'call',
+  toggle_reactions: 'reactions',
+  toggle_present: 'presenting',
+  stop_sharing: 'presenting',
+  toggle_chat_panel: 'chat_panel',
+  toggle_participants_panel: 'participants_panel',
+};
+
+// Traces waiting for their status update, by control.
+const pendingTraces = new Map();
+
 export function sendStatus(control, is_on) {
   const statusMessage = {
     status: 'update',
     control: control,
     state: is_on ? 'on' : 'off'
   };
+  const trace = pendingTraces.get(control);
+  if (trace) {
+    pendingTraces.delete(control);
+    trace.stamps['content.status'] = performance.now();
+    statusMessage.trace = trace;
+  }
   console.log("Sending status:", statusMessage);
   chrome.runtime.sendMessage(statusMessage);
 }
 
-export async function handleReactionCommand(action, reactionSelector) {
-  const reactionsToggleButton = document.querySelector(SELECTORS.toggle_reactions);
-  if (!reactionsToggleButton) {
-    console.warn("Could not find the main 'Send a reaction' button.");
-    return;
+// Reads the state of every control that can be determined from the page.
+export function readStates() {
+  const micButton = document.querySelector(SELECTORS.toggle_mute);
+  if (!micButton) {
+    return { call: 'off' };
   }
+  const onOff = (isOn) => (isOn ? 'on' : 'off');
+  const states = {
+    call: 'on',
+    microphone: onOff(micButton.getAttribute('data-is-muted') === 'false'),
+    presenting: onOff(!!document.querySelector('[aria-label*="Stop presenting" i]')),
+  };
+  const camButton = document.querySelector(SELECTORS.toggle_camera);
+  const handButton = document.querySelector(SELECTORS.raise_hand);
+  const chatPanelButton = document.querySelector(SELECTORS.toggle_chat_panel);
+  const participantsPanelButton = document.querySelector(SELECTORS.toggle_participants_panel);
 
-  const wasPanelOpen = reactionsToggleButton.getAttribute('aria-pressed') === 'true';
+  if (camButton) states.camera = onOff(camButton.getAttribute('data-is-muted') === 'false');
+  if (handButton) states.hand = onOff(handButton.getAttribute('aria-pressed') === 'true');
+  if (chatPanelButton) states.chat_panel = onOff(chatPanelButton.getAttribute('aria-pressed') === 'true');
+  if (participantsPanelButton) states.participants_panel = onOff(participantsPanelButton.getAttribute('aria-pressed') === 'true');
+  return states;
+}
 
-  if (!wasPanelOpen) {
-    reactionsToggleButton.click();
-    await new Promise(resolve => setTimeout(resolve, 250));
+// Sends every known control state in one message, which the plugin applies
+// in a single pass.
+export function sendSnapshot(states = readStates()) {
+  const snapshotMessage = { status: 'snapshot', states: states };
+  console.log("Sending snapshot:", snapshotMessage);
+  chrome.runtime.sendMessage(snapshotMessage);
+}
+
+// How long to wait for a reaction button to appear once the panel opens.
+const REACTION_BUTTON_TIMEOUT_MS = 1000;
+// How long the reactions panel stays open after the last queued reaction, so
+// quick follow-up presses do not reopen it.
+const REACTION_PANEL_IDLE_MS = 500;
+
+// Reactions waiting to be clicked, oldest first.
+const reactionQueue = [];
+let reactionQueueRunning = false;
+// Ends the idle wait early when a reaction is queued.
+let wakeReactionQueue = null;
+
+// Resolves with the first element matching `selector` as soon as it is in the
+// page, or with null after `timeoutMs`.
+export function waitForElement(selector, timeoutMs) {
+  const existing = document.querySelector(selector);
+  if (existing) {
+    return Promise.resolve(existing);
   }
+  return new Promise((resolve) => {
+    const finish = (element) => {
+      observer.disconnect();
+      clearTimeout(timer);
+      resolve(element);
+    };
+    const observer = new MutationObserver(() => {
+      const element = document.querySelector(selector);
+      if (element) {
+        finish(element);
+      }
+    });
+    const timer = setTimeout(() => finish(null), timeoutMs);
+    observer.observe(document.body, {
+      childList: true,
+      subtree: true,
+      attributes: true,
+      attributeFilter: ['aria-label'],
+    });
+  });
+}
 
-  const reactionElement = document.querySelector(reactionSelector);
-  if (reactionElement) {
-    console.log(`Clicking reaction element for action: ${action}`);
-    reactionElement.click();
-  } else {
-    console.warn(`Reaction element for action '${action}' not found with selector '${reactionSelector}'.`);
+// Clicks queued reactions until the queue has been idle for a while, opening
+// the reactions panel once for all of them and closing it at the end if it
+// was opened here.
+async function drainReactionQueue() {
+  reactionQueueRunning = true;
+  let panelButton = null;
+  let openedPanel = false;
+  for (;;) {
+    while (reactionQueue.length > 0) {
+      const { action, reactionSelector, count, resolve } = reactionQueue.shift();
+      if (!panelButton || !panelButton.isConnected) {
+        panelButton = document.querySelector(SELECTORS.toggle_reactions);
+      }
+      if (!panelButton) {
+        console.warn("Could not find the main 'Send a reaction' button.");
+        resolve(false);
+        continue;
+      }
+      if (panelButton.getAttribute('aria-pressed') !== 'true') {
+        panelButton.click();
+        openedPanel = true;
+      }
+
+      const reactionElement = await waitForElement(reactionSelector, REACTION_BUTTON_TIMEOUT_MS);
+      if (reactionElement) {
+        console.log(`Clicking reaction element for action: ${action} (x${count})`);
+        for (let i = 0; i < count; i++) {
+          reactionElement.click();
+        }
+      } else {
+        console.warn(`Reaction element for action '${action}' not found with selector '${reactionSelector}'.`);
+      }
+      resolve(!!reactionElement);
+    }
+
+    await new Promise((resolve) => {
+      wakeReactionQueue = resolve;
+      setTimeout(resolve, REACTION_PANEL_IDLE_MS);
+    });
+    wakeReactionQueue = null;
+    if (reactionQueue.length === 0) {
+      break;
+    }
+  }
+
+  if (openedPanel && panelButton && panelButton.getAttribute('aria-pressed') === 'true') {
+    panelButton.click();
   }
+  reactionQueueRunning = false;
+}
 
-  setTimeout(() => {
-    if (reactionsToggleButton.getAttribute('aria-pressed') === 'true') {
-      reactionsToggleButton.click();
+// Queues a reaction to be clicked `count` times. Resolves with whether it was
+// clicked.
+export function handleReactionCommand(action, reactionSelector, count = 1) {
+  return new Promise((resolve) => {
+    reactionQueue.push({ action, reactionSelector, count, resolve });
+    if (wakeReactionQueue) {
+      wakeReactionQueue();
+    } else if (!reactionQueueRunning) {
+      drainReactionQueue();
     }
-  }, 500);
+  });
 }
 
-export function handleCommand(message) {
+// Runtime message listener for commands. Commands that carry an id are
+// answered through `sendResponse` with whether the control was clicked,
+// which the background script passes on to the plugin.
+export function handleCommand(message, sender, sendResponse) {
   if (!message || !message.action) {
-    return;
+    return false;
   }
+  const answer = (clicked) => {
+    if (message.id !== undefined && sendResponse) {
+      sendResponse({ status: 'ack', id: message.id, result: clicked ? 'ack' : 'not_found' });
+    }
+  };
   const action = message.action;
 
   console.log("Received command:", action);
+  if (action === 'request_snapshot') {
+    sendSnapshot();
+    answer(true);
+    return false;
+  }
   const selector = SELECTORS[action];
+  if (message.trace && ACTION_CONTROLS[action]) {
+    message.trace.stamps['content.command'] = performance.now();
+    pendingTraces.set(ACTION_CONTROLS[action], message.trace);
+  }
 
   if (action.startsWith('send_reaction_')) {
-    handleReactionCommand(action, selector);
+    handleReactionCommand(action, selector, message.count || 1).then(answer);
+    // Keeps the response channel open until the reaction has been sent.
+    return message.id !== undefined;
   } else if (selector) {
     const element = document.querySelector(selector);
     if (element) {
       console.log(`Clicking element for action: ${action}`);
       element.click();
+      answer(true);
     } else {
       console.warn(`Element for action '${action}' not found with selector '${selector}'.`);
+      pendingTraces.delete(ACTION_CONTROLS[action]);
+      answer(false);
     }
   } else {
     console.warn(`No selector defined for action: ${action}`);
+    answer(false);
+  }
+  return false;
+}
+
+// Toolbar elements whose attributes report a control's state, by control.
+// They are watched directly rather than through the whole document, whose
+// video tiles, captions and chat change all the time.
+const WATCHED_CONTROLS = {
+  // Any mute button means the call controls are showing.
+  call: SELECTORS.toggle_mute,
+  microphone: '[data-is-muted][aria-label*="microphone" i]',
+  camera: SELECTORS.toggle_camera,
+  hand: SELECTORS.raise_hand,
+  reactions: SELECTORS.toggle_reactions,
+  // Watched for "Present now" turning into "Stop presenting".
+  presenting: SELECTORS.toggle_present,
+  chat_panel: SELECTORS.toggle_chat_panel,
+  participants_panel: SELECTORS.toggle_participants_panel,
+};
+const WATCHED_ATTRIBUTES = ['data-is-muted', 'aria-pressed', 'aria-label'];
+
+// Reads the state a watched element shows, for the controls that have one.
+const readUnmuted = (element) => element.getAttribute('data-is-muted') === 'false';
+const readPressed = (element) => element.getAttribute('aria-pressed') === 'true';
+const CONTROL_READERS = {
+  microphone: readUnmuted,
+  camera: readUnmuted,
+  hand: readPressed,
+  reactions: readPressed,
+  chat_panel: readPressed,
+  participants_panel: readPressed,
+};
+
+// Animation frames do not run in a hidden tab, so checks fall back to a timer.
+const HIDDEN_CHECK_DELAY_MS = 100;
+
+// Reports the state change recorded by an attribute mutation, if any.
+export function reportAttributeChange(mutation) {
+  const element = mutation.target;
+  const ariaLabel = (element.getAttribute('aria-label') || '').toLowerCase();
+
+  if (mutation.attributeName === 'data-is-muted') {
+    const isMuted = element.getAttribute('data-is-muted') === 'true';
+    if (ariaLabel.includes('microphone')) {
+      sendStatus('microphone', !isMuted);
+    } else if (ariaLabel.includes('camera')) {
+      sendStatus('camera', !isMuted);
+    }
+  } else if (mutation.attributeName === 'aria-pressed') {
+    const isPressed = element.getAttribute('aria-pressed') === 'true';
+    if (ariaLabel.includes('raise hand')) {
+      sendStatus('hand', isPressed);
+    } else if (ariaLabel.includes('send a reaction')) {
+      sendStatus('reactions', isPressed);
+    } else if (ariaLabel.includes('chat with everyone')) {
+      sendStatus('chat_panel', isPressed);
+    } else if (ariaLabel.includes('show everyone')) {
+      sendStatus('participants_panel', isPressed);
+    }
   }
 }
 
+// Watches the page for call and control state changes. Returns a function
+// that stops watching.
+//
+// Control changes come from an observer on the cached toolbar elements only.
+// Everything else in the document just schedules a check, at most once per
+// animation frame, for the call starting or ending and for presenting.
+// Controls are looked up again only when their element was detached, or
+// when an element that matches a missing control (e.g. one that was in the
+// overflow menu) is added to the page.
 export function setupStateObserver() {
   let lastKnownPresentingState = false;
   let inCall = false;
+  let checkScheduled = false;
+  // control -> watched element.
+  const tracked = new Map();
+  // Selector for the controls without an element; '' when none is missing.
+  let missingSelector = '';
+  let resolvePending = true;
+
+  const attributeObserver = new MutationObserver((mutationsList) => {
+    if (!inCall) {
+      return;
+    }
+    for (const mutation of mutationsList) {
+      if (mutation.attributeName === 'aria-label') {
+        // e.g. "Present now" turning into "Stop presenting".
+        scheduleCheck();
+      } else {
+        reportAttributeChange(mutation);
+      }
+    }
+  });
+
+  // Looks up the controls that are missing or whose element was detached,
+  // and reports the state shown by the ones that were swapped in.
+  function resolveControls() {
+    resolvePending = false;
+    let changed = false;
+    const missing = [];
+    for (const [control, selector] of Object.entries(WATCHED_CONTROLS)) {
+      const current = tracked.get(control);
+      if (current && current.isConnected) {
+        continue;
+      }
+      const element = document.querySelector(selector);
+      if (element) {
+        tracked.set(control, element);
+        changed = true;
+        // At the start of a call the snapshot covers this.
+        if (inCall && CONTROL_READERS[control]) {
+          sendStatus(control, CONTROL_READERS[control](element));
+        }
+      } else {
+        if (current) {
+          tracked.delete(control);
+          changed = true;
+        }
+        missing.push(selector);
+      }
+    }
+    missingSelector = missing.join(', ');
+    if (changed) {
+      attributeObserver.disconnect();
+      for (const element of new Set(tracked.values())) {
+        attributeObserver.observe(element, {
+          attributes: true,
+          attributeFilter: WATCHED_ATTRIBUTES,
+        });
+      }
+    }
+  }
 
-  const observer = new MutationObserver((mutationsList) => {
-    const micButton = document.querySelector(SELECTORS.toggle_mute);
+  // Whether a mutation added an element for a missing control.
+  function addsMissingControl(mutation) {
+    for (const node of mutation.addedNodes) {
+      if (node.nodeType === Node.ELEMENT_NODE
+          && (node.matches(missingSelector) || node.querySelector(missingSelector))) {
+        return true;
+      }
+    }
+    return false;
+  }
+
+  function checkPage() {
+    checkScheduled = false;
+    for (const element of tracked.values()) {
+      if (!element.isConnected) {
+        resolvePending = true;
+        break;
+      }
+    }
+    if (resolvePending) {
+      resolveControls();
+    }
+    const callControls = tracked.get('call');
 
-    if (micButton && !inCall) {
+    if (callControls && !inCall) {
       console.log("Call has started. Syncing initial state.");
       inCall = true;
-      const camButton = document.querySelector(SELECTORS.toggle_camera);
-      const handButton = document.querySelector(SELECTORS.raise_hand);
-      sendStatus('microphone', micButton.getAttribute('data-is-muted') === 'false');
-      const chatPanelButton = document.querySelector(SELECTORS.toggle_chat_panel);
-      const participantsPanelButton = document.querySelector(SELECTORS.toggle_participants_panel);
-
-      if (camButton) sendStatus('camera', camButton.getAttribute('data-is-muted') === 'false');
-      if (handButton) sendStatus('hand', handButton.getAttribute('aria-pressed') === 'true');
-
-      const isPresenting = !!document.querySelector('[aria-label*="Stop presenting" i]');
-      lastKnownPresentingState = isPresenting;
-      sendStatus('presenting', isPresenting);
-      if (chatPanelButton) sendStatus('chat_panel', chatPanelButton.getAttribute('aria-pressed') === 'true');
-      if (participantsPanelButton) sendStatus('participants_panel', participantsPanelButton.getAttribute('aria-pressed') === 'true');
-    } else if (!micButton && inCall) {
+      const states = readStates();
+      lastKnownPresentingState = states.presenting === 'on';
+      sendSnapshot(states);
+      return;
+    } else if (!callControls && inCall) {
       console.log("Call has ended.");
       inCall = false;
       sendStatus('call', false);
@@ -129,50 +422,43 @@ export function setupStateObserver() {
       return;
     }
 
-    for (const mutation of mutationsList) {
-      if (mutation.type === 'attributes' && mutation.target.hasAttribute('data-is-muted')) {
-        const element = mutation.target;
-        const isMuted = element.getAttribute('data-is-muted') === 'true';
-
-        const ariaLabel = element.getAttribute('aria-label') || '';
-        if (ariaLabel.toLowerCase().includes('microphone')) {
-          sendStatus('microphone', !isMuted);
-        } else if (ariaLabel.toLowerCase().includes('camera')) {
-          sendStatus('camera', !isMuted);
-        }
-      }
-      if (mutation.type === 'attributes' && mutation.attributeName === 'aria-pressed') {
-        const element = mutation.target;
-        const ariaLabel = element.getAttribute('aria-label') || '';
-        const isPressed = element.getAttribute('aria-pressed') === 'true';
-
-        if (ariaLabel.toLowerCase().includes('raise hand')) {
-          sendStatus('hand', isPressed);
-        } else if (ariaLabel.toLowerCase().includes('send a reaction')) {
-          sendStatus('reactions', isPressed);
-        } else if (ariaLabel.toLowerCase().includes('chat with everyone')) {
-          sendStatus('chat_panel', isPressed);
-        } else if (ariaLabel.toLowerCase().includes('show everyone')) {
-          sendStatus('participants_panel', isPressed);
-        }
-      }
-    }
-
     const isPresentingNow = !!document.querySelector('[aria-label*="Stop presenting" i]');
     if (isPresentingNow !== lastKnownPresentingState) {
       console.log(`Presenting state changed to: ${isPresentingNow}`);
       lastKnownPresentingState = isPresentingNow;
       sendStatus('presenting', isPresentingNow);
     }
-  });
+  }
 
-  observer.observe(document.body, {
-    attributes: true,
-    attributeFilter: ['data-is-muted', 'aria-pressed'],
-    subtree: true,
+  function scheduleCheck() {
+    if (checkScheduled) {
+      return;
+    }
+    checkScheduled = true;
+    if (document.hidden || typeof requestAnimationFrame === 'undefined') {
+      setTimeout(checkPage, HIDDEN_CHECK_DELAY_MS);
+    } else {
+      requestAnimationFrame(checkPage);
+    }
+  }
+
+  const documentObserver = new MutationObserver((mutationsList) => {
+    if (!resolvePending && missingSelector) {
+      resolvePending = mutationsList.some(addsMissingControl);
+    }
+    scheduleCheck();
+  });
+  documentObserver.observe(document.body, {
     childList: true,
+    subtree: true,
   });
+  scheduleCheck();
   console.log("Meet Controller: State observer is now active.");
+
+  return () => {
+    documentObserver.disconnect();
+    attributeObserver.disconnect();
+  };
 }
 
 function main() {
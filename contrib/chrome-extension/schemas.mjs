@@ -29,16 +29,49 @@ export const ActionType = z.enum([
   "send_reaction_thumb_down",
   "send_reaction_plus",
   "send_reaction_crab",
+  // Not a control: asks the content script for a StateSnapshot.
+  "request_snapshot",
 ]);
 
+export const ControlType = z.enum(["microphone", "camera", "hand", "reactions", "call", "presenting", "chat_panel", "participants_panel"]);
+
+export const ControlState = z.enum(["on", "off"]);
+
+// Optional latency trace; see tracing.py. Each hop adds a millisecond
+// timestamp under its own name.
+export const TraceSchema = z.object({
+  id: z.number().int(),
+  stamps: z.record(z.number()),
+}).strict();
+
 export const ActionCommandSchema = z.object({
   action: ActionType,
+  trace: TraceSchema.optional(),
+  // Correlation id; the command is answered with a CommandAckSchema message.
+  id: z.number().int().optional(),
+  // How many times to send a reaction; once if not given.
+  count: z.number().int().min(1).max(10).optional(),
 }).strict();
 
 export const StatusUpdateSchema = z.object({
   status: z.literal("update"),
-  control: z.enum(["microphone", "camera", "hand", "reactions", "call", "presenting", "chat_panel", "participants_panel"]),
-  state: z.enum(["on", "off"]),
+  control: ControlType,
+  state: ControlState,
+  trace: TraceSchema.optional(),
+}).strict();
+
+// Every control state the content script could determine, in one message.
+// Sent when a call starts and in answer to "request_snapshot".
+export const StateSnapshotSchema = z.object({
+  status: z.literal("snapshot"),
+  states: z.record(ControlType, ControlState),
+}).strict();
+
+// The answer to a command that carried an id; see acks.py.
+export const CommandAckSchema = z.object({
+  status: z.literal("ack"),
+  id: z.number().int(),
+  result: z.enum(["ack", "not_found", "no_tab"]),
 }).strict();
 
 export const ErrorSchema = z.object({
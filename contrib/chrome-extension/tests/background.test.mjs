@@ -12,6 +12,9 @@ global.chrome = {
   tabs: {
     query: jest.fn(),
     sendMessage: jest.fn(),
+    onRemoved: {
+      addListener: jest.fn(),
+    },
   },
   action: {
     setBadgeText: jest.fn(),
@@ -148,4 +151,64 @@ describe('Background Script', () => {
     );
     consoleErrorSpy.mockRestore();
   });
+
+  it('should forward commands to the tab that is in a call', () => {
+    const [onStatusCallback] = chrome.runtime.onMessage.addListener.mock.calls[0];
+    const [onMessageCallback] = port.onMessage.addListener.mock.calls[0];
+
+    onStatusCallback({ status: 'update', control: 'call', state: 'on' }, { tab: { id: 7 } });
+    onMessageCallback({ action: 'toggle_mute' });
+
+    expect(chrome.tabs.query).not.toHaveBeenCalled();
+    expect(chrome.tabs.sendMessage).toHaveBeenCalledWith(7, { action: 'toggle_mute' });
+  });
+
+  it('should fall back to the active Meet tab once the call ends', () => {
+    const [onStatusCallback] = chrome.runtime.onMessage.addListener.mock.calls[0];
+    const [onMessageCallback] = port.onMessage.addListener.mock.calls[0];
+    chrome.tabs.query.mockImplementation((query, callback) => {
+      callback([{ id: 1 }]);
+    });
+
+    onStatusCallback({ status: 'update', control: 'call', state: 'on' }, { tab: { id: 7 } });
+    onStatusCallback({ status: 'update', control: 'call', state: 'off' }, { tab: { id: 7 } });
+    onMessageCallback({ action: 'toggle_mute' });
+
+    expect(chrome.tabs.sendMessage).toHaveBeenCalledWith(1, { action: 'toggle_mute' });
+  });
+
+  it('should forward snapshots and route commands to the tab they came from', () => {
+    const [onStatusCallback] = chrome.runtime.onMessage.addListener.mock.calls[0];
+    const [onMessageCallback] = port.onMessage.addListener.mock.calls[0];
+    const snapshot = { status: 'snapshot', states: { call: 'on', microphone: 'off' } };
+
+    onStatusCallback(snapshot, { tab: { id: 9 } });
+    onMessageCallback({ action: 'toggle_mute' });
+
+    expect(port.postMessage).toHaveBeenCalledWith(snapshot);
+    expect(chrome.tabs.sendMessage).toHaveBeenCalledWith(9, { action: 'toggle_mute' });
+  });
+
+  it('should pass the answer to a command with an id back to the native host', () => {
+    const [onStatusCallback] = chrome.runtime.onMessage.addListener.mock.calls[0];
+    const [onMessageCallback] = port.onMessage.addListener.mock.calls[0];
+
+    onStatusCallback({ status: 'update', control: 'call', state: 'on' }, { tab: { id: 7 } });
+    onMessageCallback({ action: 'hang_up', id: 12 });
+
+    const [tabId, message, callback] = chrome.tabs.sendMessage.mock.calls[0];
+    expect(tabId).toBe(7);
+    expect(message).toEqual({ action: 'hang_up', id: 12 });
+    callback({ status: 'ack', id: 12, result: 'not_found' });
+    expect(port.postMessage).toHaveBeenLastCalledWith({ status: 'ack', id: 12, result: 'not_found' });
+  });
+
+  it('should answer no_tab when there is no Meet tab', () => {
+    const [onMessageCallback] = port.onMessage.addListener.mock.calls[0];
+    chrome.tabs.query.mockImplementation((query, callback) => callback([]));
+
+    onMessageCallback({ action: 'toggle_mute', id: 13 });
+
+    expect(port.postMessage).toHaveBeenCalledWith({ status: 'ack', id: 13, result: 'no_tab' });
+  });
 });
@@ -2,7 +2,9 @@
  * @jest-environment jsdom
  */
 import { jest } from '@jest/globals';
-import { handleCommand, sendStatus, handleReactionCommand } from '../content_script.mjs';
+import { SELECTORS, handleCommand, sendStatus, handleReactionCommand, readStates, setupStateObserver } from '../content_script.mjs';
+
+const nextFrame = () => new Promise((resolve) => requestAnimationFrame(() => resolve()));
 
 global.chrome = {
   runtime: {
@@ -61,18 +63,181 @@ describe('Content Script', () => {
     const reactionButton = document.querySelector('[aria-label*="💖"]');
     const clickSpy = jest.spyOn(reactionButton, 'click');
 
-    const reactionPromise = handleReactionCommand('send_reaction_heart', '[aria-label*="💖"][role="button"]');
-
-    // Advance timers to allow the first setTimeout to resolve
-    jest.advanceTimersByTime(250);
-
-    await reactionPromise;
+    const clicked = await handleReactionCommand('send_reaction_heart', '[aria-label*="💖"][role="button"]');
 
+    expect(clicked).toBe(true);
     expect(clickSpy).toHaveBeenCalled();
 
-    // Advance timers to allow the second setTimeout to resolve
+    // Let the idle panel close
     jest.advanceTimersByTime(500);
 
     jest.useRealTimers();
   });
-});
\ No newline at end of file
+
+  it('should send queued reactions with the panel opened once', async () => {
+    const panelButton = document.querySelector('[aria-label="Send a reaction"]');
+    panelButton.setAttribute('aria-pressed', 'false');
+    const panelClicks = jest.fn();
+    // The reaction buttons only appear once the panel has opened
+    panelButton.addEventListener('click', () => {
+      panelClicks();
+      const open = panelButton.getAttribute('aria-pressed') !== 'true';
+      panelButton.setAttribute('aria-pressed', open ? 'true' : 'false');
+      if (open) {
+        setTimeout(() => {
+          document.body.insertAdjacentHTML('beforeend', `
+            <div id="panel">
+              <div aria-label="👍" role="button"></div>
+              <div aria-label="👏" role="button"></div>
+            </div>`);
+        }, 20);
+      } else {
+        document.getElementById('panel').remove();
+      }
+    });
+    const clicks = {};
+    document.body.addEventListener('click', (event) => {
+      const label = event.target.getAttribute('aria-label');
+      clicks[label] = (clicks[label] || 0) + 1;
+    });
+
+    const results = await Promise.all([
+      handleReactionCommand('send_reaction_thumb_up', SELECTORS.send_reaction_thumb_up),
+      handleReactionCommand('send_reaction_clap', SELECTORS.send_reaction_clap, 3),
+      handleReactionCommand('send_reaction_thumb_up', SELECTORS.send_reaction_thumb_up),
+    ]);
+
+    expect(results).toEqual([true, true, true]);
+    expect(clicks['👍']).toBe(2);
+    expect(clicks['👏']).toBe(3);
+    expect(panelClicks).toHaveBeenCalledTimes(1);
+
+    // The panel closes once no more reactions arrive
+    await new Promise((resolve) => setTimeout(resolve, 600));
+    expect(panelClicks).toHaveBeenCalledTimes(2);
+    expect(panelButton.getAttribute('aria-pressed')).toBe('false');
+  });
+
+  it('should echo a command trace on the resulting status update', () => {
+    const trace = { id: 7, stamps: { 'plugin.command': 1.5 } };
+    handleCommand({ action: 'toggle_mute', trace });
+    expect(trace.stamps['content.command']).toEqual(expect.any(Number));
+
+    // Other controls do not pick up the trace
+    sendStatus('camera', true);
+    expect(chrome.runtime.sendMessage).toHaveBeenLastCalledWith({
+      status: 'update', control: 'camera', state: 'on',
+    });
+
+    sendStatus('microphone', true);
+    const echoed = chrome.runtime.sendMessage.mock.calls.at(-1)[0];
+    expect(echoed.trace.id).toBe(7);
+    expect(echoed.trace.stamps['content.status']).toEqual(expect.any(Number));
+
+    // The trace is only echoed once
+    sendStatus('microphone', false);
+    expect(chrome.runtime.sendMessage.mock.calls.at(-1)[0].trace).toBeUndefined();
+  });
+
+  it('should answer a snapshot request with every control state', () => {
+    handleCommand({ action: 'request_snapshot' });
+
+    expect(chrome.runtime.sendMessage).toHaveBeenCalledTimes(1);
+    expect(chrome.runtime.sendMessage).toHaveBeenCalledWith({
+      status: 'snapshot',
+      states: {
+        call: 'on',
+        microphone: 'off',
+        camera: 'off',
+        hand: 'off',
+        presenting: 'off',
+        chat_panel: 'off',
+        participants_panel: 'off',
+      },
+    });
+  });
+
+  it('should report only the call state when not in a call', () => {
+    document.body.innerHTML = '';
+    expect(readStates()).toEqual({ call: 'off' });
+  });
+
+  it('should answer commands that carry an id', () => {
+    const sendResponse = jest.fn();
+    handleCommand({ action: 'toggle_mute', id: 4 }, {}, sendResponse);
+    expect(sendResponse).toHaveBeenCalledWith({ status: 'ack', id: 4, result: 'ack' });
+
+    document.body.innerHTML = '';
+    handleCommand({ action: 'toggle_camera', id: 5 }, {}, sendResponse);
+    expect(sendResponse).toHaveBeenLastCalledWith({ status: 'ack', id: 5, result: 'not_found' });
+  });
+
+  it('should watch the toolbar controls and re-resolve them when replaced', async () => {
+    const stop = setupStateObserver();
+    await nextFrame();
+    expect(chrome.runtime.sendMessage).toHaveBeenLastCalledWith(
+      expect.objectContaining({ status: 'snapshot' }));
+
+    document.querySelector('[aria-label*="microphone"]').setAttribute('data-is-muted', 'false');
+    await nextFrame();
+    expect(chrome.runtime.sendMessage).toHaveBeenLastCalledWith({
+      status: 'update', control: 'microphone', state: 'on',
+    });
+
+    // Meet rebuilds the toolbar; the new buttons are watched instead, and
+    // the states they show are reported
+    const toolbar = document.body.innerHTML;
+    document.body.innerHTML = toolbar;
+    await nextFrame();
+    expect(chrome.runtime.sendMessage).toHaveBeenCalledWith({
+      status: 'update', control: 'microphone', state: 'on',
+    });
+    chrome.runtime.sendMessage.mockClear();
+    document.querySelector('[aria-label*="camera"]').setAttribute('data-is-muted', 'false');
+    await nextFrame();
+    expect(chrome.runtime.sendMessage).toHaveBeenCalledTimes(1);
+    expect(chrome.runtime.sendMessage).toHaveBeenCalledWith({
+      status: 'update', control: 'camera', state: 'on',
+    });
+
+    // Churn elsewhere in the page does not report anything
+    chrome.runtime.sendMessage.mockClear();
+    for (let i = 0; i < 10; i++) {
+      document.body.appendChild(document.createElement('div'));
+    }
+    await nextFrame();
+    expect(chrome.runtime.sendMessage).not.toHaveBeenCalled();
+
+    document.body.innerHTML = '';
+    await nextFrame();
+    expect(chrome.runtime.sendMessage).toHaveBeenLastCalledWith({
+      status: 'update', control: 'call', state: 'off',
+    });
+    stop();
+  });
+
+  it('should only look for a missing control when one is added', async () => {
+    document.querySelector('[aria-label="raise hand"]').remove();
+    const stop = setupStateObserver();
+    await nextFrame();
+
+    // Churn does not look the toolbar up again, only checks presenting
+    const querySpy = jest.spyOn(document, 'querySelector');
+    for (let i = 0; i < 10; i++) {
+      document.body.appendChild(document.createElement('div'));
+    }
+    await nextFrame();
+    expect(querySpy.mock.calls).toEqual([['[aria-label*="Stop presenting" i]']]);
+    querySpy.mockRestore();
+
+    // The button comes back from the overflow menu
+    chrome.runtime.sendMessage.mockClear();
+    document.body.insertAdjacentHTML(
+      'beforeend', '<div><div aria-label="Raise hand" aria-pressed="true"></div></div>');
+    await nextFrame();
+    expect(chrome.runtime.sendMessage).toHaveBeenCalledWith({
+      status: 'update', control: 'hand', state: 'on',
+    });
+    stop();
+  });
+});
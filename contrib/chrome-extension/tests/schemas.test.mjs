@@ -1,5 +1,5 @@
 
-import { ActionCommandSchema, StatusUpdateSchema, ErrorSchema, ActionType } from '../schemas.mjs';
+import { ActionCommandSchema, CommandAckSchema, StatusUpdateSchema, StateSnapshotSchema, ErrorSchema, ActionType } from '../schemas.mjs';
 
 describe('Schemas', () => {
   describe('ActionType', () => {
@@ -11,7 +11,7 @@ describe('Schemas', () => {
         "send_reaction_heart", "send_reaction_thumb_up", "send_reaction_celebrate",
         "send_reaction_clap", "send_reaction_laugh", "send_reaction_surprised",
         "send_reaction_sad", "send_reaction_thinking", "send_reaction_thumb_down",
-        "send_reaction_plus", "send_reaction_crab"
+        "send_reaction_plus", "send_reaction_crab", "request_snapshot"
       ];
       expect(ActionType.options).toEqual(expect.arrayContaining(expectedActions));
       expect(expectedActions).toEqual(expect.arrayContaining(ActionType.options));
@@ -52,6 +52,29 @@ describe('Schemas', () => {
     });
   });
 
+  describe('StateSnapshotSchema', () => {
+    it('should validate a snapshot of several controls', () => {
+      const snapshot = { status: 'snapshot', states: { call: 'on', microphone: 'off', camera: 'on' } };
+      expect(() => StateSnapshotSchema.parse(snapshot)).not.toThrow();
+    });
+
+    it('should invalidate a snapshot with an unknown control or state', () => {
+      expect(() => StateSnapshotSchema.parse({ status: 'snapshot', states: { teleporter: 'on' } })).toThrow();
+      expect(() => StateSnapshotSchema.parse({ status: 'snapshot', states: { camera: 'maybe' } })).toThrow();
+    });
+  });
+
+  describe('CommandAckSchema', () => {
+    it('should validate an answer to a command with an id', () => {
+      expect(() => ActionCommandSchema.parse({ action: 'hang_up', id: 3 })).not.toThrow();
+      expect(() => CommandAckSchema.parse({ status: 'ack', id: 3, result: 'no_tab' })).not.toThrow();
+    });
+
+    it('should invalidate an answer with an unknown result', () => {
+      expect(() => CommandAckSchema.parse({ status: 'ack', id: 3, result: 'maybe' })).toThrow();
+    });
+  });
+
   describe('ErrorSchema', () => {
     it('should validate a correct error message', () => {
       const validError = { status: 'error', message: 'An error occurred' };
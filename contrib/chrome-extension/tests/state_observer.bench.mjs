@@ -0,0 +1,135 @@
+/**
+ * @jest-environment jsdom
+ *
+ * Measures how much time the content script's observer callbacks take while
+ * the page churns the way a Meet call does (video tiles, captions), per 1,000
+ * mutations. Run with `npm run bench`.
+ */
+import { jest } from '@jest/globals';
+import { SELECTORS, setupStateObserver } from '../content_script.mjs';
+
+global.chrome = {
+  runtime: {
+    sendMessage: jest.fn(),
+    onMessage: {
+      addListener: jest.fn()
+    }
+  },
+};
+
+const MUTATIONS = 5000;
+// Mutation batches delivered between two animation frames.
+const BATCHES_PER_FRAME = 20;
+
+const nextFrame = () => new Promise((resolve) => requestAnimationFrame(() => resolve()));
+
+// Counts the time spent in MutationObserver and animation frame callbacks.
+let callbackTime = 0;
+const timed = (callback) => (...args) => {
+  const start = performance.now();
+  try {
+    return callback(...args);
+  } finally {
+    callbackTime += performance.now() - start;
+  }
+};
+const NativeMutationObserver = global.MutationObserver;
+const nativeRequestAnimationFrame = global.requestAnimationFrame;
+
+// The observer before it was scoped to the toolbar: the whole document, and
+// two document queries on every mutation batch.
+function setupDocumentObserver() {
+  const observer = new MutationObserver((mutationsList) => {
+    document.querySelector(SELECTORS.toggle_mute);
+    for (const mutation of mutationsList) {
+      if (mutation.type === 'attributes' && mutation.target.hasAttribute('data-is-muted')) {
+        mutation.target.getAttribute('aria-label');
+      }
+    }
+    document.querySelector('[aria-label*="Stop presenting" i]');
+  });
+  observer.observe(document.body, {
+    attributes: true,
+    attributeFilter: ['data-is-muted', 'aria-pressed'],
+    subtree: true,
+    childList: true,
+  });
+  return () => observer.disconnect();
+}
+
+function buildCallPage() {
+  const tiles = Array.from({ length: 25 }, (_, i) =>
+    `<div class="tile"><video></video><div class="name">Participant ${i}</div></div>`).join('');
+  document.body.innerHTML = `
+    <main><div id="grid">${tiles}</div><div id="captions"></div></main>
+    <div role="toolbar">
+      <div data-is-muted="true" aria-label="Turn on microphone"></div>
+      <div data-is-muted="true" aria-label="Turn on camera"></div>
+      <div aria-label="Raise hand" aria-pressed="false"></div>
+      <div aria-label="Send a reaction" aria-pressed="false"></div>
+      <div aria-label="Present now"></div>
+      <div aria-label="Chat with everyone" aria-pressed="false"></div>
+      <div aria-label="Show everyone" role="button" aria-pressed="false"></div>
+      <div aria-label="Leave call"></div>
+    </div>
+  `;
+}
+
+// Caption lines coming and going, and tiles being re-rendered.
+async function churn() {
+  const grid = document.getElementById('grid');
+  const captions = document.getElementById('captions');
+  for (let i = 0; i < MUTATIONS; i++) {
+    if (i % 2) {
+      const line = document.createElement('span');
+      line.textContent = `caption ${i}`;
+      captions.appendChild(line);
+      if (captions.childElementCount > 20) {
+        captions.firstElementChild.remove();
+      }
+    } else {
+      grid.appendChild(grid.firstElementChild);
+    }
+    await Promise.resolve();  // One mutation batch
+    if (i % BATCHES_PER_FRAME === BATCHES_PER_FRAME - 1) {
+      await nextFrame();
+    }
+  }
+  await nextFrame();
+}
+
+async function measure(setup) {
+  buildCallPage();
+  global.MutationObserver = class extends NativeMutationObserver {
+    constructor(callback) {
+      super(timed(callback));
+    }
+  };
+  global.requestAnimationFrame = (callback) => nativeRequestAnimationFrame(timed(callback));
+  try {
+    const stop = setup();
+    await nextFrame();
+    callbackTime = 0;
+    await churn();
+    stop();
+    return callbackTime * 1000 / MUTATIONS;
+  } finally {
+    global.MutationObserver = NativeMutationObserver;
+    global.requestAnimationFrame = nativeRequestAnimationFrame;
+  }
+}
+
+describe('State observer benchmark', () => {
+  beforeAll(() => {
+    jest.spyOn(console, 'log').mockImplementation(() => {});
+  });
+
+  it('measures callback cost per 1,000 mutations', async () => {
+    const documentCost = await measure(setupDocumentObserver);
+    const scopedCost = await measure(setupStateObserver);
+    console.info(
+      `Observer callbacks per 1,000 mutations: whole document ${documentCost.toFixed(2)} ms,`
+      + ` scoped to the toolbar ${scopedCost.toFixed(2)} ms`);
+    expect(scopedCost).toBeLessThan(documentCost);
+  }, 120000);
+});
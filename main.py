@@ -10,28 +10,47 @@ from typing import Any
 # Add plugin to sys.paths
 sys.path.append(os.path.dirname(__file__))
 
-from pydantic import ValidationError
 from src.backend.PluginManager.ActionHolder import ActionHolder
 from src.backend.PluginManager.PluginBase import PluginBase
 
-# Import actions
-from GoogleMeetPlugin.actions.HangUpAction import HangUpAction
-from GoogleMeetPlugin.actions.RaiseHandAction import RaiseHandAction
-from GoogleMeetPlugin.actions.SendHeartAction import SendHeartAction
-from GoogleMeetPlugin.actions.SendThumbUpAction import SendThumbUpAction
-from GoogleMeetPlugin.actions.ToggleCameraAction import ToggleCameraAction
-from GoogleMeetPlugin.actions.ToggleChatPanelAction import ToggleChatPanelAction
-from GoogleMeetPlugin.actions.ToggleMuteAction import ToggleMuteAction
-from GoogleMeetPlugin.actions.ToggleParticipantsPanelAction import (
-  ToggleParticipantsPanelAction,
+from GoogleMeetPlugin.acks import DEFAULT_ACK_TIMEOUT, CommandTracker
+from GoogleMeetPlugin.actions import ACTIONS, LazyActionClass
+from GoogleMeetPlugin.capture import FrameRecorder
+from GoogleMeetPlugin.diagnostics import MessageHistory, SampledDebugLog
+from GoogleMeetPlugin.dispatcher import (
+  DEFAULT_FLUSH_INTERVAL,
+  DEFAULT_OVERFLOW_POLICY,
+  DEFAULT_RENDER_QUEUE_SIZE,
+  CoalescingDispatcher,
+  RenderStage,
 )
-from GoogleMeetPlugin.actions.TogglePresentAction import TogglePresentAction
-from GoogleMeetPlugin.models import ActionCommand, StatusUpdate
+from GoogleMeetPlugin.registry import ActionRegistry
+from GoogleMeetPlugin.scheduler import (
+  DEFAULT_BURST,
+  DEFAULT_RATE,
+  DEFAULT_WINDOW,
+  CommandScheduler,
+)
+from GoogleMeetPlugin.sessions import SessionRegistry
 from GoogleMeetPlugin.socket_ipc import SocketIPCServer
+from GoogleMeetPlugin.state import STATUS_ACTION_MAP, MeetState
+from GoogleMeetPlugin.tracing import LatencyTracer
+from GoogleMeetPlugin.validation import (
+  MessageValidationError,
+  set_strict_validation,
+  validate_command,
+  validate_status,
+)
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# How long an optimistic icon waits for its status update.
+DEFAULT_OPTIMISTIC_TIMEOUT = 1.5
+
+# How long a key shows the error state after its command failed, in seconds.
+COMMAND_FAILURE_DURATION = 2
+
 
 class GoogleMeetPlugin(PluginBase):
   """A StreamController plugin to control Google Meet via a Chrome extension.
@@ -45,6 +64,108 @@ class GoogleMeetPlugin(PluginBase):
     """Initializes the GoogleMeetPlugin."""
     super().__init__()
 
+    # Live Meet action instances, populated as keys appear on decks.
+    self.action_registry = ActionRegistry()
+    # The last known state of every control in the routed call; new keys
+    # read their initial icon from it.
+    self.meet_state = MeetState()
+
+    # Per-message logging is sampled at debug level; the recent messages are
+    # kept in memory and logged when an invalid one arrives.
+    self.message_history = MessageHistory()
+    self._log_status = SampledDebugLog(logger)
+
+    # Coalesce bursts of status updates into one render per key. The flush
+    # interval can be tuned (or set to 0 to disable) in the plugin settings.
+    settings = self.get_settings() or {}
+
+    # Messages are checked against lookup tables built from models.py. The
+    # "strict_validation" setting uses the pydantic models instead, which is
+    # slower but gives detailed errors when debugging.
+    if settings.get("strict_validation"):
+      set_strict_validation(True)
+    flush_interval = settings.get(
+      "status_flush_interval_ms", DEFAULT_FLUSH_INTERVAL * 1000
+    )
+    self.status_dispatcher = CoalescingDispatcher(
+      self._apply_status, flush_interval=flush_interval / 1000
+    )
+    self.status_dispatcher.start()
+
+    # Messages are handled on a render thread, so the IPC thread only reads
+    # from the socket. The queue in between holds "render_queue_size"
+    # messages; "render_queue_overflow" says what to do beyond that
+    # ("block", "drop_oldest" or "drop_newest"); acks and snapshots are
+    # never dropped, nor do they count towards it. The asyncio server puts
+    # messages from its event loop, where blocking would stall every
+    # connection, so it drops the oldest by default instead.
+    use_asyncio = settings.get("ipc_backend") == "asyncio"
+    overflow = settings.get(
+      "render_queue_overflow",
+      "drop_oldest" if use_asyncio else DEFAULT_OVERFLOW_POLICY,
+    )
+    if use_asyncio and overflow == "block":
+      logger.warning(
+        "render_queue_overflow 'block' stalls every connection of the"
+        " asyncio server while the render queue is full."
+      )
+    self.render_stage = RenderStage(
+      maxsize=settings.get("render_queue_size", DEFAULT_RENDER_QUEUE_SIZE),
+      overflow=overflow,
+    )
+    self.render_stage.start()
+
+    # Key presses go through a scheduler that collapses toggles pressed
+    # within "command_window_ms" of each other, drops duplicate hang ups and
+    # limits each action to "command_rate" commands per second. With
+    # optimistic icons the first toggle press is held for the window too, so
+    # a key bounce sends nothing; without them it is sent straight away.
+    self.command_scheduler = CommandScheduler(
+      self._transmit_command,
+      window=settings.get("command_window_ms", DEFAULT_WINDOW * 1000) / 1000,
+      rate=settings.get("command_rate", DEFAULT_RATE),
+      burst=settings.get("command_burst", DEFAULT_BURST),
+      hold_toggles=bool(settings.get("optimistic_icons")),
+    )
+
+    # With "command_acks", every command carries an id that the extension
+    # answers. Idempotent commands that did nothing are sent once more, and
+    # other failures are shown on the key. This needs an extension that
+    # knows about acknowledgements.
+    self.command_tracker: CommandTracker | None = None
+    if settings.get("command_acks"):
+      self.command_tracker = CommandTracker(
+        self._transmit_command,
+        self._show_command_failure,
+        timeout=settings.get(
+          "command_ack_timeout_ms", DEFAULT_ACK_TIMEOUT * 1000
+        )
+        / 1000,
+      )
+
+    # With "optimistic_icons", toggles show their new state as soon as they
+    # are pressed, and roll back if no status update confirms it within
+    # "optimistic_timeout_ms".
+    self.optimistic_timeout: float | None = None
+    if settings.get("optimistic_icons"):
+      self.optimistic_timeout = (
+        settings.get("optimistic_timeout_ms", DEFAULT_OPTIMISTIC_TIMEOUT * 1000)
+        / 1000
+      )
+
+    # With "latency_tracing" enabled, commands carry a trace that every hop
+    # stamps; see latency_report().
+    self.tracer: LatencyTracer | None = None
+    if settings.get("latency_tracing"):
+      self.tracer = LatencyTracer()
+
+    # Connected proxies; commands go to the one that is in a call. The
+    # "session_routing" setting picks between several ("most_recent" or
+    # "earliest").
+    self.sessions = SessionRegistry(
+      policy=settings.get("session_routing", "most_recent")
+    )
+
     # Define the socket path according to XDG specs for Flatpak compatibility
     xdg_runtime_dir = os.getenv("XDG_RUNTIME_DIR", "/tmp")
     socket_dir = os.path.join(
@@ -53,13 +174,30 @@ class GoogleMeetPlugin(PluginBase):
     socket_path = os.path.join(socket_dir, "meet_plugin.sock")
 
     # Setup and start the socket server in a background thread
-    # The proxy process launched by Chrome will connect to this.
-    self.ipc_server = SocketIPCServer(socket_path, self.handle_status_update)
+    # The proxy process launched by Chrome will connect to this. The
+    # "ipc_backend" setting selects the event-loop server, which serves any
+    # number of proxies and keeps accepting after they disconnect.
+    if use_asyncio:
+      from GoogleMeetPlugin.async_socket_ipc import AsyncSocketIPCServer
+
+      server_class = AsyncSocketIPCServer
+    else:
+      server_class = SocketIPCServer
+
+    # The "capture_file" setting records all socket traffic for replaying
+    # with benchmarks/replay_capture.py.
+    self.recorder: FrameRecorder | None = None
+    if settings.get("capture_file"):
+      self.recorder = FrameRecorder(settings["capture_file"])
+    self.ipc_server = server_class(
+      socket_path,
+      self.queue_status_update,
+      connection_callback=self.queue_session_change,
+      recorder=self.recorder,
+    )
     self.ipc_thread = threading.Thread(
       target=self.ipc_server.listen, daemon=True
     )
-    self.ipc_thread.start()
-    logger.info(f"Google Meet plugin initialized, listening on {socket_path}.")
 
     # Register all available actions
     self._register_actions()
@@ -72,47 +210,65 @@ class GoogleMeetPlugin(PluginBase):
       app_version="1.1.1-alpha",
     )
 
+    # Only start serving once registration is complete.
+    self.ipc_thread.start()
+    logger.info(f"Google Meet plugin initialized, listening on {socket_path}.")
+
   def _register_actions(self) -> None:
-    """Creates and registers all ActionHolders for the plugin."""
-    action_definitions = {
-      "toggle_mute": {"class": ToggleMuteAction, "name": "Toggle Mute"},
-      "toggle_camera": {"class": ToggleCameraAction, "name": "Toggle Camera"},
-      "raise_hand": {"class": RaiseHandAction, "name": "Raise Hand"},
-      "hang_up": {"class": HangUpAction, "name": "Hang Up"},
-      "toggle_present": {
-        "class": TogglePresentAction,
-        "name": "Toggle Present",
-      },
-      "send_reaction_thumb_up": {"class": SendThumbUpAction, "name": "Send 👍"},
-      "send_reaction_heart": {"class": SendHeartAction, "name": "Send ❤️"},
-      "toggle_chat_panel": {
-        "class": ToggleChatPanelAction,
-        "name": "Toggle Chat",
-      },
-      "toggle_participants_panel": {
-        "class": ToggleParticipantsPanelAction,
-        "name": "Toggle Participants",
-      },
-    }
-
-    for action_key, details in action_definitions.items():
+    """Creates and registers all ActionHolders for the plugin.
+
+    The action classes are not imported here; each one is loaded when the
+    first instance of it is created on a deck.
+    """
+    for spec in ACTIONS:
       action_holder = ActionHolder(
         plugin_base=self,
-        action_base=details["class"],
-        action_id=f"com.github.dcode.streamdeck-meet.{action_key}",
-        action_name=details["name"],
+        action_base=LazyActionClass(spec.class_name),
+        action_id=f"com.github.dcode.streamdeck-meet.{spec.key}",
+        action_name=spec.name,
       )
       self.add_action_holder(action_holder)
 
-  def send_command(self, action: str) -> None:
+  def send_command(self, action: str, count: int = 1) -> None:
     """
-    Sends a command to the Chrome extension.
+    Sends a command to the Chrome extension, through the command scheduler.
+
+    This never blocks: the command is either sent straight away or left to
+    the scheduler (see `CommandScheduler`).
 
     Args:
         action: The action name to be sent (e.g., 'toggle_mute').
+        count: How many times to send a reaction.
     """
-    command = ActionCommand(action=action)
-    self.ipc_server.send_message(command.model_dump())
+    self.command_scheduler.submit(action, count)
+
+  def _transmit_command(
+    self, action: str, command_id: int | None = None, count: int = 1
+  ) -> None:
+    """Sends a command the scheduler let through to the routed proxy.
+
+    Args:
+        action: The action name to be sent.
+        command_id: The id of a command that is being sent again.
+        count: How many times to send a reaction.
+    """
+    command: dict[str, Any] = {"action": action}
+    if count > 1:
+      command["count"] = count
+    if self.tracer:
+      command["trace"] = self.tracer.start(action)
+    if self.command_tracker:
+      command["id"] = (
+        self.command_tracker.issue(action) if command_id is None else command_id
+      )
+    command = validate_command(command)
+    self.message_history.append("command", command)
+    self.ipc_server.send_message(command, session_id=self.sessions.target_id())
+
+  def _show_command_failure(self, action: str, result: str) -> None:
+    """Flashes the error state on the keys of a command that did nothing."""
+    for action_instance in self.action_registry.instances(action):
+      action_instance.show_error(duration=COMMAND_FAILURE_DURATION)
 
   def handle_hang_up(self) -> None:
     """
@@ -120,69 +276,192 @@ class GoogleMeetPlugin(PluginBase):
     toggleable actions on the Stream Deck to their default 'off' state.
     """
     logger.info("Call ended. Resetting action states.")
-    if not self.main_view:
-      return
+    if self.tracer:
+      self.latency_report()
+    self.meet_state.update("call", "off")
+    for control in STATUS_ACTION_MAP:
+      self._render_control(control, "off")
+
+  def queue_status_update(
+    self, message: dict[str, Any], session_id: int | None = None
+  ) -> None:
+    """IPC callback: hands a status update to the render thread.
+
+    Only plain updates are subject to the overflow policy. Acks and snapshots
+    are never dropped: a lost ack leaves its command waiting for the timeout,
+    and a snapshot stands for every state of its session.
+    """
+    droppable = not (
+      isinstance(message, dict) and message.get("status") in ("ack", "snapshot")
+    )
+    self.render_stage.put(
+      self.handle_status_update, message, session_id, droppable=droppable
+    )
+
+  def queue_session_change(self, session_id: int, connected: bool) -> None:
+    """IPC callback: hands a connection change to the render thread.
+
+    These are never dropped, and stay in order with the session's messages.
+    """
+    self.render_stage.put(
+      self.handle_session_change, session_id, connected, droppable=False
+    )
+
+  def handle_session_change(self, session_id: int, connected: bool) -> None:
+    """
+    Callback for proxies connecting to or disconnecting from the IPC server.
+
+    Args:
+        session_id: The id of the connection.
+        connected: Whether the session connected (True) or went away (False).
+    """
+    previous_target = self.sessions.target_id()
+    if connected:
+      self.sessions.connect(session_id)
+      # Ask for the current state straight away rather than waiting for the
+      # user to touch a control.
+      self.ipc_server.send_message(
+        validate_command({"action": "request_snapshot"}), session_id=session_id
+      )
+    else:
+      self.sessions.disconnect(session_id)
+
+    target = self.sessions.target_id()
+    if target != previous_target and target is not None:
+      self._show_session(target)
 
-    # List of action keys that are stateful and should be reset.
-    resettable_action_keys = [
-      "toggle_mute",
-      "toggle_camera",
-      "raise_hand",
-      "toggle_present",
-      "toggle_chat_panel",
-      "toggle_participants_panel",
-    ]
-
-    for deck in self.main_view.deck_controller.decks.values():
-      for action_instance in deck.actions.values():
-        for key in resettable_action_keys:
-          if action_instance.action_id.endswith(key):
-            # Reset to default 'off' state
-            action_instance.update_state(False)
-            break  # Move to the next action instance
-
-  def handle_status_update(self, message: dict[str, Any]) -> None:
+  def handle_status_update(
+    self, message: dict[str, Any], session_id: int | None = None
+  ) -> None:
     """
     Callback function to handle status updates from the extension.
 
-    This function is called by the NativeMessagingHandler from its thread.
-    It finds the relevant action instances on all connected decks and
-    updates their state.
+    This function is called on the render thread (see `RenderStage`). The
+    state is recorded for the session it came from, and only reaches the
+    icons if that is the session commands are routed to.
 
     Args:
         message: The status message received from the extension.
+        session_id: The IPC session the message arrived on.
     """
     try:
-      status = StatusUpdate.model_validate(message)
-    except ValidationError as e:
-      logger.warning(f"Received invalid status message: {e}")
+      status = validate_status(message)
+    except MessageValidationError as e:
+      self.message_history.append("invalid", message)
+      self.message_history.dump(logger, f"Received invalid status message: {e}")
       return
 
-    logger.info(f"Received status update: {status}")
-    control = status.control
-    state = status.state
+    self.message_history.append("status", status)
+    self._log_status("Received status update: %s", status)
+    if status["status"] == "snapshot":
+      self._handle_snapshot(status["states"], session_id)
+      return
+    if status["status"] == "ack":
+      if self.command_tracker:
+        self.command_tracker.acknowledge(status["id"], status["result"])
+      return
+    control, state = status["control"], status["state"]
+    if self.tracer and "trace" in status:
+      self.tracer.status_received(control, status["trace"])
+    if session_id is None:
+      self.status_dispatcher.submit(control, state)
+      return
+
+    previous_target = self.sessions.target_id()
+    self.sessions.update(session_id, control, state)
+    target = self.sessions.target_id()
+
+    if target != previous_target:
+      if session_id == previous_target:
+        # e.g. the routed session's call ending resets the icons.
+        self.status_dispatcher.submit(control, state)
+      if target is not None:
+        self._show_session(target)
+    elif session_id == target:
+      self.status_dispatcher.submit(control, state)
+
+  def _handle_snapshot(
+    self, states: dict[str, str], session_id: int | None
+  ) -> None:
+    """Applies a state snapshot in one dispatch pass, if its session is routed."""
+    if session_id is None:
+      self.status_dispatcher.submit_many(states)
+      return
+
+    previous_target = self.sessions.target_id()
+    self.sessions.replace_states(session_id, states)
+    target = self.sessions.target_id()
+
+    if target != previous_target:
+      if session_id == previous_target:
+        self.status_dispatcher.submit_many(states)
+      if target is not None:
+        self._show_session(target)
+    elif session_id == target:
+      self.status_dispatcher.submit_many(states)
+
+  def _show_session(self, session_id: int) -> None:
+    """Renders the last known states of a session that just became routed.
+
+    Controls the session has not reported go back to unknown rather than
+    keep showing the previous session's state, until its snapshot arrives.
+    """
+    logger.info(f"Routing commands to session {session_id}.")
+    states: dict[str, str | None] = dict.fromkeys(STATUS_ACTION_MAP)
+    states.update(self.sessions.states(session_id))
+    self.status_dispatcher.submit_many(states)
 
+  def _apply_status(self, control: str, state: str | None) -> None:
+    """
+    Applies a (coalesced) control state to the matching action instances.
+
+    Args:
+        control: The control that changed.
+        state: The newest known state of the control, or None if it is no
+            longer known.
+    """
     if control == "call" and state == "off":
       self.handle_hang_up()
-      return
+    else:
+      self._render_control(control, state)
 
-    action_map = {
-      "microphone": "toggle_mute",
-      "camera": "toggle_camera",
-      "hand": "raise_hand",
-      "presenting": "toggle_present",
-      "chat_panel": "toggle_chat_panel",
-      "participants_panel": "toggle_participants_panel",
-      # 'reactions' has a status but no corresponding resettable action state
-      # in the same way. It's a toggle for a panel.
-    }
-
-    action_key = action_map.get(control)
-    if not action_key or not self.main_view:
+    if self.tracer and state is not None:
+      self.tracer.icon_updated(control)
+
+  def _render_control(self, control: str, state: str | None) -> None:
+    """Records a control's state and shows it on the keys that lag behind."""
+    if state is None:
+      if not self.meet_state.forget(control):
+        return  # Already unknown
+    else:
+      self.meet_state.update(control, state)
+    action_key = STATUS_ACTION_MAP.get(control)
+    if action_key is None:
       return
+    for action_instance in self.action_registry.instances(action_key):
+      if not self.meet_state.claim(action_instance, control):
+        continue
+      if state is None:
+        action_instance.clear_state()
+      else:
+        action_instance.update_state(state == "on")
+
+  def latency_report(self) -> dict[str, dict[str, dict[str, float]]]:
+    """
+    Logs and returns the latency figures collected with "latency_tracing".
 
-    # Find all instances of this action across all decks and update their state
-    for deck in self.main_view.deck_controller.decks.values():
-      for action_instance in deck.actions.values():
-        if action_instance.action_id.endswith(action_key):
-          action_instance.update_state(status.state == "on")
+    Returns:
+        Per action and segment, the sample count and p50/p95/p99 in ms.
+        Empty if tracing is disabled.
+    """
+    if not self.tracer:
+      return {}
+    report = self.tracer.report()
+    for action, segments in report.items():
+      for segment, figures in segments.items():
+        logger.info(
+          f"Latency {action} {segment}: n={figures['count']}"
+          f" p50={figures['p50']:.1f} ms p95={figures['p95']:.1f} ms"
+          f" p99={figures['p99']:.1f} ms"
+        )
+    return report
@@ -21,6 +21,12 @@ class MockPluginBase:
   def add_action_holder(self, holder):
     pass
 
+  def get_settings(self):
+    return {}
+
+  def set_settings(self, settings):
+    pass
+
   def register(self, *args, **kwargs):
     pass
 
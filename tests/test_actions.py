@@ -1,5 +1,6 @@
 """Unit tests for the action classes."""
 
+import threading
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -17,6 +18,8 @@ from GoogleMeetPlugin.actions.ToggleParticipantsPanelAction import (
     ToggleParticipantsPanelAction,
 )
 from GoogleMeetPlugin.actions.TogglePresentAction import TogglePresentAction
+from GoogleMeetPlugin.icon_cache import IconCache
+from GoogleMeetPlugin.state import MeetState
 
 
 @pytest.fixture
@@ -57,3 +60,202 @@ def test_reaction_action_base_update_state(mock_plugin_base):
     action.set_media = MagicMock()
     action.update_state(True)
     action.set_media.assert_not_called()
+
+
+@pytest.fixture
+def optimistic_mute(mock_plugin_base):
+    """A Toggle Mute key showing "unmuted", with optimistic icons enabled."""
+    mock_plugin_base.optimistic_timeout = 60
+    action = ToggleMuteAction()
+    action.plugin_base = mock_plugin_base
+    action.set_icon = MagicMock()
+    action.update_state(True)
+    action.set_icon.reset_mock()
+    yield action
+    if action._rollback_timer:
+        action._rollback_timer.cancel()
+
+
+def test_optimistic_toggle_is_confirmed(optimistic_mute):
+    """Test that a press flips the icon at once and the status confirms it."""
+    optimistic_mute.on_key_down()
+    optimistic_mute.plugin_base.send_command.assert_called_once_with(
+        action="toggle_mute"
+    )
+    optimistic_mute.set_icon.assert_called_once_with("mic_off.png")
+    assert optimistic_mute.pending_on is False
+
+    optimistic_mute.update_state(False)
+    optimistic_mute.set_icon.assert_called_once()  # Already shown
+    assert optimistic_mute.pending_on is None
+    assert optimistic_mute._rollback_timer is None
+
+
+def test_optimistic_toggle_waits_for_its_own_confirmation(optimistic_mute):
+    """Test that the echo of an earlier press does not undo a prediction."""
+    optimistic_mute.on_key_down()  # Predicts muted
+    optimistic_mute.on_key_down()  # Predicts unmuted again
+    optimistic_mute.set_icon.reset_mock()
+
+    optimistic_mute.update_state(False)  # The first press arriving
+    optimistic_mute.set_icon.assert_not_called()
+    assert optimistic_mute.is_on is True
+
+    optimistic_mute.update_state(True)
+    assert optimistic_mute.pending_on is None
+    assert optimistic_mute.confirmed_on is True
+
+
+def test_optimistic_toggle_rolls_back_without_confirmation(mock_plugin_base):
+    """Test that an unconfirmed prediction goes back to the confirmed state."""
+    mock_plugin_base.optimistic_timeout = 0.01
+    action = ToggleMuteAction()
+    action.plugin_base = mock_plugin_base
+    rolled_back = threading.Event()
+    action.set_icon = MagicMock(
+        side_effect=lambda icon: icon == "mic_off.png" and rolled_back.set()
+    )
+    action.update_state(False)
+    rolled_back.clear()
+
+    action.on_key_down()
+    assert action.set_icon.call_args_list[1].args == ("mic_on.png",)
+
+    assert rolled_back.wait(timeout=2)
+    assert action.set_icon.call_args_list[-1].args == ("mic_off.png",)
+    assert action.is_on is False
+    assert action.pending_on is None
+
+
+def test_optimistic_rollback_without_confirmed_state(optimistic_mute):
+    """Test that a prediction with nothing confirmed rolls back to unknown."""
+    optimistic_mute.on_key_down()
+    optimistic_mute.confirmed_on = None
+
+    optimistic_mute._rollback_timer.cancel()
+    optimistic_mute._roll_back()
+
+    optimistic_mute.set_icon.assert_called_with("mic_unknown.png")
+    assert optimistic_mute.is_on is None
+
+
+def test_reaction_is_repeated_as_one_command(mock_plugin_base):
+    """Test that the "repeat" setting sends a reaction several times per press."""
+    action = SendHeartAction()
+    action.plugin_base = mock_plugin_base
+    action.get_settings = MagicMock(return_value={})
+    action.on_key_down()
+    mock_plugin_base.send_command.assert_called_once_with(
+        action="send_reaction_heart", count=1
+    )
+
+    for repeat, expected in ((3, 3), (50, 10), ("many", 1)):
+        action.get_settings.return_value = {"repeat": repeat}
+        action.on_key_down()
+        mock_plugin_base.send_command.assert_called_with(
+            action="send_reaction_heart", count=expected
+        )
+
+
+def test_optimistic_icons_are_off_by_default(mock_plugin_base):
+    """Test that without optimistic icons a press leaves the icon alone."""
+    mock_plugin_base.optimistic_timeout = None
+    action = ToggleMuteAction()
+    action.plugin_base = mock_plugin_base
+    action.set_icon = MagicMock()
+    action.update_state(True)
+    action.on_key_down()
+    action.set_icon.assert_called_once_with("mic_on.png")
+
+
+def test_meet_action_base_registers_on_ready(mock_plugin_base):
+    """Test that actions add themselves to the registry and leave on removal."""
+    mock_plugin_base.meet_state.read.return_value = None
+    action = ToggleMuteAction()
+    action.plugin_base = mock_plugin_base
+    action.set_media = MagicMock()
+    action.on_ready()
+    mock_plugin_base.action_registry.register.assert_called_once_with(action)
+    action.on_removed_from_cache()
+    mock_plugin_base.action_registry.unregister.assert_called_once_with(action)
+
+
+def test_on_ready_shows_the_known_state(mock_plugin_base):
+    """Test that a key shown mid-call starts with its control's known state."""
+    mock_plugin_base.meet_state = MeetState()
+    action = ToggleMuteAction()
+    action.plugin_base = mock_plugin_base
+    action.set_icon = MagicMock()
+    action.on_ready()
+    action.set_icon.assert_called_once_with("mic_unknown.png")
+
+    mock_plugin_base.meet_state.update("microphone", "on")
+    action.set_icon.reset_mock()
+    action.on_ready()  # e.g. the page is shown again
+    action.set_icon.assert_called_once_with("mic_on.png")
+    assert action.is_on
+    # The key has seen this state, so dispatching it again is skipped
+    assert not mock_plugin_base.meet_state.claim(action, "microphone")
+
+    # Once the state is no longer known, the key shows the unknown icon again
+    mock_plugin_base.meet_state.forget("microphone")
+    assert mock_plugin_base.meet_state.claim(action, "microphone")
+    action.set_icon.reset_mock()
+    action.clear_state()
+    action.set_icon.assert_called_once_with("mic_unknown.png")
+    assert action.is_on is None
+    action.on_ready()
+    action.set_icon.assert_called_with("mic_unknown.png")
+
+
+class FakeImage:
+    """Stands in for a decoded PIL image."""
+
+    def __init__(self, size=None):
+        self.size = size or (72, 72)
+
+    def getbands(self):
+        return ("R", "G", "B", "A")
+
+
+def test_icon_cache_shares_and_evicts():
+    """Test that icons are decoded once and evicted least recently used first."""
+    loader = MagicMock(side_effect=lambda path, size: FakeImage(size))
+    # Room for two 72x72 RGBA icons
+    cache = IconCache(max_bytes=2 * 72 * 72 * 4, loader=loader)
+
+    mic_on = cache.get("mic_on.png", (72, 72))
+    assert cache.get("mic_on.png", (72, 72)) is mic_on
+    assert loader.call_count == 1
+
+    cache.get("mic_off.png", (72, 72))
+    cache.get("mic_on.png", (72, 72))  # mic_off is now least recently used
+    cache.get("camera_on.png", (72, 72))
+
+    assert len(cache) == 2
+    assert cache.get("mic_on.png", (72, 72)) is mic_on
+    cache.get("mic_off.png", (72, 72))
+    assert loader.call_count == 4
+
+
+def test_meet_action_base_uses_icon_cache(mock_plugin_base):
+    """Test that state flips on several keys reuse one decoded image per icon."""
+    loader = MagicMock(side_effect=lambda path, size: FakeImage(size))
+    with patch(
+        "GoogleMeetPlugin.actions.MeetActionBase.icon_cache",
+        IconCache(loader=loader),
+    ):
+        actions = []
+        for _ in range(3):
+            action = ToggleMuteAction()
+            action.plugin_base = mock_plugin_base
+            action.set_media = MagicMock()
+            actions.append(action)
+
+        for is_on in (True, False, True):
+            for action in actions:
+                action.update_state(is_on)
+
+    assert loader.call_count == 2
+    images = {id(action.set_media.call_args.kwargs["image"]) for action in actions}
+    assert len(images) == 1
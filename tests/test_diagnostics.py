@@ -0,0 +1,71 @@
+"""Unit tests for the hot-path logging helpers."""
+
+import logging
+
+from GoogleMeetPlugin.diagnostics import (
+  MessageHistory,
+  SampledDebugLog,
+  setup_queue_logging,
+)
+
+
+def test_sampled_debug_log_only_logs_every_nth(caplog):
+  """Test that sampling is free when debug is off and thins records when on."""
+  logger = logging.getLogger("test.sampled")
+  log = SampledDebugLog(logger, every=10)
+
+  caplog.set_level(logging.INFO, logger="test.sampled")
+  for i in range(25):
+    log("message %d", i)
+  assert log.count == 0
+  assert not caplog.records
+
+  caplog.set_level(logging.DEBUG, logger="test.sampled")
+  for i in range(25):
+    log("message %d", i)
+  assert [record.getMessage() for record in caplog.records] == [
+    "message 0 (#1)",
+    "message 10 (#11)",
+    "message 20 (#21)",
+  ]
+
+
+def test_message_history_keeps_the_last_messages(caplog):
+  """Test that the ring buffer is bounded and dumped as one record."""
+  history = MessageHistory(size=3)
+  history.dump(logging.getLogger("test.history"), "Nothing to dump")
+  assert not caplog.records
+
+  for i in range(5):
+    history.append("status", {"n": i})
+  assert len(history) == 3
+
+  history.dump(logging.getLogger("test.history"), "Bad frame")
+  (record,) = caplog.records
+  assert record.levelno == logging.ERROR
+  text = record.getMessage()
+  assert text.startswith("Bad frame; last 3 messages:")
+  assert "{'n': 1}" not in text
+  assert text.index("{'n': 2}") < text.index("{'n': 4}")
+
+
+def test_queue_logging_writes_and_rotates_in_the_background(tmp_path):
+  """Test that records reach a size-rotated file via the writer thread."""
+  path = tmp_path / "proxy.log"
+  root_logger = logging.getLogger()
+  handlers, level = list(root_logger.handlers), root_logger.level
+  writer = setup_queue_logging(str(path), max_bytes=2000, backup_count=1)
+  try:
+    logger = logging.getLogger("test.queue")
+    for i in range(100):
+      logger.info("record %03d", i)
+  finally:
+    writer.stop()
+    root_logger.handlers[:] = handlers
+    root_logger.setLevel(level)
+
+  assert path.exists()
+  assert (tmp_path / "proxy.log.1").exists()
+  assert not (tmp_path / "proxy.log.2").exists()
+  assert "record 099" in path.read_text()
+  assert path.stat().st_size <= 2000
@@ -4,19 +4,44 @@ import json
 import os
 import socket
 import struct
+import subprocess
+import sys
+import tempfile
 import threading
 import time
 from unittest.mock import MagicMock
 
 import pytest
 
+from GoogleMeetPlugin.async_socket_ipc import AsyncSocketIPCServer
+from GoogleMeetPlugin.capture import (
+    TO_PLUGIN,
+    TO_PROXY,
+    FrameRecorder,
+    read_capture,
+    replay,
+)
+from GoogleMeetPlugin.framing import (
+    FrameDecoder,
+    FrameTooLargeError,
+    FrameWriter,
+    encode_frame,
+)
 from GoogleMeetPlugin.socket_ipc import SocketIPCServer
+from GoogleMeetPlugin.wire import (
+    BINARY_V1,
+    WireCodec,
+    WireError,
+    decode,
+    hello_offer,
+)
 
 
 def test_socket_ipc_communication():
     """Test that the SocketIPCServer can send and receive messages."""
     socket_path = "/tmp/test_socket.sock"
-    message_callback = MagicMock()
+    received = threading.Event()
+    message_callback = MagicMock(side_effect=lambda *args: received.set())
 
     # Start the server in a separate thread
     server = SocketIPCServer(socket_path, message_callback)
@@ -24,12 +49,9 @@ def test_socket_ipc_communication():
     server_thread.daemon = True
     server_thread.start()
 
-    # Wait for the server to start listening
-    time.sleep(0.1)
-
-    # Create a client and connect to the server
-    client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-    client_socket.connect(socket_path)
+    # Create a client and connect to the server once it is listening
+    client_socket = _connect_with_retry(socket_path)
+    client_socket.settimeout(2)
 
     # Send a message from the client to the server
     message_to_server = {"status": "update", "control": "camera", "state": "on"}
@@ -38,30 +60,505 @@ def test_socket_ipc_communication():
     client_socket.sendall(length_prefix)
     client_socket.sendall(encoded_message)
 
-    # Wait for the server to process the message
-    time.sleep(0.1)
-
     # Check that the server's callback was called with the correct message
-    message_callback.assert_called_once_with(message_to_server)
+    assert received.wait(timeout=2)
+    message_callback.assert_called_once_with(message_to_server, 1)
 
     # Send a message from the server to the client
     message_to_client = {"action": "toggle_mute"}
     server.send_message(message_to_client)
 
-    # Wait for the client to receive the message
-    time.sleep(0.1)
-
     # Read the message from the client socket
-    raw_length = client_socket.recv(4)
-    message_length = struct.unpack("@I", raw_length)[0]
-    message_content = client_socket.recv(message_length).decode("utf-8")
-    received_message = json.loads(message_content)
+    (frame,) = FrameDecoder().read_from(client_socket)
+    received_message = json.loads(frame)
 
     # Check that the client received the correct message
     assert received_message == message_to_client
 
     # Clean up
+    client_socket.close()
+    server.close()
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+
+def test_frame_decoder_handles_split_and_batched_frames():
+    """Test that frames split across reads or sharing one read are recovered."""
+    messages = [
+        {"status": "update", "control": "camera", "state": "on"},
+        {"status": "update", "control": "microphone", "state": "off"},
+        {"status": "update", "control": "hand", "state": "on"},
+    ]
+    stream = b"".join(
+        encode_frame(json.dumps(message).encode("utf-8")) for message in messages
+    )
+
+    decoder = FrameDecoder(read_size=16)
+    decoded = []
+    for offset in range(0, len(stream), 7):
+        decoded.extend(decoder.feed(stream[offset : offset + 7]))
+    assert [json.loads(frame) for frame in decoded] == messages
+    assert decoder.pending == 0
+
+    decoder = FrameDecoder()
+    assert [json.loads(frame) for frame in decoder.feed(stream)] == messages
+
+
+def test_frame_decoder_rejects_oversized_frames():
+    """Test that a frame larger than the limit is refused."""
+    decoder = FrameDecoder(max_frame_size=8)
+    with pytest.raises(FrameTooLargeError):
+        decoder.feed(struct.pack("@I", 9) + b"x" * 9)
+
+
+def test_socket_ipc_reads_many_frames_per_recv():
+    """Test that the server handles a burst of frames sent in one write."""
+    socket_path = "/tmp/test_socket_burst.sock"
+    received = []
+    done = threading.Event()
+
+    def message_callback(message, session_id):
+        received.append(message)
+        if len(received) == 100:
+            done.set()
+
+    server = SocketIPCServer(socket_path, message_callback)
+    server_thread = threading.Thread(target=server.listen, daemon=True)
+    server_thread.start()
+
+    client_socket = _connect_with_retry(socket_path)
+    messages = [
+        {"status": "update", "control": "camera", "state": "on" if i % 2 else "off"}
+        for i in range(100)
+    ]
+    client_socket.sendall(
+        b"".join(encode_frame(json.dumps(m).encode("utf-8")) for m in messages)
+    )
+
+    assert done.wait(timeout=2)
+    assert received == messages
+
     client_socket.close()
     server.server_socket.close()
     if os.path.exists(socket_path):
         os.unlink(socket_path)
+
+
+def test_frame_writer_batches_queued_frames():
+    """Test that queued frames are written in order with fewer syscalls."""
+    reader_sock, writer_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    writer = FrameWriter(writer_sock)
+    payloads = [json.dumps({"action": "toggle_mute", "n": i}).encode() for i in range(50)]
+    # Queue everything before the thread starts so it has to batch
+    for payload in payloads:
+        assert writer.send(payload)
+    writer.start()
+    writer.close(timeout=2)
+
+    decoder = FrameDecoder()
+    frames = []
+    while len(frames) < len(payloads):
+        frames.extend(decoder.read_from(reader_sock))
+    assert frames == payloads
+    assert writer.frames_sent == 50
+    assert writer.syscalls < 50
+
+    assert not writer.send(b"late")
+    reader_sock.close()
+    writer_sock.close()
+
+
+def _connect_with_retry(socket_path, timeout=2.0):
+    """Connects to the server socket once it is accepting connections."""
+    deadline = time.monotonic() + timeout
+    while True:
+        client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client_socket.connect(socket_path)
+            return client_socket
+        except (ConnectionRefusedError, FileNotFoundError):
+            client_socket.close()
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.01)
+
+
+def test_async_socket_ipc_serves_multiple_clients_and_reconnects():
+    """Test that the asyncio server accepts several clients and keeps accepting."""
+    socket_path = "/tmp/test_async_socket.sock"
+    received = []
+    received_event = threading.Event()
+
+    def message_callback(message, session_id):
+        received.append((session_id, message))
+        received_event.set()
+
+    server = AsyncSocketIPCServer(socket_path, message_callback)
+    server_thread = threading.Thread(target=server.listen, daemon=True)
+    server_thread.start()
+
+    def send_and_wait(client_socket, message):
+        received_event.clear()
+        client_socket.sendall(encode_frame(json.dumps(message).encode("utf-8")))
+        assert received_event.wait(timeout=2)
+
+    first = _connect_with_retry(socket_path)
+    second = _connect_with_retry(socket_path)
+    send_and_wait(first, {"status": "update", "control": "camera", "state": "on"})
+    send_and_wait(second, {"status": "update", "control": "hand", "state": "on"})
+
+    # Both clients receive outgoing messages
+    server.send_message({"action": "toggle_mute"})
+    for client_socket in (first, second):
+        client_socket.settimeout(2)
+        frames = FrameDecoder().read_from(client_socket)
+        assert [json.loads(frame) for frame in frames] == [{"action": "toggle_mute"}]
+
+    # A client that goes away can be replaced without restarting the server
+    first.close()
+    second.close()
+    third = _connect_with_retry(socket_path)
+    send_and_wait(third, {"status": "update", "control": "camera", "state": "off"})
+    assert [session_id for session_id, _ in received] == [1, 2, 3]
+
+    third.close()
+    server.close()
+    server_thread.join(timeout=2)
+    assert not server_thread.is_alive()
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+
+def test_wire_codec_round_trips_and_falls_back_to_json():
+    """Test the compact encoding and its JSON fallback."""
+    codec = WireCodec(BINARY_V1)
+    status = {"status": "update", "control": "participants_panel", "state": "off"}
+    command = {"action": "send_reaction_crab"}
+
+    assert len(codec.encode(status)) == 3
+    assert len(codec.encode(command)) == 2
+    assert decode(codec.encode(status)) == status
+    assert decode(codec.encode(command)) == command
+
+    # Anything that does not fit the compact layout stays JSON
+    extended = {"action": "toggle_mute", "extra": 1}
+    assert codec.encode(extended) == json.dumps(extended).encode("utf-8")
+    assert decode(codec.encode(extended)) == extended
+    assert WireCodec().encode(command) == b'{"action": "send_reaction_crab"}'
+
+    with pytest.raises(WireError):
+        decode(bytes((0x02, 250)))
+
+
+def test_socket_ipc_negotiates_binary_encoding():
+    """Test that the hello handshake switches the connection to binary frames."""
+    socket_path = "/tmp/test_socket_wire.sock"
+    received = []
+    received_event = threading.Event()
+
+    def message_callback(message, session_id):
+        received.append(message)
+        received_event.set()
+
+    server = SocketIPCServer(socket_path, message_callback)
+    server_thread = threading.Thread(target=server.listen, daemon=True)
+    server_thread.start()
+    client_socket = _connect_with_retry(socket_path)
+    client_socket.settimeout(2)
+    decoder = FrameDecoder()
+
+    client_socket.sendall(encode_frame(json.dumps(hello_offer()).encode("utf-8")))
+    (reply,) = decoder.read_from(client_socket)
+    assert json.loads(reply) == {"hello": {"encoding": BINARY_V1}}
+
+    status = {"status": "update", "control": "hand", "state": "on"}
+    client_socket.sendall(encode_frame(WireCodec(BINARY_V1).encode(status)))
+    assert received_event.wait(timeout=2)
+    assert received == [status]
+
+    server.send_message({"action": "raise_hand"})
+    (frame,) = decoder.read_from(client_socket)
+    assert len(frame) == 2
+    assert decode(frame) == {"action": "raise_hand"}
+
+    client_socket.close()
+    server.server_socket.close()
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+
+PROXY_SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "GoogleMeetPlugin",
+    "meet_proxy.py",
+)
+
+
+def test_proxy_recovers_quickly_from_plugin_restart():
+    """Test that the proxy waits for the plugin and reconnects after a restart."""
+    runtime_dir = tempfile.mkdtemp(dir="/tmp")
+    socket_path = os.path.join(
+        runtime_dir, "app/com.core477.StreamController/meet_plugin.sock"
+    )
+    received = []
+    received_event = threading.Event()
+
+    def message_callback(message, session_id):
+        received.append((session_id, message))
+        received_event.set()
+
+    def start_server():
+        server = SocketIPCServer(socket_path, message_callback)
+        threading.Thread(target=server.listen, daemon=True).start()
+        return server, time.monotonic()
+
+    def send_from_chrome(message):
+        payload = json.dumps(message).encode("utf-8")
+        proxy.stdin.write(struct.pack("@I", len(payload)) + payload)
+        proxy.stdin.flush()
+
+    # The proxy starts before the plugin, and Chrome talks to it straight away
+    proxy = subprocess.Popen(
+        [sys.executable, PROXY_SCRIPT],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        env={**os.environ, "XDG_RUNTIME_DIR": runtime_dir},
+    )
+    try:
+        first = {"status": "update", "control": "camera", "state": "on"}
+        send_from_chrome(first)
+        time.sleep(0.2)
+        assert proxy.poll() is None
+
+        server, started = start_server()
+        assert received_event.wait(timeout=5)
+        assert time.monotonic() - started < 1.0
+        assert received == [(1, first)]
+
+        # The plugin restarts; updates sent while it is down are held and
+        # delivered once the proxy has reconnected
+        received_event.clear()
+        server.close()
+        time.sleep(0.05)
+        second = {"status": "update", "control": "camera", "state": "off"}
+        send_from_chrome(second)
+        time.sleep(0.05)
+        server, started = start_server()
+        assert received_event.wait(timeout=5)
+        recovery = time.monotonic() - started
+        assert recovery < 1.0, f"Recovered after {recovery:.3f} s"
+        assert received[-1] == (1, second)
+        assert proxy.poll() is None
+    finally:
+        proxy.stdin.close()
+        proxy.wait(timeout=5)
+        server.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def test_proxy_keeps_the_latest_state_of_each_control_while_disconnected():
+    """Test that a burst held for the plugin keeps every control's state."""
+    runtime_dir = tempfile.mkdtemp(dir="/tmp")
+    socket_path = os.path.join(
+        runtime_dir, "app/com.core477.StreamController/meet_plugin.sock"
+    )
+    received = []
+    done = threading.Event()
+
+    def message_callback(message, session_id):
+        received.append(message)
+        if message.get("control") == "camera":
+            done.set()
+
+    proxy = subprocess.Popen(
+        [sys.executable, PROXY_SCRIPT],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        env={**os.environ, "XDG_RUNTIME_DIR": runtime_dir},
+    )
+    server = None
+    try:
+        # More updates than the proxy used to hold, before the plugin is up
+        updates = [{"status": "update", "control": "microphone", "state": "on"}]
+        updates += [
+            {"status": "update", "control": "camera", "state": ("on", "off")[i % 2]}
+            for i in range(41)
+        ]
+        for message in updates:
+            payload = json.dumps(message).encode("utf-8")
+            proxy.stdin.write(struct.pack("@I", len(payload)) + payload)
+        proxy.stdin.flush()
+        time.sleep(0.2)
+
+        server = SocketIPCServer(socket_path, message_callback)
+        threading.Thread(target=server.listen, daemon=True).start()
+        assert done.wait(timeout=5)
+        time.sleep(0.1)
+        assert received == [updates[0], updates[-1]]
+    finally:
+        proxy.stdin.close()
+        proxy.wait(timeout=5)
+        if server:
+            server.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def test_proxy_reconnects_after_an_undecodable_frame():
+    """Test that a corrupt frame from the plugin makes the proxy reconnect."""
+    runtime_dir = tempfile.mkdtemp(dir="/tmp")
+    socket_path = os.path.join(
+        runtime_dir, "app/com.core477.StreamController/meet_plugin.sock"
+    )
+    sessions = []
+    connected = threading.Event()
+
+    def connection_callback(session_id, up):
+        if up:
+            sessions.append(session_id)
+            connected.set()
+
+    server = SocketIPCServer(
+        socket_path, MagicMock(), connection_callback=connection_callback
+    )
+    threading.Thread(target=server.listen, daemon=True).start()
+    proxy = subprocess.Popen(
+        [sys.executable, PROXY_SCRIPT],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        env={**os.environ, "XDG_RUNTIME_DIR": runtime_dir},
+    )
+    try:
+        assert connected.wait(timeout=5)
+        connected.clear()
+        for frame in (b"{not json", bytes((0x02, 250)), b"\xff\xfe"):
+            server.writer.send(frame)
+            assert connected.wait(timeout=5)
+            connected.clear()
+        assert sessions == [1, 2, 3, 4]
+        assert proxy.poll() is None
+    finally:
+        proxy.stdin.close()
+        proxy.wait(timeout=5)
+        server.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def test_proxy_drops_repeated_states():
+    """Test that the proxy forwards each control's state only when it changes."""
+    runtime_dir = tempfile.mkdtemp(dir="/tmp")
+    socket_path = os.path.join(
+        runtime_dir, "app/com.core477.StreamController/meet_plugin.sock"
+    )
+    received = []
+    forwarding = threading.Event()
+    done = threading.Event()
+
+    def message_callback(message, session_id):
+        received.append(message)
+        forwarding.set()
+        if message.get("control") == "hand":
+            done.set()
+
+    server = SocketIPCServer(socket_path, message_callback)
+    threading.Thread(target=server.listen, daemon=True).start()
+    proxy = subprocess.Popen(
+        [sys.executable, PROXY_SCRIPT],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        env={**os.environ, "XDG_RUNTIME_DIR": runtime_dir},
+    )
+
+    def status(control, state):
+        return {"status": "update", "control": control, "state": state}
+
+    def send_from_chrome(messages):
+        for message in messages:
+            payload = json.dumps(message).encode("utf-8")
+            proxy.stdin.write(struct.pack("@I", len(payload)) + payload)
+        proxy.stdin.flush()
+
+    sent = [
+        status("camera", "on"),
+        status("camera", "on"),
+        status("presenting", "off"),
+        status("presenting", "off"),
+        # The call ending resets what was forwarded
+        status("call", "off"),
+        status("presenting", "off"),
+        # Marks the end of the stream
+        status("hand", "on"),
+    ]
+    try:
+        # Updates held while disconnected are merged differently, so wait
+        # until the proxy is forwarding
+        first = status("microphone", "on")
+        send_from_chrome([first])
+        assert forwarding.wait(timeout=5)
+        send_from_chrome(sent)
+        assert done.wait(timeout=5)
+        assert received == [first, sent[0], sent[2], sent[4], sent[5], sent[6]]
+    finally:
+        proxy.stdin.close()
+        proxy.wait(timeout=5)
+        server.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def test_socket_ipc_records_and_replays_traffic(tmp_path):
+    """Test that recorded frames replay in order, with scaled timing."""
+    socket_path = "/tmp/test_socket_capture.sock"
+    capture_path = str(tmp_path / "meet.cap")
+    received = []
+    received_event = threading.Event()
+
+    def message_callback(message, session_id):
+        received.append(message)
+        received_event.set()
+
+    recorder = FrameRecorder(capture_path)
+    server = SocketIPCServer(socket_path, message_callback, recorder=recorder)
+    threading.Thread(target=server.listen, daemon=True).start()
+    client_socket = _connect_with_retry(socket_path)
+    client_socket.settimeout(2)
+
+    # A handshake, two status updates 50 ms apart and a command back
+    client_socket.sendall(encode_frame(json.dumps(hello_offer()).encode("utf-8")))
+    FrameDecoder().read_from(client_socket)
+    binary = WireCodec(BINARY_V1)
+    statuses = [
+        {"status": "update", "control": "camera", "state": "on"},
+        {"status": "update", "control": "camera", "state": "off"},
+    ]
+    for status in statuses:
+        received_event.clear()
+        client_socket.sendall(encode_frame(binary.encode(status)))
+        assert received_event.wait(timeout=2)
+        time.sleep(0.05)
+    server.send_message({"action": "toggle_camera"})
+    FrameDecoder().read_from(client_socket)
+    client_socket.close()
+    server.close()
+    recorder.close()
+
+    frames = list(read_capture(capture_path))
+    assert [f.direction for f in frames] == [
+        TO_PLUGIN, TO_PROXY, TO_PLUGIN, TO_PLUGIN, TO_PROXY
+    ]
+    assert [decode(f.frame) for f in frames[2:]] == [
+        *statuses, {"action": "toggle_camera"}
+    ]
+
+    # Replaying the status updates keeps their spacing, scaled by the speed
+    to_plugin = [f for f in frames[2:] if f.direction == TO_PLUGIN]
+    replayed = []
+    stats = replay(to_plugin, replayed.append, speed=1)
+    assert replayed == [f.frame for f in to_plugin]
+    assert stats.elapsed >= 0.045
+    assert replay(to_plugin, replayed.append, speed=10).elapsed < 0.045
+    assert replay(to_plugin, replayed.append, speed=0).frames == 2
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
@@ -2,28 +2,59 @@
 Unit tests for the main GoogleMeetPlugin class.
 """
 
-from unittest.mock import MagicMock, patch
+import gc
+import logging
+import threading
+import time
+from unittest.mock import MagicMock, call, patch
 
 import pytest
 
 # Thanks to conftest.py, we can now import this without errors
+from GoogleMeetPlugin.acks import CommandTracker
+from GoogleMeetPlugin.dispatcher import RenderStage
+from GoogleMeetPlugin.scheduler import CommandScheduler
+from GoogleMeetPlugin.validation import ValidatedMessage
 from main import GoogleMeetPlugin
 
 
 @pytest.fixture
-def plugin(mocker):
-  """A fixture to create a fresh plugin instance for each test."""
-  # Mock the SocketIPCServer so we don't deal with real sockets
-  mocker.patch("main.SocketIPCServer")
-  # Mock the threading so we don't create real threads
-  mocker.patch("main.threading.Thread")
-  return GoogleMeetPlugin()
+def plugin_mocks(mocker):
+  """Patches out the sockets and threads a plugin starts, by name."""
+  return {
+    # Mock the SocketIPCServer so we don't deal with real sockets
+    "server": mocker.patch("main.SocketIPCServer"),
+    # Mock the threading so we don't create real threads
+    "thread": mocker.patch("main.threading.Thread"),
+    # Tests flush the status dispatcher explicitly instead of on a timer
+    "dispatcher_start": mocker.patch("main.CoalescingDispatcher.start"),
+    # ...and drain the render stage explicitly instead of on its thread
+    "render_start": mocker.patch("main.RenderStage.start"),
+  }
+
+
+@pytest.fixture
+def plugin(request, mocker, plugin_mocks):
+  """A fixture to create a fresh plugin instance for each test.
+
+  Tests choose the plugin settings with
+  `@pytest.mark.parametrize("plugin", [settings], indirect=True)`.
+  """
+  settings = getattr(request, "param", None)
+  if settings is not None:
+    mocker.patch.object(GoogleMeetPlugin, "get_settings", return_value=settings)
+  plugin = GoogleMeetPlugin()
+  yield plugin
+  if plugin.command_tracker:
+    plugin.command_tracker.stop()
 
 
-def test_plugin_initialization(mocker):
+def test_plugin_initialization(mocker, plugin_mocks):
   """Test that the plugin initializes correctly."""
-  mock_socket_server_cls = mocker.patch("main.SocketIPCServer")
-  mock_thread_cls = mocker.patch("main.threading.Thread")
+  mock_socket_server_cls = plugin_mocks["server"]
+  mock_thread_cls = plugin_mocks["thread"]
+  mock_dispatcher_start = plugin_mocks["dispatcher_start"]
+  mock_render_start = plugin_mocks["render_start"]
   mock_register_actions = mocker.patch(
     "main.GoogleMeetPlugin._register_actions"
   )
@@ -32,7 +63,10 @@ def test_plugin_initialization(mocker):
 
   # Assert that the socket server was created with the correct path and callback
   mock_socket_server_cls.assert_called_once_with(
-    mocker.ANY, plugin_instance.handle_status_update
+    mocker.ANY,
+    plugin_instance.queue_status_update,
+    connection_callback=plugin_instance.queue_session_change,
+    recorder=None,
   )
   assert "meet_plugin.sock" in mock_socket_server_cls.call_args[0][0]
 
@@ -42,16 +76,53 @@ def test_plugin_initialization(mocker):
   )
   plugin_instance.ipc_thread.start.assert_called_once()
 
+  # Assert that the status dispatcher and render stage were started
+  mock_dispatcher_start.assert_called_once()
+  mock_render_start.assert_called_once()
+
   # Assert that actions were registered
   mock_register_actions.assert_called_once()
 
 
+def test_ipc_thread_starts_after_registration(mocker, plugin_mocks):
+  """Test that the IPC server only starts serving once actions are registered."""
+  order = MagicMock()
+  mocker.patch("main.GoogleMeetPlugin.register", order.register)
+  plugin_mocks["thread"].return_value.start = order.start
+
+  GoogleMeetPlugin()
+
+  assert [name for name, _, _ in order.mock_calls] == ["register", "start"]
+
+
+def test_action_classes_load_lazily(mocker, plugin_mocks):
+  """Test that action classes are only imported when first instantiated."""
+  mock_holder_cls = mocker.patch("main.ActionHolder")
+
+  GoogleMeetPlugin()
+
+  holders = {
+    kwargs["action_id"]: kwargs for _, kwargs in mock_holder_cls.call_args_list
+  }
+  assert len(holders) == 9
+  mute = holders["com.github.dcode.streamdeck-meet.toggle_mute"]
+  assert mute["action_name"] == "Toggle Mute"
+  lazy_class = mute["action_base"]
+  assert not lazy_class.loaded
+
+  from GoogleMeetPlugin.actions.ToggleMuteAction import ToggleMuteAction
+
+  action = lazy_class()
+  assert isinstance(action, ToggleMuteAction)
+  assert lazy_class.loaded
+
+
 def test_send_command(plugin: GoogleMeetPlugin):
   """Test that commands are correctly formatted and sent."""
   plugin.send_command(action="toggle_mute")
 
   plugin.ipc_server.send_message.assert_called_once_with(
-    {"action": "toggle_mute"}
+    {"action": "toggle_mute"}, session_id=None
   )
 
 
@@ -59,13 +130,12 @@ def test_handle_status_update_toggles_action(plugin: GoogleMeetPlugin):
   """Test that a status update correctly finds and updates an action."""
   # Setup a mock action instance that would exist on a deck
   mock_action = MagicMock()
-  mock_action.action_id = "com.github.dcode.streamdeck-meet.toggle_camera"
-  plugin.main_view.deck_controller.decks = {
-    "deck1": MagicMock(actions={"key1": mock_action})
-  }
+  mock_action.action_name = "toggle_camera"
+  plugin.action_registry.register(mock_action)
 
   status_message = {"status": "update", "control": "camera", "state": "on"}
   plugin.handle_status_update(status_message)
+  plugin.status_dispatcher.flush()
 
   mock_action.update_state.assert_called_once_with(True)
 
@@ -73,17 +143,12 @@ def test_handle_status_update_toggles_action(plugin: GoogleMeetPlugin):
 def test_handle_hang_up_resets_actions(plugin: GoogleMeetPlugin):
   """Test that the hang up event resets all stateful actions."""
   mock_mute_action = MagicMock()
-  mock_mute_action.action_id = "com.github.dcode.streamdeck-meet.toggle_mute"
+  mock_mute_action.action_name = "toggle_mute"
   mock_hangup_action = MagicMock()
-  mock_hangup_action.action_id = (
-    "com.github.dcode.streamdeck-meet.hang_up"  # Should not be reset
-  )
+  mock_hangup_action.action_name = "hang_up"  # Should not be reset
 
-  plugin.main_view.deck_controller.decks = {
-    "deck1": MagicMock(
-      actions={"key1": mock_mute_action, "key2": mock_hangup_action}
-    )
-  }
+  plugin.action_registry.register(mock_mute_action)
+  plugin.action_registry.register(mock_hangup_action)
 
   plugin.handle_hang_up()
 
@@ -97,14 +162,645 @@ def test_handle_invalid_status_update(plugin: GoogleMeetPlugin, caplog):
   """Test that an invalid message is logged and ignored."""
   # Setup a mock action to ensure it's NOT called
   mock_action = MagicMock()
-  mock_action.action_id = "com.github.dcode.streamdeck-meet.toggle_camera"
-  plugin.main_view.deck_controller.decks = {
-    "deck1": MagicMock(actions={"key1": mock_action})
-  }
+  mock_action.action_name = "toggle_camera"
+  plugin.action_registry.register(mock_action)
 
   invalid_message = {"foo": "bar"}  # Missing required fields
   plugin.handle_status_update(invalid_message)
+  plugin.status_dispatcher.flush()
 
   assert "Received invalid status message" in caplog.text
   # Assert that no action's state was updated
   mock_action.update_state.assert_not_called()
+
+
+def test_invalid_status_dumps_recent_messages(plugin: GoogleMeetPlugin, caplog):
+  """Test that per-message logging is quiet until something goes wrong."""
+  caplog.set_level(logging.INFO)
+  plugin.handle_status_update(
+    {"status": "update", "control": "camera", "state": "on"}
+  )
+  plugin.send_command(action="toggle_camera")
+  assert "camera" not in caplog.text
+
+  plugin.handle_status_update({"status": "update", "control": "teleporter"})
+  assert "last 3 messages" in caplog.text
+  assert "'control': 'camera'" in caplog.text
+  assert "'action': 'toggle_camera'" in caplog.text
+  assert "teleporter" in caplog.text
+
+
+def test_registry_drops_removed_actions(plugin: GoogleMeetPlugin):
+  """Test that removed or discarded actions no longer receive updates."""
+  removed_action = MagicMock()
+  removed_action.action_name = "toggle_mute"
+  discarded_action = MagicMock()
+  discarded_action.action_name = "toggle_mute"
+  plugin.action_registry.register(removed_action)
+  plugin.action_registry.register(discarded_action)
+  assert len(plugin.action_registry) == 2
+
+  plugin.action_registry.unregister(removed_action)
+  del discarded_action
+  gc.collect()  # Mocks hold reference cycles to their children
+  assert len(plugin.action_registry) == 0
+
+  plugin.handle_status_update(
+    {"status": "update", "control": "microphone", "state": "on"}
+  )
+  plugin.status_dispatcher.flush()
+  removed_action.update_state.assert_not_called()
+
+
+def test_status_burst_is_coalesced(plugin: GoogleMeetPlugin):
+  """Test that a burst of updates renders each key once with the newest state."""
+  mock_mute_action = MagicMock()
+  mock_mute_action.action_name = "toggle_mute"
+  mock_camera_action = MagicMock()
+  mock_camera_action.action_name = "toggle_camera"
+  plugin.action_registry.register(mock_mute_action)
+  plugin.action_registry.register(mock_camera_action)
+
+  for state in ("on", "off", "on", "off", "on"):
+    plugin.handle_status_update(
+      {"status": "update", "control": "microphone", "state": state}
+    )
+  plugin.handle_status_update(
+    {"status": "update", "control": "camera", "state": "off"}
+  )
+  plugin.status_dispatcher.flush()
+
+  mock_mute_action.update_state.assert_called_once_with(True)
+  mock_camera_action.update_state.assert_called_once_with(False)
+  stats = plugin.status_dispatcher.stats()
+  assert stats["received"] == 6
+  assert stats["merged"] == 4
+  assert stats["dispatched"] == 2
+
+
+def test_call_end_supersedes_pending_updates(plugin: GoogleMeetPlugin):
+  """Test that a state reported after the call ends survives the reset."""
+  mock_mute_action = MagicMock()
+  mock_mute_action.action_name = "toggle_mute"
+  plugin.action_registry.register(mock_mute_action)
+
+  for control, state in (("microphone", "off"), ("call", "off")):
+    plugin.handle_status_update(
+      {"status": "update", "control": control, "state": state}
+    )
+  plugin.handle_status_update(
+    {"status": "update", "control": "microphone", "state": "on"}
+  )
+  plugin.status_dispatcher.flush()
+
+  assert mock_mute_action.update_state.call_args_list == [
+    call(False),
+    call(True),
+  ]
+
+
+def test_status_updates_are_rendered_off_the_ipc_thread(
+  plugin: GoogleMeetPlugin,
+):
+  """Test that the IPC callbacks only queue work for the render stage."""
+  mock_mute_action = MagicMock()
+  mock_mute_action.action_name = "toggle_mute"
+  plugin.action_registry.register(mock_mute_action)
+
+  plugin.queue_session_change(1, True)
+  plugin.queue_status_update(
+    {"status": "update", "control": "microphone", "state": "on"}, 1
+  )
+  plugin.status_dispatcher.flush()
+  mock_mute_action.update_state.assert_not_called()
+  assert plugin.render_stage.stats()["depth"] == 2
+
+  plugin.render_stage.drain()
+  plugin.status_dispatcher.flush()
+  mock_mute_action.update_state.assert_called_once_with(True)
+  stats = plugin.render_stage.stats()
+  assert stats["depth"] == 0
+  assert stats["processed"] == 2
+  assert stats["wait_ms"]["max"] >= 0
+
+
+@pytest.mark.parametrize(
+  "overflow, expected",
+  [("drop_oldest", ["closed", 2, 3]), ("drop_newest", ["closed", 1, 2])],
+)
+def test_render_stage_overflow_policies(overflow, expected):
+  """Test that a full render queue drops messages but never connection changes."""
+  stage = RenderStage(maxsize=2, overflow=overflow)
+  handled = []
+  stage.put(handled.append, "closed", droppable=False)
+  for message in (1, 2, 3):
+    stage.put(handled.append, message)
+
+  stage.drain()
+
+  assert handled == expected
+  stats = stage.stats()
+  assert stats["dropped"] == 1
+  assert stats["max_depth"] == 3
+
+
+def test_render_stage_blocks_the_reader_when_full():
+  """Test that the "block" policy waits for room instead of dropping."""
+  stage = RenderStage(maxsize=1, overflow="block")
+  release = threading.Event()
+  handled = []
+
+  def slow_render(message):
+    release.wait(timeout=5)
+    handled.append(message)
+
+  stage.start()
+  try:
+    stage.put(slow_render, 1)
+    reader = threading.Thread(
+      target=lambda: [stage.put(slow_render, m) for m in (2, 3)]
+    )
+    reader.start()
+    reader.join(timeout=0.1)
+    assert reader.is_alive()  # Waiting for room behind the slow render
+    release.set()
+    reader.join(timeout=5)
+    assert not reader.is_alive()
+  finally:
+    stage.stop()
+
+  assert handled == [1, 2, 3]
+  assert stage.stats()["dropped"] == 0
+
+
+@pytest.mark.parametrize(
+  "plugin",
+  [{"render_queue_size": 1, "render_queue_overflow": "drop_oldest"}],
+  indirect=True,
+)
+def test_full_render_queue_only_drops_plain_updates(
+  mocker, plugin: GoogleMeetPlugin
+):
+  """Test that acks and snapshots survive a full render queue."""
+  handled = mocker.patch.object(plugin, "handle_status_update")
+  ack = {"status": "ack", "id": 1, "result": "ack"}
+  snapshot = {"status": "snapshot", "states": {"camera": "on"}}
+  update = {"status": "update", "control": "camera", "state": "off"}
+
+  plugin.queue_status_update(ack, 1)
+  plugin.queue_status_update(snapshot, 1)
+  plugin.queue_status_update(update, 1)
+  plugin.queue_status_update(update, 1)  # Drops the first update
+  plugin.render_stage.drain()
+
+  assert handled.call_args_list == [
+    call(ack, 1),
+    call(snapshot, 1),
+    call(update, 1),
+  ]
+  assert plugin.render_stage.stats()["dropped"] == 1
+
+
+def test_render_stage_rejects_unknown_overflow_policy():
+  """Test that a misspelt overflow setting fails loudly."""
+  with pytest.raises(ValueError, match="overflow policy"):
+    RenderStage(overflow="drop_everything")
+
+
+@pytest.mark.parametrize("presses, expected", [(1, 0), (2, 1), (3, 0), (4, 1)])
+def test_repeated_toggles_collapse_by_parity(presses, expected):
+  """Test that toggles pressed within the window collapse to their parity.
+
+  The first press is sent straight away; of the rest, an even number sends
+  nothing and an odd number sends one command when the window closes.
+  """
+  sent = []
+  scheduler = CommandScheduler(sent.append, window=60)
+
+  for _ in range(presses):
+    scheduler.submit("toggle_mute")
+  assert sent == ["toggle_mute"]
+  scheduler.stop()  # Closes the window early
+
+  assert len(sent) == 1 + expected
+  assert scheduler.stats()["collapsed"] == (presses - 1) // 2 * 2
+
+
+@pytest.mark.parametrize("presses, expected", [(1, 1), (2, 0), (3, 1), (4, 0)])
+def test_held_toggles_collapse_by_parity(presses, expected):
+  """Test that held toggles only send the parity of all the presses.
+
+  An even number of presses (e.g. a key bounce) sends nothing.
+  """
+  sent = []
+  scheduler = CommandScheduler(sent.append, window=60, hold_toggles=True)
+
+  for _ in range(presses):
+    scheduler.submit("toggle_mute")
+  assert sent == []
+  scheduler.stop()  # Closes the window early
+
+  assert len(sent) == expected
+  assert scheduler.stats()["collapsed"] == presses // 2 * 2
+
+
+def test_idempotent_commands_are_deduplicated():
+  """Test that repeated hang ups within the window send one command."""
+  sent = []
+  scheduler = CommandScheduler(sent.append, window=60)
+
+  for _ in range(5):
+    scheduler.submit("hang_up")
+  scheduler.stop()
+
+  assert sent == ["hang_up"]
+  assert scheduler.stats()["deduplicated"] == 4
+
+
+def test_reactions_are_rate_limited_per_action():
+  """Test that each action has its own token bucket."""
+  sent = []
+  scheduler = CommandScheduler(sent.append, rate=1, burst=3)
+
+  for _ in range(10):
+    scheduler.submit("send_reaction_heart")
+  scheduler.submit("send_reaction_thumb_up")
+
+  assert sent.count("send_reaction_heart") == 3
+  assert sent.count("send_reaction_thumb_up") == 1
+  assert scheduler.stats()["dropped"] == 7
+
+
+def test_repeated_reaction_is_one_command(plugin: GoogleMeetPlugin):
+  """Test that a repeated reaction is sent as one command with a count."""
+  plugin.send_command(action="send_reaction_clap", count=3)
+  plugin.ipc_server.send_message.assert_called_once_with(
+    {"action": "send_reaction_clap", "count": 3}, session_id=None
+  )
+  assert plugin.command_scheduler.stats()["sent"] == 1
+
+
+def test_deferred_toggle_is_sent_when_the_window_closes():
+  """Test that the scheduler thread sends a collapsed toggle without blocking."""
+  sent = threading.Event()
+  actions = []
+
+  def send(action):
+    actions.append(action)
+    if len(actions) == 2:
+      sent.set()
+
+  scheduler = CommandScheduler(send, window=0.02)
+  try:
+    start = time.monotonic()
+    for _ in range(3):
+      scheduler.submit("toggle_camera")
+    assert time.monotonic() - start < 0.01  # Key presses never wait
+    assert actions == ["toggle_camera"]
+    # Presses 2 and 3 cancel out; a fourth leaves one toggle to send.
+    scheduler.submit("toggle_camera")
+    assert sent.wait(timeout=2)
+  finally:
+    scheduler.stop()
+  assert actions == ["toggle_camera", "toggle_camera"]
+
+
+def test_plugin_can_use_asyncio_ipc_server(mocker, plugin_mocks):
+  """Test that the ipc_backend setting selects the event-loop server."""
+  mock_async_server_cls = mocker.patch(
+    "GoogleMeetPlugin.async_socket_ipc.AsyncSocketIPCServer"
+  )
+  mocker.patch.object(
+    GoogleMeetPlugin, "get_settings", return_value={"ipc_backend": "asyncio"}
+  )
+
+  plugin_instance = GoogleMeetPlugin()
+
+  mock_async_server_cls.assert_called_once_with(
+    mocker.ANY,
+    plugin_instance.queue_status_update,
+    connection_callback=plugin_instance.queue_session_change,
+    recorder=None,
+  )
+  assert plugin_instance.ipc_server is mock_async_server_cls.return_value
+  # Putting from the event loop must never block it
+  assert plugin_instance.render_stage.overflow == "drop_oldest"
+
+
+def test_commands_and_icons_follow_the_session_in_a_call(
+  plugin: GoogleMeetPlugin,
+):
+  """Test routing between two connected proxies."""
+  mock_mute_action = MagicMock()
+  mock_mute_action.action_name = "toggle_mute"
+  plugin.action_registry.register(mock_mute_action)
+
+  def status(control, state, session_id):
+    plugin.handle_status_update(
+      {"status": "update", "control": control, "state": state}, session_id
+    )
+    plugin.status_dispatcher.flush()
+
+  plugin.handle_session_change(1, True)
+  plugin.handle_session_change(2, True)
+  # Nothing is known yet, so nothing is shown
+  plugin.status_dispatcher.flush()
+  assert mock_mute_action.method_calls == []
+
+  # Session 1 joins a call: its state is shown and it receives commands
+  status("call", "on", 1)
+  status("microphone", "on", 1)
+  mock_mute_action.update_state.assert_called_once_with(True)
+  plugin.send_command(action="toggle_mute")
+  plugin.ipc_server.send_message.assert_called_with(
+    {"action": "toggle_mute"}, session_id=1
+  )
+
+  # Session 2 is not in a call, so its updates do not reach the icons
+  mock_mute_action.reset_mock()
+  status("microphone", "off", 2)
+  mock_mute_action.update_state.assert_not_called()
+
+  # When session 1 goes away, session 2 takes over and its state is shown
+  plugin.handle_session_change(1, False)
+  plugin.status_dispatcher.flush()
+  mock_mute_action.update_state.assert_called_once_with(False)
+  # The second toggle is within the scheduler's window; send it now
+  plugin.send_command(action="toggle_mute")
+  plugin.command_scheduler.flush()
+  plugin.ipc_server.send_message.assert_called_with(
+    {"action": "toggle_mute"}, session_id=2
+  )
+
+
+def test_routing_only_switches_when_a_call_starts(plugin: GoogleMeetPlugin):
+  """Test that state reports from another call do not take the routing."""
+  mock_mute_action = MagicMock()
+  mock_mute_action.action_name = "toggle_mute"
+  plugin.action_registry.register(mock_mute_action)
+
+  def status(control, state, session_id):
+    plugin.handle_status_update(
+      {"status": "update", "control": control, "state": state}, session_id
+    )
+    plugin.status_dispatcher.flush()
+
+  plugin.handle_session_change(1, True)
+  plugin.handle_session_change(2, True)
+  status("call", "on", 1)
+  status("microphone", "on", 1)
+  status("call", "on", 2)
+  assert plugin.sessions.target_id() == 2
+  # Session 2 has not reported its microphone, so session 1's is not shown
+  assert plugin.meet_state.get("microphone") is None
+  mock_mute_action.clear_state.assert_called_once()
+  status("microphone", "on", 2)
+  assert plugin.meet_state.get("microphone") == "on"
+
+  mock_mute_action.reset_mock()
+  for state in ("off", "on", "off"):
+    status("microphone", state, 1)
+  assert plugin.sessions.target_id() == 2
+  mock_mute_action.update_state.assert_not_called()
+
+
+def test_snapshot_is_applied_in_one_dispatch_pass(plugin: GoogleMeetPlugin):
+  """Test that a state snapshot updates every icon in a single flush."""
+  mock_mute_action = MagicMock()
+  mock_mute_action.action_name = "toggle_mute"
+  mock_camera_action = MagicMock()
+  mock_camera_action.action_name = "toggle_camera"
+  plugin.action_registry.register(mock_mute_action)
+  plugin.action_registry.register(mock_camera_action)
+
+  plugin.handle_session_change(1, True)
+  plugin.handle_status_update(
+    {
+      "status": "snapshot",
+      "states": {"call": "on", "microphone": "on", "camera": "off"},
+    },
+    1,
+  )
+  plugin.status_dispatcher.flush()
+
+  mock_mute_action.update_state.assert_called_once_with(True)
+  mock_camera_action.update_state.assert_called_once_with(False)
+  stats = plugin.status_dispatcher.stats()
+  assert stats["flushes"] == 1
+  assert plugin.sessions.states(1) == {"microphone": "on", "camera": "off"}
+  assert plugin.sessions.target().in_call
+
+
+def test_keys_already_showing_a_state_are_skipped(plugin: GoogleMeetPlugin):
+  """Test that the state store renders each change once per key."""
+  mock_mute_action = MagicMock()
+  mock_mute_action.action_name = "toggle_mute"
+  plugin.action_registry.register(mock_mute_action)
+
+  plugin.handle_status_update(
+    {"status": "update", "control": "microphone", "state": "on"}
+  )
+  plugin.status_dispatcher.flush()
+  # The same state again, e.g. in a snapshot after a reconnect
+  plugin.handle_status_update(
+    {"status": "snapshot", "states": {"call": "on", "microphone": "on"}}
+  )
+  plugin.status_dispatcher.flush()
+
+  mock_mute_action.update_state.assert_called_once_with(True)
+  assert plugin.meet_state.states() == {"microphone": "on", "call": "on"}
+  stats = plugin.meet_state.stats()
+  assert stats["version"] == 2
+  assert stats["renders"] == 1
+  assert stats["skipped"] == 1
+
+  # A key added now reads the state without waiting for an update
+  assert plugin.meet_state.read(mock_mute_action) == "on"
+  plugin.handle_hang_up()
+  assert plugin.meet_state.get("microphone") == "off"
+  mock_mute_action.update_state.assert_called_with(False)
+
+
+def test_snapshot_is_requested_when_a_proxy_connects(plugin: GoogleMeetPlugin):
+  """Test that the plugin asks a new session for its state straight away."""
+  plugin.handle_session_change(3, True)
+  plugin.ipc_server.send_message.assert_called_once_with(
+    {"action": "request_snapshot"}, session_id=3
+  )
+
+
+# A plugin with command acknowledgements enabled.
+acking = pytest.mark.parametrize(
+  "plugin", [{"command_acks": True}], indirect=True
+)
+
+
+@acking
+def test_acknowledged_command_leaves_the_in_flight_table(
+  plugin: GoogleMeetPlugin,
+):
+  """Test that commands carry an id and their ack clears them."""
+  plugin.send_command(action="toggle_mute")
+  (command,), _ = plugin.ipc_server.send_message.call_args
+  assert command == {"action": "toggle_mute", "id": 1}
+  assert plugin.command_tracker.stats()["in_flight"] == 1
+
+  plugin.handle_status_update(
+    {"status": "ack", "id": command["id"], "result": "ack"}
+  )
+  stats = plugin.command_tracker.stats()
+  assert stats["in_flight"] == 0
+  assert stats["acked"] == 1
+
+
+@acking
+def test_failed_command_shows_an_error_on_its_keys(plugin: GoogleMeetPlugin):
+  """Test that a toggle that found nothing to click flags its key."""
+  mock_mute_action = MagicMock()
+  mock_mute_action.action_name = "toggle_mute"
+  plugin.action_registry.register(mock_mute_action)
+
+  plugin.send_command(action="toggle_mute")
+  plugin.handle_status_update({"status": "ack", "id": 1, "result": "not_found"})
+
+  mock_mute_action.show_error.assert_called_once_with(duration=2)
+  assert plugin.ipc_server.send_message.call_count == 1  # No retry
+
+
+@acking
+def test_idempotent_command_is_retried_once(plugin: GoogleMeetPlugin):
+  """Test that a hang up that did nothing is sent again, but only once."""
+  mock_hang_up_action = MagicMock()
+  mock_hang_up_action.action_name = "hang_up"
+  plugin.action_registry.register(mock_hang_up_action)
+  no_tab = {"status": "ack", "id": 1, "result": "no_tab"}
+
+  plugin.send_command(action="hang_up")
+  plugin.handle_status_update(no_tab)
+  plugin.ipc_server.send_message.assert_called_with(
+    {"action": "hang_up", "id": 1}, session_id=None
+  )
+  assert plugin.ipc_server.send_message.call_count == 2
+  mock_hang_up_action.show_error.assert_not_called()
+
+  plugin.handle_status_update(no_tab)
+  assert plugin.ipc_server.send_message.call_count == 2
+  mock_hang_up_action.show_error.assert_called_once()
+
+
+def test_unanswered_commands_time_out():
+  """Test that the deadline thread retries, then fails, silent commands."""
+  resent = []
+  failed = threading.Event()
+  tracker = CommandTracker(
+    lambda action, command_id: resent.append((action, command_id)),
+    lambda action, result: failed.set(),
+    timeout=0.01,
+  )
+  try:
+    start = time.monotonic()
+    command_id = tracker.issue("leave_call")
+    assert time.monotonic() - start < 0.01  # Sending never waits
+    assert failed.wait(timeout=2)
+  finally:
+    tracker.stop()
+  assert resent == [("leave_call", command_id)]
+  assert tracker.stats()["failed"] == 1
+
+
+@pytest.mark.parametrize("plugin", [{"latency_tracing": True}], indirect=True)
+def test_latency_tracing_round_trip(plugin: GoogleMeetPlugin):
+  """Test that a traced command's echoed status ends up in the report."""
+  mock_mute_action = MagicMock()
+  mock_mute_action.action_name = "toggle_mute"
+  plugin.action_registry.register(mock_mute_action)
+
+  plugin.send_command(action="toggle_mute")
+  (command,), _ = plugin.ipc_server.send_message.call_args
+  trace = command["trace"]
+  assert set(trace["stamps"]) == {"plugin.command"}
+
+  # Every hop stamps the trace on the way out and back
+  stamps = trace["stamps"]
+  start = stamps["plugin.command"]
+  stamps.update(
+    {
+      "proxy.command": start + 1,
+      "background.command": 500.0,
+      "content.command": 9000.0,
+      "content.status": 9040.0,
+      "background.status": 545.0,
+      "proxy.status": start + 53,
+    }
+  )
+  plugin.handle_status_update(
+    {"status": "update", "control": "microphone", "state": "on", "trace": trace}
+  )
+  plugin.status_dispatcher.flush()
+  mock_mute_action.update_state.assert_called_once_with(True)
+
+  report = plugin.latency_report()["toggle_mute"]
+  assert set(report) == {
+    "total",
+    "dispatch",
+    "socket",
+    "native",
+    "extension",
+    "dom",
+  }
+  assert report["dom"]["count"] == 1
+  assert report["dom"]["p50"] == pytest.approx(40, rel=0.05)
+  assert report["extension"]["p99"] == pytest.approx(5, rel=0.05)
+  assert report["native"]["p95"] == pytest.approx(7, rel=0.05)
+
+  # Untraced or unknown echoes are ignored
+  plugin.handle_status_update(
+    {"status": "update", "control": "microphone", "state": "off"}
+  )
+  plugin.status_dispatcher.flush()
+  assert plugin.latency_report()["toggle_mute"]["dom"]["count"] == 1
+
+
+@pytest.mark.parametrize("plugin", [{"latency_tracing": True}], indirect=True)
+def test_trusted_status_with_a_bad_trace_is_rejected(
+  plugin: GoogleMeetPlugin, caplog
+):
+  """Test that a bad trace from a validating proxy never reaches the tracer."""
+  mock_mute_action = MagicMock()
+  mock_mute_action.action_name = "toggle_mute"
+  plugin.action_registry.register(mock_mute_action)
+
+  with caplog.at_level(logging.ERROR):
+    plugin.handle_status_update(
+      ValidatedMessage(
+        status="update", control="microphone", state="on", trace="junk"
+      )
+    )
+  plugin.status_dispatcher.flush()
+
+  assert "Received invalid status message" in caplog.text
+  mock_mute_action.update_state.assert_not_called()
+
+
+def test_optimistic_icons_setting(mocker, plugin: GoogleMeetPlugin):
+  """Test that optimistic icons are opt-in, with a configurable timeout."""
+  assert plugin.optimistic_timeout is None
+  assert not plugin.command_scheduler.hold_toggles  # Presses are sent at once
+
+  mocker.patch.object(
+    GoogleMeetPlugin,
+    "get_settings",
+    return_value={"optimistic_icons": True, "optimistic_timeout_ms": 500},
+  )
+  optimistic_plugin = GoogleMeetPlugin()
+  assert optimistic_plugin.optimistic_timeout == 0.5
+  assert optimistic_plugin.command_scheduler.hold_toggles
+
+
+def test_latency_tracing_is_off_by_default(plugin: GoogleMeetPlugin):
+  """Test that commands carry no trace unless tracing is enabled."""
+  plugin.send_command(action="toggle_mute")
+  plugin.ipc_server.send_message.assert_called_once_with(
+    {"action": "toggle_mute"}, session_id=None
+  )
+  assert plugin.latency_report() == {}
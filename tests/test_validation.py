@@ -0,0 +1,160 @@
+"""Unit tests for the fast message validation layer."""
+
+import pytest
+
+from GoogleMeetPlugin.validation import (
+  MessageValidationError,
+  ValidatedMessage,
+  set_strict_validation,
+  validate_command,
+  validate_status,
+)
+from GoogleMeetPlugin.wire import BINARY_V1, WireCodec, negotiate
+
+
+@pytest.fixture(params=[False, True], ids=["fast", "strict"])
+def strict(request):
+  """Runs a test against both the lookup tables and pydantic."""
+  set_strict_validation(request.param)
+  yield request.param
+  set_strict_validation(False)
+
+
+@pytest.mark.parametrize(
+  "message",
+  [
+    {"status": "update", "control": "nope", "state": "on"},
+    {"status": "update", "control": "camera", "state": "maybe"},
+    {"status": "changed", "control": "camera", "state": "on"},
+    {"status": "update", "control": ["camera"], "state": "on"},
+    {"control": "camera", "state": "on"},
+    {"status": "snapshot", "states": {"nope": "on"}},
+    {"status": "snapshot", "states": {"camera": "maybe"}},
+    {"status": "snapshot", "states": [["camera", "on"]]},
+    {"status": "ack", "id": "7", "result": "ack"},
+    {"status": "ack", "id": 7, "result": "maybe"},
+    "not a dict",
+  ],
+)
+def test_invalid_status_is_rejected(strict, message):
+  """Test that both modes reject the same malformed status updates."""
+  with pytest.raises(MessageValidationError):
+    validate_status(message)
+
+
+def test_valid_messages_are_accepted(strict):
+  """Test that both modes accept valid messages and drop unknown fields."""
+  status = validate_status(
+    {"status": "update", "control": "camera", "state": "on", "extra": 1}
+  )
+  assert status == {"status": "update", "control": "camera", "state": "on"}
+  assert isinstance(status, ValidatedMessage)
+
+  assert validate_command({"action": "hang_up"}) == {"action": "hang_up"}
+  with pytest.raises(MessageValidationError):
+    validate_command({"action": "launch_rockets"})
+
+
+def test_snapshot_is_accepted(strict):
+  """Test that both modes accept a state snapshot, sent as JSON on the wire."""
+  message = {"status": "snapshot", "states": {"call": "on", "camera": "off"}}
+  snapshot = validate_status(message)
+  assert snapshot == message
+  assert isinstance(snapshot, ValidatedMessage)
+
+  codec = WireCodec(BINARY_V1)
+  assert codec.decode(codec.encode(snapshot)) == message
+  assert validate_command({"action": "request_snapshot"}) == {
+    "action": "request_snapshot"
+  }
+
+
+def test_command_ids_and_acks_are_accepted(strict):
+  """Test that both modes accept command ids and their acknowledgements."""
+  command = validate_command({"action": "hang_up", "id": 7})
+  assert command == {"action": "hang_up", "id": 7}
+  ack = validate_status({"status": "ack", "id": 7, "result": "not_found"})
+  assert ack == {"status": "ack", "id": 7, "result": "not_found"}
+  with pytest.raises(MessageValidationError):
+    validate_command({"action": "hang_up", "id": "7"})
+
+
+@pytest.mark.parametrize("count", [0, 11, "3", 2.0])
+def test_invalid_reaction_count_is_rejected(strict, count):
+  """Test that both modes only accept a small positive repeat count."""
+  assert validate_command({"action": "send_reaction_clap", "count": 3}) == {
+    "action": "send_reaction_clap",
+    "count": 3,
+  }
+  with pytest.raises(MessageValidationError):
+    validate_command({"action": "send_reaction_clap", "count": count})
+
+
+def test_validated_messages_are_not_checked_again():
+  """Test that frames the proxy vouched for skip validation."""
+  trusted = ValidatedMessage(status="update", control="camera", state="on")
+  assert validate_status(trusted) is trusted
+
+  # Binary frames are inherently valid
+  codec = WireCodec(BINARY_V1)
+  frame = codec.encode({"action": "toggle_mute"})
+  assert type(codec.decode(frame)) is ValidatedMessage
+
+  # JSON frames are only trusted if the proxy said it validates them
+  json_frame = b'{"status": "update", "control": "camera", "state": "on"}'
+  assert type(WireCodec().decode(json_frame)) is dict
+  validating_codec = negotiate(
+    {"hello": {"encodings": ["json"], "validated": True}}
+  )
+  assert type(validating_codec.decode(json_frame)) is ValidatedMessage
+
+
+def test_trusted_messages_are_shape_checked():
+  """Test that a malformed message from a validating proxy is not trusted."""
+  with pytest.raises(MessageValidationError):
+    validate_status(ValidatedMessage(status="update"))
+  with pytest.raises(MessageValidationError):
+    validate_status(
+      ValidatedMessage(status="update", control="teleporter", state="on")
+    )
+  with pytest.raises(MessageValidationError):
+    validate_status(ValidatedMessage(status="snapshot", states={"camera": 1}))
+  with pytest.raises(MessageValidationError):
+    validate_command(ValidatedMessage(action=["toggle_mute"]))
+  with pytest.raises(MessageValidationError):
+    validate_status(
+      ValidatedMessage(
+        status="update", control="camera", state="on", trace="junk"
+      )
+    )
+  # Fields it does not know are dropped, as for untrusted messages
+  status = validate_status(
+    ValidatedMessage(status="update", control="camera", state="on", extra=1)
+  )
+  assert status == {"status": "update", "control": "camera", "state": "on"}
+
+  # A well-formed one is still passed through as it is
+  codec = negotiate({"hello": {"encodings": ["json"], "validated": True}})
+  trusted = codec.decode(b'{"status": "ack", "id": 4, "result": "ack"}')
+  assert validate_status(trusted) is trusted
+
+
+def test_trace_is_kept_and_checked(strict):
+  """Test that an optional latency trace survives validation, as a copy."""
+  trace = {"id": 3, "stamps": {"plugin.command": 12.5}}
+  command = validate_command({"action": "toggle_mute", "trace": trace})
+  assert command == {"action": "toggle_mute", "trace": trace}
+  command["trace"]["stamps"]["proxy.command"] = 13.0
+  assert trace["stamps"] == {"plugin.command": 12.5}
+
+  status = validate_status(
+    {"status": "update", "control": "microphone", "state": "on", "trace": trace}
+  )
+  assert status["trace"] == trace
+
+  # Traced messages do not fit the compact encoding and stay JSON
+  assert WireCodec(BINARY_V1).encode(command)[:1] == b"{"
+
+  for bad_trace in ({"stamps": {}}, {"id": 1, "stamps": {"x": "soon"}}, []):
+    with pytest.raises(MessageValidationError):
+      validate_command({"action": "toggle_mute", "trace": bad_trace})